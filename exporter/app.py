@@ -1,75 +1,101 @@
 import argparse
+import base64
+import binascii
+import hmac
 import json
 import logging
 import multiprocessing
 import os
 import os.path
 import queue
-import re
 import threading
 import time
+import tracemalloc
 from datetime import datetime
+from functools import wraps
 from multiprocessing import Manager
-from os.path import isdir, isfile
-from typing import Dict, List
+from typing import Dict
 
-import semver
-import yaml
-from flask import Flask, Response
+from flask import Flask, Response, jsonify, request
 from gevent.pywsgi import WSGIServer
-from kubernetes import client, config
-from kubernetes.client.rest import ApiException
 from prometheus_client import Gauge, Info, generate_latest
 from prometheus_client.core import CollectorRegistry
 
+from exporter import checker, profiling, telemetry, tracing
+from exporter.checker import _k8s_version, get_deployed_deprecated_kinds
 from exporter.constants import (
+    API_DEFAULT_LIMIT,
+    API_FILTERS,
+    API_MAX_LIMIT,
     DATA_FILE,
-    DEFAULT_VERSIONS_FILE,
-    HELM_2_VERSION,
-    HELM_3_VERSION,
-    HELM_TEMPLATE_TMP_DIRECTORY,
     HELM_V2_BINARY,
-    HELM_V3_BINARY,
     MAXIMUM,
+    METRIC_FILTERS,
+    METRIC_LABELS,
+    METRICS_MODE_AGGREGATED,
+    METRICS_MODE_FULL,
+    SCAN_PROGRESS_INTERVAL_SECONDS,
+    SCAN_PROGRESS_METRICS,
+    TRACE_DIR,
 )
-from exporter.exceptions import (
-    DeprecatedAPIVersionError,
-    HelmCommandError,
-    InvalidSemVerError,
-    JobExecutionError,
-    RemovedAPIVersionError,
-    RemovedNextReleaseAPIVersionError,
-    UnauthorizedError,
-    versionsFileNotFoundError,
-)
-from exporter.helper import (
-    FileHandler,
-    _table,
-    append_to_list,
-    applogger,
-    helm_get,
-    helm_list_namespace_releases,
-    helm_template,
-    load_multiple_yaml_documents,
-    load_yaml_file,
-    parse_duration,
-    put_all_helm_releases_in_queue,
+from exporter.exceptions import JobExecutionError
+from exporter.helper import parse_duration, put_all_helm_releases_in_queue
+from exporter.index import (
+    PublishedResults,
+    get_deprecation_status,
+    get_release_key,
+    get_shard,
 )
+from exporter.progress import ScanProgress
+from exporter.records import Deprecation, ReleaseStatus, ResultSet
+from exporter.scheduler import CronExpression, ScanScheduler
+from exporter.store import NEXT_SHARD_KEY, SCAN_COLUMNS, ResultStore
+from exporter.telemetry import render_self_metrics
 
 app = Flask(__name__)
 logger = logging.getLogger("exporter")
+# The self-monitoring metrics of the scan pipeline are only recorded by the server.
+telemetry.enable()
 # Declaring some global variables that are shared among processes.
 manager = Manager()
 lock = manager.Lock()
+# Wakes up the helm-handler process when a helm check releases job is requested.
+scan_event = manager.Event()
 interval = "1d"
 delay = "2h"
+jitter = "0s"
+publish_interval = "30s"
+trace_scans = False
+trace_dir = TRACE_DIR
+profile_scans = False
+admin_token = None
+schedule = None
+rolling_slices = 1
+metric_labels = METRIC_LABELS
+metrics_mode = METRICS_MODE_FULL
+max_series = 0
+published_results = PublishedResults([], [])
 app_data: dict = manager.dict(  # type: ignore
     processing=False,
+    scan_in_progress=False,
     run_helm_update=False,
     error_triggered=False,
     deprecations=[],
     release_stats=[],
+    aggregates={},
+    generation=0,
     last_run="",
+    next_run="",
+    scan_progress={},
+    self_metrics="",
+    trace_requested=False,
+    last_trace="",
+    profile_requested=False,
+    profile={},
+    tracemalloc_requested=False,
+    tracemalloc_report="",
+    rolling_slice=0,
+    data_last_run="",
     duration_seconds="",
     number_deployed_releases=0,
     number_releases_with_deprecated_api_versions=0,
@@ -77,28 +103,6 @@ app_data: dict = manager.dict(  # type: ignore
 )
 
 
-class k8sClient:
-    def __init__(self):
-        """
-        Initialize connection to Kubernetes
-        """
-        try:
-            config.load_incluster_config()
-        except config.config_exception.ConfigException:
-            config.load_kube_config()
-
-        client_config = client.Configuration()
-        self.api_client = client.api_client.ApiClient(client_config)
-        self.core_api = client.CoreV1Api(self.api_client)
-        self.version_api = client.VersionApi(self.api_client)
-
-    def list_namespaces(self):
-        return self.core_api.list_namespace()
-
-    def k8s_version(self):
-        return self.version_api.get_code().git_version
-
-
 def _logger():
     # Multiprocessing Logger
     logger = multiprocessing.get_logger()
@@ -115,722 +119,430 @@ def _logger():
     return logger
 
 
-def get_all_deprecations(versions_file: str = DEFAULT_VERSIONS_FILE):
-    """ "
-    Get all the deprecated apiVersions from versions.yaml file
-    """
-    home_dir = os.getenv("HOME")
-    versions_file = (
-        f"{home_dir}/.kdave/versions.yaml"
-        if os.path.exists(f"{home_dir}/.kdave/versions.yaml")
-        else versions_file
-    )
-    if not os.path.isfile(versions_file):
-        raise versionsFileNotFoundError(
-            (f"Versions file: {versions_file} doesn't exist")
-        )
-
-    return load_yaml_file(versions_file)["deprecatedVersions"]
-
-
-def get_deprecated_kind_versions(kind: str, all_deprecated_versions: dict):
+def handle_release_deprecation(  # noqa: C901
+    q: queue.Queue,
+    exit_event: threading.Event,
+    error_event: threading.Event,
+    helm_binary: str,
+    k8s_version: str,
+    results: ResultSet,
+    store: ResultStore = None,
+    scan_id: int = None,
+    progress: ScanProgress = None,
+):
     """
-    Get all the deprecated apiVersions of specific kind such as Deployment, or DaemonSet.
+    Check the releases in the queue. The result of every release is added to the
+    results of the scan as soon as it's checked, so the running scan can publish it.
     """
-    deprecations = []
-    for dep in all_deprecated_versions:
-        if dep["kind"] == kind:
-            deprecations.append(dep)
-
-    return deprecations
+    progress = progress or ScanProgress()
+    with progress.checker_thread():
+        while (not exit_event.is_set() or not q.empty()) and not error_event.is_set():
+            try:
+                release_info = q.get_nowait()
+                tracing.counter("queue", depth=q.qsize())
+                with progress.helm_call(), tracing.span(
+                    "release",
+                    release=release_info["name"],
+                    namespace=release_info["namespace"],
+                ):
+                    deprecated_kinds = get_deployed_deprecated_kinds(
+                        helm_binary,
+                        release_info["name"],
+                        release_info["namespace"],
+                        k8s_version=k8s_version,
+                        helm_version=release_info["helm_version"],
+                    )
+                deprecated = "false"
+                removed = "false"
+
+                for dep in deprecated_kinds:
+                    if dep["deprecated"] == "true":
+                        deprecated = "true"
+                    if dep["removed"] == "true":
+                        removed = "true"
+
+                release = ReleaseStatus(
+                    release_name=release_info["name"],
+                    namespace=release_info["namespace"],
+                    helm_version=release_info["helm_version"],
+                    has_deprecated_api_versions=deprecated,
+                    has_removed_api_versions=removed,
+                )
 
+                for dep in deprecated_kinds:
+                    dep["release_last_update"] = release_info["release_last_update"]
+                    dep["helm_version"] = release_info["helm_version"]
+                records = [Deprecation.from_dict(dep) for dep in deprecated_kinds]
 
-def get_kinds_in_deprecation_file(deprecated_versions: dict):
-    """
-    Get all kinds that have deprecated apiVersions in the deprecation file "versions.yaml"
-    """
-    kinds: List = []
-    for dep in deprecated_versions:
-        if dep["kind"] not in kinds:
-            kinds.append(dep["kind"])
+                if store and scan_id is not None:
+                    store.upsert_release(scan_id, release, records)
 
-    return kinds
+                results.add(release, records)
+                progress.checked()
+            except queue.Empty:
+                pass
+            except BaseException:
+                error_event.set()
+                raise
 
 
-def is_deprecated_version(
-    kind: str, apiVersion: str, k8sVersion: str, all_deprecated_versions: dict
+def get_deprecations_for_all_releases(  # noqa: C901
+    threads: int,
+    q: queue.Queue,
+    exit_event: threading.Event,
+    error_event: threading.Event,
+    helm_binary: str,
+    k8s_version: str,
+    max: int,
+    app_data=app_data,
+    lock=lock,
+    data_file: str = DATA_FILE,
+    helm_version: str = None,
 ):
-    """
-    Check if the provided apiVersion of specific kind is deprecated based on the
-    current k8s version and the deprecation file "versions.yaml"
-    """
-    deprecated_kind_versions = get_deprecated_kind_versions(
-        kind, all_deprecated_versions
-    )
-    for deprecation in deprecated_kind_versions:
-        if apiVersion == deprecation["version"]:
-            if deprecation["deprecatedInVersion"] == "":
-                return False
-            if is_newer_or_equal_version(
-                k8sVersion, deprecation["deprecatedInVersion"]
-            ):
-                return True
-
-    return False
 
+    set_trigger_flag(lock, app_data=app_data)
+    rolling_slice = get_rolling_slice(app_data=app_data, lock=lock)
+    results = ResultSet()
+
+    start = time.time()
+    # The events are set by the previous scan, whether it completed or failed.
+    exit_event.clear()
+    error_event.clear()
+    store = ResultStore(data_file)
+    scan_id = store.start_scan(app_data["last_run"])
+    progress = ScanProgress()
+    trace = trace_scans or app_data["trace_requested"]
+    if trace:
+        tracing.start_tracing()
+    profile = profile_scans or app_data["profile_requested"]
+    if profile:
+        profiling.start_profiling()
+    if rolling_slice is not None:
+        logger.info(
+            f"Checking the releases of the slice {rolling_slice + 1}/{rolling_slices}."
+        )
 
-def is_removed_version(
-    kind: str, apiVersion: str, k8sVersion: str, all_deprecated_versions: dict
-):
-    """
-    Check if the provided apiVersion of specific kind is removed based on the
-    current k8s version and the deprecation file "versions.yaml"
-    """
-    deprecated_kind_versions = get_deprecated_kind_versions(
-        kind, all_deprecated_versions
+    put_releases_in_queue = threading.Thread(
+        target=profiling.profiled(put_all_helm_releases_in_queue),
+        name="put_releases_in_queue",
+        daemon=True,
+        kwargs={
+            "helm_binary": helm_binary,
+            "q": q,
+            "exit_event": exit_event,
+            "error_event": error_event,
+            "max": max,
+            "helm_version": helm_version,
+            "release_filter": get_rolling_slice_filter(rolling_slice),
+            "progress": progress,
+        },
     )
 
-    for deprecation in deprecated_kind_versions:
-        if apiVersion == deprecation["version"]:
-            if deprecation["removedInVersion"] == "":
-                return False
-            if is_newer_or_equal_version(k8sVersion, deprecation["removedInVersion"]):
-                return True
+    put_releases_in_queue.start()
 
-    return False
-
-
-def get_deprecated_kind_info(kind: str, apiVersion: str, all_deprecated_versions: dict):
-    """
-    Get all the information about the deprecated or removed apiVersion for specific kind such as:
-    replacement_api: The new apiVersion that should be used instead of the current deprecated or removed apiVersion
-    deprecated_in_version: The apiVersion was deprecated in which k8s version.
-    removed_in_version: The apiVersion was removed in which k8s version
-    """
-    result = {}
-
-    deprecated_kind_versions = get_deprecated_kind_versions(
-        kind, all_deprecated_versions
-    )
+    release_checker_threads = []
 
-    for deprecation in deprecated_kind_versions:
-        if apiVersion == deprecation["version"]:
-            replacement_api = (
-                deprecation["replacementApi"]
-                if deprecation["replacementApi"]
-                else "n/a"
-            )
-            removed_in_version = (
-                deprecation["removedInVersion"]
-                if deprecation["removedInVersion"]
-                else "n/a"
-            )
-            deprecated_in_version = (
-                deprecation["deprecatedInVersion"]
-                if deprecation["deprecatedInVersion"]
-                else "n/a"
-            )
-
-            result["replacement_api"] = replacement_api
-            result["removed_in_version"] = removed_in_version
-            result["deprecated_in_version"] = deprecated_in_version
+    for i in range(threads):
+        release_checker = threading.Thread(
+            name=f"release-checker-{i}",
+            daemon=True,
+            target=profiling.profiled(handle_release_deprecation),
+            kwargs={
+                "q": q,
+                "exit_event": exit_event,
+                "error_event": error_event,
+                "helm_binary": helm_binary,
+                "k8s_version": k8s_version,
+                "results": results,
+                "store": store,
+                "scan_id": scan_id,
+                "progress": progress,
+            },
+        )
+        release_checker.start()
+        release_checker_threads.append(release_checker)
+
+    # Update the progress and publish the releases checked so far while waiting
+    # for the checker threads.
+    published = 0
+    last_publish = time.time()
+    for thread in release_checker_threads:
+        while thread.is_alive():
+            thread.join(timeout=SCAN_PROGRESS_INTERVAL_SECONDS)
+            update_scan_progress(progress, q, app_data=app_data, lock=lock)
+            if time.time() - last_publish >= parse_duration(publish_interval):
+                published = publish_partial_results(
+                    results, published, app_data=app_data, lock=lock
+                )
+                last_publish = time.time()
+
+    put_releases_in_queue.join()
+    update_scan_progress(progress, q, app_data=app_data, lock=lock)
+    if trace:
+        save_scan_trace(app_data=app_data, lock=lock)
+    if profile:
+        save_scan_profile(app_data=app_data, lock=lock)
+    store.close()
+    data, release_stats = results.snapshot()
+    end = time.time()
+    duration_seconds = int(end - start)
 
-    return result
+    if error_event.is_set():
+        logger.error("Updating helm release information was not successful.")
+        # Keep the releases which were checked successfully before the failure.
+        publish_partial_results(results, app_data=app_data, lock=lock)
+        with lock:
+            app_data["error_triggered"] = True
+            app_data["processing"] = False
+            app_data["scan_in_progress"] = False
+            app_data["run_helm_update"] = False
+        return
 
+    if rolling_slice is not None:
+        data = merge_rolling_slice(app_data["deprecations"], data, rolling_slice)
+        release_stats = merge_rolling_slice(
+            app_data["release_stats"], release_stats, rolling_slice
+        )
 
-def is_newer_or_equal_version(current_k8s_version, yaml_file_version):
-    """Compare two SemVersions"""
-    if semver.compare(
-        parse_semver(current_k8s_version), parse_semver(yaml_file_version)
-    ) in [0, 1]:
-        return True
+    update_global_app_data(
+        data,
+        release_stats,
+        len(release_stats),
+        get_number_of_releases(release_stats, "has_deprecated_api_versions"),
+        get_number_of_releases(release_stats, "has_removed_api_versions"),
+        duration_seconds,
+        lock=lock,
+        app_data=app_data,
+    )
 
-    return False
+    update_data_file(
+        data_file, app_data=app_data, scan_id=scan_id, rolling_slice=rolling_slice
+    )
 
 
-def parse_semver(version: str):
+def save_scan_trace(app_data=app_data, lock=lock):
     """
-    Parse Semantic Version and return it in a numeric format such as 1.20.11
-    For example:
-    > parse_semver(v1.18.16) returns 1.18.16
-    > parse_semver(v1.21.0-alpha.1) returns 1.21.0
-    > parse_semver(v1.21.0-rc.0) returns 1.21.0
-    If the version is not valid k8s version,
-    It'll raise InvalidSemVerError which will be handled by other functions.
+    Stop the tracing of the scan and save its Chrome trace in the trace directory.
     """
-    if re.match(r"(v?)(\d+\.\d+\.?\d*)(.*?)", version):
-        match = re.match(r"(v?)(\d+\.\d+\.?\d*)(.*?)", version)
-        return match.group(2)  # type: ignore
+    tracer = tracing.stop_tracing()
+    if tracer is None:
+        return
 
-    else:
-        raise InvalidSemVerError
+    path = os.path.join(
+        trace_dir, f"scan-{app_data['last_run'].replace(':', '')}.trace.json"
+    )
+    tracer.save(path)
+    logger.info(f"Saved the trace of the helm check releases job: {path}")
+    with lock:
+        app_data["trace_requested"] = False
+        app_data["last_trace"] = path
 
 
-def increment_semver(version: str, steps: int):
+def save_scan_profile(app_data=app_data, lock=lock):
     """
-    Bump the Minor version and leave other parts unchanged
+    Stop the profiling of the scan and publish its pstats and collapsed stacks reports.
     """
-    ver = semver.parse_version_info(parse_semver(version))
-    minor_ver = ver.minor + steps
-    return f"{ver.major}.{minor_ver}.{ver.patch}"
-
-
-def _k8s_version():
-    """Get current K8s version"""
-    client = k8sClient()
-    try:
-        k8s_version = client.k8s_version()
-    except ApiException as e:
-        if e.status == 401:
-            raise UnauthorizedError
+    profiler = profiling.stop_profiling()
+    if profiler is None:
+        return
 
-    return k8s_version
+    logger.info("Publishing the profile of the helm check releases job.")
+    with lock:
+        app_data["profile"] = {
+            "last_run": app_data["last_run"],
+            "pstats": profiler.pstats(),
+            "collapsed": profiler.collapsed(),
+        }
+        app_data["profile_requested"] = False
 
 
-def check_deprecations(data: dict, k8s_version: str):
+def handle_admin_requests(app_data=app_data, lock=lock):
     """
-    Check the deprecated apiVersions based on the current or provided K8s version
-    and the source of truth yaml file "versions.yaml"
+    Handle the requests of the admin endpoints which must run in the helm-handler process.
     """
-    result = {}
+    if app_data["tracemalloc_requested"]:
+        report = profiling.allocation_tracker.report()
+        with lock:
+            app_data["tracemalloc_report"] = report
+            app_data["tracemalloc_requested"] = False
 
-    deprecations = get_all_deprecations()
 
-    if data:
-        deprecated = (
-            "true"
-            if is_deprecated_version(
-                data["kind"], data["apiVersion"], k8s_version, deprecations
-            )
-            else "false"
-        )
-        removed = (
-            "true"
-            if is_removed_version(
-                data["kind"], data["apiVersion"], k8s_version, deprecations
-            )
-            else "false"
-        )
-
-        if deprecated == "true" or removed == "true":
-            deprecated_kind_info = get_deprecated_kind_info(
-                data["kind"], data["apiVersion"], deprecations
-            )
-            result["deprecated"] = deprecated
-            result["removed"] = removed
-            result["replacement_api"] = deprecated_kind_info["replacement_api"]
-            result["removed_in_version"] = deprecated_kind_info["removed_in_version"]
-            result["deprecated_in_version"] = deprecated_kind_info[
-                "deprecated_in_version"
-            ]
-            result["kind"] = data["kind"]
-            result["api_version"] = data["apiVersion"]
-            result["name"] = data["metadata"]["name"]
-            result["k8s_version"] = k8s_version
-
-            result["removed_in_next_release"] = (
-                "true"
-                if is_removed_version(
-                    data["kind"],
-                    data["apiVersion"],
-                    increment_semver(k8s_version, 1),
-                    deprecations,
-                )
-                else "false"
-            )
-            result["removed_in_next_2_releases"] = (
-                "true"
-                if is_removed_version(
-                    data["kind"],
-                    data["apiVersion"],
-                    increment_semver(k8s_version, 2),
-                    deprecations,
-                )
-                else "false"
-            )
-
-    return result
+def update_scan_progress(
+    progress: ScanProgress, q: queue.Queue, app_data=app_data, lock=lock
+):
+    with lock:
+        app_data["scan_progress"] = progress.snapshot(q.qsize())
+        app_data["self_metrics"] = render_self_metrics()
+    handle_admin_requests(app_data=app_data, lock=lock)
 
 
-def check_deprecations_in_files(source: str, k8s_version: str = None):
+def merge_release_results(current: list, checked: list, releases: list) -> list:
     """
-    Check the deprecated apiVersions for a yaml file or a group of yaml files. Source can be a full file path
-    or a directory. Yaml file can be a single YAML document or a yaml with multiple documents
+    Replace the results of the checked releases in the current results.
     """
-    result = []
-
-    version = k8s_version if k8s_version else _k8s_version()
-
-    try:
-        data = load_yaml_file(source)
-
-    except yaml.composer.ComposerError:
-        data = load_multiple_yaml_documents(source)
-
-    if isinstance(data, list):
-        for dep in data:
-            result.append(check_deprecations(dep, version))
-    else:
-        result.append(check_deprecations(data, version))
-
-    return result
+    checked_releases = {get_release_key(release) for release in releases}
+    return [
+        item for item in current if get_release_key(item) not in checked_releases
+    ] + checked
 
 
-def get_files(path):
+def publish_partial_results(
+    results: ResultSet,
+    published: int = 0,
+    app_data=app_data,
+    lock=lock,
+) -> int:
     """
-    Get all the files that end with .yaml from a specific path
+    Merge the results of the releases checked so far by the running scan into the
+    published results. The releases which were not checked yet keep their previous
+    results. Return the number of published releases.
     """
-    result = []
-
-    if isfile(path):
-        result.append(path)
-        return result
+    if len(results) == published:
+        return published
 
-    if not os.path.exists(path) or not isdir(path):
-        logger.error(f"The provided path: {path} doesn't exist or is not a directory.")
-        return result
-
-    for _path, _, files in os.walk(path):
-
-        for file in files:
-            if file.endswith(".yaml"):
-                result.append(os.path.join(_path, file))
-
-    return result
+    data, release_stats = results.snapshot()
 
-
-def check_deprecations_all(
-    source: str,
-    helm_binary: str,
-    k8s_version: str = None,
-    message: bool = False,
-    chart: str = None,
-    tabulate=True,
-    format: bool = False,
-    output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
-    values: str = None,
-    custom_values: str = None,
-    skip_dependencies: bool = False,
-    namespace: str = None,
-    release: str = None,
-):
-    """
-    This is the main function which calls other functions to check the deprecated apiVersions.
-    It can check the deprecated apiVersions for a release, namespace, chart, directory, or file(s)
-    """
-    result = []
-
-    if release:
-        deprecations = check_release_deprecation(
-            helm_binary, release, namespace, k8s_version
+    logger.info(f"Publishing the results of {len(release_stats)} checked releases.")
+    with lock:
+        deprecations = merge_release_results(
+            app_data["deprecations"], data, release_stats
         )
-        for dep in deprecations:
-            result.append(dep)
-    elif namespace:
-        deprecations = check_deprecation_for_namespace_releases(
-            helm_binary, namespace, k8s_version
+        releases = merge_release_results(
+            app_data["release_stats"], release_stats, release_stats
         )
-        for dep in deprecations:
-            result.append(dep)
-    elif chart:
-        helm_template(
-            chart, output_dir, helm_binary, values, custom_values, skip_dependencies
+        app_data["deprecations"] = deprecations
+        app_data["release_stats"] = releases
+        app_data["aggregates"] = aggregate_deprecations(deprecations)
+        app_data["generation"] += 1
+        app_data["number_deployed_releases"] = len(releases)
+        app_data[
+            "number_releases_with_deprecated_api_versions"
+        ] = get_number_of_releases(releases, "has_deprecated_api_versions")
+        app_data["number_releases_with_removed_api_versions"] = get_number_of_releases(
+            releases, "has_removed_api_versions"
         )
-        files = get_files(output_dir)
-        result = handle_deprecation_in_files_output(k8s_version, files)  # type: ignore
-    else:
-        files = get_files(source)
-        result = handle_deprecation_in_files_output(k8s_version, files)  # type: ignore
-
-    if message:
-        report_status(result, format)
-    else:
-        type = "release" if release or namespace else None
-        print_table_format(result, type)
 
-    return result
+    return len(release_stats)
 
 
-def handle_deprecation_in_files_output(k8s_version: str, files: list):
+def get_rolling_slice(app_data=app_data, lock=lock):
     """
-    This function handles the deprecated apiVersions result by appending the file name to the output
+    Get the slice of releases to check in the rolling mode, and move on to the next slice.
+    In the rolling mode, the releases are split in slices by a hash of their namespace
+    and every job checks a single slice.
     """
-    result: List = []
-    for file in files:
-        deprecations = check_deprecations_in_files(file, k8s_version)
-        for dep in deprecations:
-            if dep:
-                file_name = file.split("/")[-1]
-                dep["file_name"] = file_name
-                if dep not in result:
-                    result.append(dep)
+    if rolling_slices <= 1:
+        return None
 
-    return result
+    with lock:
+        rolling_slice = app_data["rolling_slice"] % rolling_slices
+        app_data["rolling_slice"] = (rolling_slice + 1) % rolling_slices
 
+    return rolling_slice
 
-def check_deprecation_for_namespace_releases(
-    helm_binary: str, namespace: str, k8s_version: str = None, helm_version: str = None
-):
-    """
-    Check the deprecated apiVersions for all the releases in a namespace.
-    """
-    result = []
 
-    releases = helm_list_namespace_releases(helm_binary, namespace)
-    for _release in releases:
-        deprecations = get_deployed_deprecated_kinds(
-            helm_binary, _release, namespace, k8s_version
-        )
-        for dep in deprecations:
-            result.append(dep)
+def in_rolling_slice(namespace: str, rolling_slice: int) -> bool:
+    return get_shard(namespace, rolling_slices) == rolling_slice
 
-    return result
 
+def get_rolling_slice_filter(rolling_slice: int = None):
+    if rolling_slice is None:
+        return None
 
-def check_release_deprecation(
-    helm_binary: str, release: str, namespace: str = None, k8s_version: str = None
-):
-    """
-    Check the deprecated apiVersions of the deployed release.
-    """
-    result = []
-
-    deprecations = get_deployed_deprecated_kinds(
-        helm_binary, release, namespace, k8s_version
-    )
-
-    for dep in deprecations:
-        result.append(dep)
-
-    return result
+    return lambda release: in_rolling_slice(release["namespace"], rolling_slice)
 
 
-@_table
-def print_table_format(data: dict, type: str):
+def merge_rolling_slice(current: list, checked: list, rolling_slice: int) -> list:
     """
-    Print the deprecation result in a table format
+    Replace the results of the releases in the slice with the checked results.
     """
-    msg = "Checking the used apiVersions:"
-    title = [
-        "Release name" if type == "release" else "File Name",
-        "Kind",
-        "API Version",
-        "Name",
-        "Deprecated",
-        "Removed",
-        "Deprecated In Version",
-        "Removed In Version",
-        "Replacement API",
-    ]
-    table_data = [["\033[1m" + " %s" % word + "\033[0m" for word in title]]
+    return [
+        item
+        for item in current
+        if not in_rolling_slice(item["namespace"], rolling_slice)
+    ] + checked
 
-    for d in data:
-        table_data.append(
-            [
-                d["release_name"] if type == "release" else d["file_name"],
-                d["kind"],
-                d["api_version"],
-                d["name"],
-                d["deprecated"],
-                d["removed"],
-                d["deprecated_in_version"],
-                d["removed_in_version"],
-                d["replacement_api"],
-            ]
-        )
-
-    return table_data, msg
 
-
-def report_status(deprecations: List[Dict], format: bool = False):
-    _logger = applogger("exporter")
-    for dep in deprecations:
-        status = "removed" if dep["removed"] == "true" else "deprecated"
-        msg = f'The {dep["kind"]}: {dep["name"]} uses the {status} apiVersion: {dep["api_version"]}. Use {dep["replacement_api"]} instead.'
-        if format:
-            _logger.warning(msg) if status == "deprecated" else _logger.error(msg)
-        else:
-            print(msg)
-
-    if deprecations:
-        raise_api_versions_exception(deprecations)
-
-
-def raise_api_versions_exception(deprecations: List[Dict]) -> None:
-    """
-    This function raises an exception depending on the current deprecation status.
-    This exception will be handled later to set the Exit Code.
-    """
-    status = set()
-
-    for dep in deprecations:
-        if dep["removed"] == "true":
-            status.add("removed")
-        if dep["removed_in_next_release"] == "true":
-            status.add("removed_in_next_release")
-        if dep["deprecated"] == "true":
-            status.add("deprecated")
-
-    if "removed" in status:
-        raise RemovedAPIVersionError
-    if "removed_in_next_release" in status:
-        raise RemovedNextReleaseAPIVersionError
-    if "deprecated" in status:
-        raise DeprecatedAPIVersionError
-
-
-def get_kinds_from_helm_release(  # noqa: C901
-    helm_binary: str, release_name: str, namespace: str = None, helm_version: str = None
-):
+def load_persisted_data(data_file: str = DATA_FILE, app_data=app_data, lock=lock):
     """
-    Get all kinds from a helm release a long with the apiVersions to check the deprecation
+    Publish the results of the last completed scan saved in the data file, so they are served
+    as soon as the server starts. If they are outdated, a helm check releases job is triggered
+    to refresh them in the background. In the rolling mode, the jobs resume from the slice
+    after the last checked slice.
     """
-    result: List = []
-
-    if helm_version == HELM_2_VERSION:
-        helm_binary = HELM_V2_BINARY
-    elif helm_version == HELM_3_VERSION:
-        helm_binary = HELM_V3_BINARY
-
-    try:
-        release_info = helm_get(helm_binary, release_name, namespace)
-    except HelmCommandError:
-        logger.warning(f"release: {release_name} not found.")
-        return result
-
-    try:
-        content = [data for data in yaml.safe_load_all(release_info)]
-    except yaml.scanner.ScannerError:
-        logger.error(f"Failed to parse the yaml content for release {release_name}.")
-
-        return result
-
-    for _kind in content:
-        if _kind:
-            if "REVISION" in _kind:
-                continue
-            dep = {
-                "kind": _kind["kind"],
-                "apiVersion": _kind["apiVersion"],
-                "metadata": {"name": _kind["metadata"]["name"]},
-            }
-            result.append(dep)
+    with ResultStore(data_file) as store:
+        next_shard = store.get_metadata(NEXT_SHARD_KEY)
+        all_data = store.load() if store.last_scan() else None
 
-    return result
-
-
-def get_deployed_deprecated_kinds(
-    helm_binary: str,
-    release_name: str,
-    namespace: str = None,
-    k8s_version: str = None,
-    helm_version: str = None,
-):
-    """
-    Get the deprecated apiVersions for the deployed kinds which are fetched from a helm release.
-    """
-    result: List = []
-    version = k8s_version if k8s_version else _k8s_version()
-
-    kinds = get_kinds_from_helm_release(
-        helm_binary, release_name, namespace, helm_version
-    )
-
-    if not kinds:
-        return result
-
-    logger.info(f"Checking the used apiVersions for release: {release_name}")
-    for _kind in kinds:
-        dep = check_deprecations(_kind, version)
-        if dep:
-            dep["release_name"] = release_name
-            dep["namespace"] = namespace if namespace else release_name
-            result.append(dep)
-
-    return result
-
-
-def handle_release_deprecation(  # noqa: C901
-    q: queue.Queue,
-    exit_event: threading.Event,
-    error_event: threading.Event,
-    lock: threading.Lock,
-    helm_binary: str,
-    k8s_version: str,
-    data: list,
-    release_stats: list,
-):
-    result = []
-    releases = []
-
-    while (not exit_event.is_set() or not q.empty()) and not error_event.is_set():
-        try:
-            release_info = q.get_nowait()
-            deprecated_kinds = get_deployed_deprecated_kinds(
-                helm_binary,
-                release_info["name"],
-                release_info["namespace"],
-                k8s_version=k8s_version,
-                helm_version=release_info["helm_version"],
-            )
-            deprecated = "false"
-            removed = "false"
-
-            for dep in deprecated_kinds:
-                if dep["deprecated"] == "true":
-                    deprecated = "true"
-                if dep["removed"] == "true":
-                    removed = "true"
-
-            releases.append(
-                {
-                    "release_name": release_info["name"],
-                    "namespace": release_info["namespace"],
-                    "helm_version": release_info["helm_version"],
-                    "has_deprecated_api_versions": deprecated,
-                    "has_removed_api_versions": removed,
-                }
-            )
-
-            for dep in deprecated_kinds:
-                dep["release_last_update"] = release_info["release_last_update"]
-                dep["helm_version"] = release_info["helm_version"]
-
-                result.append(dep)
-        except queue.Empty:
-            pass
-        except BaseException:
-            error_event.set()
-            raise
-
-    with lock:
-        append_to_list(result, data)
-        append_to_list(releases, release_stats)
-
-
-def is_updated_data_file(data_file: str = DATA_FILE):
-    file = FileHandler(data_file)
-    if os.path.exists(data_file) and not os.stat(data_file).st_size == 0:
-        saved_data = file.load()
-        if not is_older_than(interval, datetime.fromisoformat(saved_data["last_run"])):
-            return True
-
-    return False
-
-
-def get_deprecations_for_all_releases(
-    threads: int,
-    q: queue.Queue,
-    exit_event: threading.Event,
-    error_event: threading.Event,
-    helm_binary: str,
-    k8s_version: str,
-    max: int,
-    app_data=app_data,
-    lock=lock,
-    data_file: str = DATA_FILE,
-    helm_version: str = None,
-):
-
-    set_trigger_flag(lock, app_data=app_data)
-
-    if is_updated_data_file(data_file):
-        all_data = load_from_data_file(data_file)
-
-        data = all_data["data"]
-        release_stats = all_data["release_stats"]
-        duration_seconds = all_data["duration_seconds"]
-
-    else:
-        data = []
-        release_stats = []
-        _lock = threading.Lock()
-        start = time.time()
-
-        put_releases_in_queue = threading.Thread(
-            target=put_all_helm_releases_in_queue,
-            name="put_releases_in_queue",
-            daemon=True,
-            kwargs={
-                "helm_binary": helm_binary,
-                "q": q,
-                "exit_event": exit_event,
-                "error_event": error_event,
-                "max": max,
-                "helm_version": helm_version,
-            },
-        )
-
-        put_releases_in_queue.start()
-
-        release_checker_threads = []
-
-        for i in range(threads):
-            release_checker = threading.Thread(
-                name=f"release-checker-{i}",
-                daemon=True,
-                target=handle_release_deprecation,
-                kwargs={
-                    "q": q,
-                    "exit_event": exit_event,
-                    "error_event": error_event,
-                    "lock": _lock,
-                    "helm_binary": helm_binary,
-                    "k8s_version": k8s_version,
-                    "data": data,
-                    "release_stats": release_stats,
-                },
-            )
-            release_checker.start()
-            release_checker_threads.append(release_checker)
-
-        for thread in release_checker_threads:
-            thread.join()
-
-        put_releases_in_queue.join()
-        end = time.time()
-        duration_seconds = int(end - start)
-    if error_event.is_set():
-        logger.error("Updating helm release information was not successful.")
+    if next_shard is not None:
+        # Resume the rolling mode from the slice after the last checked slice.
         with lock:
-            app_data["error_triggered"] = True
+            app_data["rolling_slice"] = int(next_shard)
+
+    if not all_data:
+        logger.info("The data file doesn't have a completed scan yet.")
         return
 
+    release_stats = all_data["release_stats"]
     update_global_app_data(
-        data,
+        all_data["data"],
         release_stats,
         len(release_stats),
         get_number_of_releases(release_stats, "has_deprecated_api_versions"),
         get_number_of_releases(release_stats, "has_removed_api_versions"),
-        duration_seconds,
+        all_data["duration_seconds"],
         lock=lock,
         app_data=app_data,
+        data_last_run=all_data["last_run"],
     )
+    logger.info(
+        f"Serving {len(all_data['data'])} deprecated apiVersions from the data file, last updated at {all_data['last_run']}."
+    )
+
+    with lock:
+        app_data["last_run"] = all_data["last_run"]
+    if is_older_than(interval, datetime.fromisoformat(all_data["last_run"])):
+        logger.info(
+            f"Data is older than {interval}, will trigger helm check releases job to update the data."
+        )
+        request_helm_update(app_data=app_data, lock=lock)
 
-    if not is_updated_data_file(data_file):
-        update_data_file(data_file, app_data=app_data)
 
+def get_data_age_seconds(app_data=app_data) -> float:
+    """
+    Get the age of the served data, which may be older than the last run while a job is running.
+    """
+    if not app_data["data_last_run"]:
+        return 0
 
-def load_from_data_file(data_file: str = DATA_FILE):
-    file = FileHandler(data_file)
-    logger.info(f"Loading data from data file: {data_file}")
-    all_data = {}
-    all_data["data"] = file.load()["deprecations"]
-    all_data["release_stats"] = file.load()["release_stats"]
-    all_data["duration_seconds"] = file.load()["duration_seconds"]
-    return all_data
+    return (
+        datetime.now() - datetime.fromisoformat(app_data["data_last_run"])
+    ).total_seconds()
 
 
-def update_data_file(data_file: str = DATA_FILE, app_data=app_data):
-    file = FileHandler(data_file)
-    logger.info("Data file is outdated or doesn't exist. Building a new data file")
+def update_data_file(
+    data_file: str = DATA_FILE, app_data=app_data, scan_id=None, rolling_slice=None
+):
+    """
+    Complete the scan whose releases were upserted in the data file while they were checked,
+    or replace the data file content with the current data if the scan is not provided.
+    The scan of a rolling slice replaces the releases of this slice only.
+    """
     logger.info(f"Writing data to data file: {data_file}")
-    file.save(json.dumps(dict(app_data)))
+    stats = {column: app_data[column] for column in SCAN_COLUMNS}
+    with ResultStore(data_file) as store:
+        if scan_id is None:
+            store.save(app_data["deprecations"], app_data["release_stats"], stats)
+        elif rolling_slice is None:
+            store.finish_scan(scan_id, stats)
+        else:
+            store.finish_scan(scan_id, stats, rolling_slice, rolling_slices)
 
 
 def set_trigger_flag(lock=lock, app_data=app_data):
     with lock:
         app_data["processing"] = True
+        app_data["scan_in_progress"] = True
         app_data["run_helm_update"] = False
         app_data["last_run"] = (datetime.now()).isoformat(timespec="seconds")
 
@@ -844,10 +556,15 @@ def update_global_app_data(
     duration_seconds,
     lock=lock,
     app_data=app_data,
+    data_last_run: str = None,
 ):
     with lock:
+        # The data was produced by the current scan unless it was loaded from the data file.
+        app_data["data_last_run"] = data_last_run or app_data["last_run"]
         app_data["deprecations"] = data
         app_data["release_stats"] = release_stats
+        app_data["aggregates"] = aggregate_deprecations(data)
+        app_data["generation"] += 1
         app_data["number_deployed_releases"] = number_deployed_releases
         app_data[
             "number_releases_with_deprecated_api_versions"
@@ -857,7 +574,48 @@ def update_global_app_data(
         ] = number_releases_with_removed_api_versions
         app_data["duration_seconds"] = duration_seconds
         app_data["processing"] = False
+        app_data["scan_in_progress"] = False
         app_data["run_helm_update"] = False
+        app_data["error_triggered"] = False
+
+
+def aggregate_deprecations(deprecations: list) -> dict:
+    """
+    Count the deprecations by namespace, kind, apiVersion and status, and by replacement apiVersion.
+    The counts are computed once per scan so the aggregated metrics don't cost a pass over the data.
+    """
+    by_status: Dict[tuple, int] = {}
+    by_replacement_api: Dict[str, int] = {}
+
+    for dep in deprecations:
+        key = (
+            dep["namespace"],
+            dep["kind"],
+            dep["api_version"],
+            get_deprecation_status(dep),
+        )
+        by_status[key] = by_status.get(key, 0) + 1
+        replacement_api = dep["replacement_api"]
+        by_replacement_api[replacement_api] = (
+            by_replacement_api.get(replacement_api, 0) + 1
+        )
+
+    return {
+        "by_status": [
+            {
+                "namespace": namespace,
+                "kind": kind,
+                "api_version": api_version,
+                "status": status,
+                "count": count,
+            }
+            for (namespace, kind, api_version, status), count in by_status.items()
+        ],
+        "by_replacement_api": [
+            {"replacement_api": replacement_api, "count": count}
+            for replacement_api, count in by_replacement_api.items()
+        ],
+    }
 
 
 def get_number_of_releases(releases: list, key: str) -> int:
@@ -872,7 +630,7 @@ def get_number_of_releases(releases: list, key: str) -> int:
     return total
 
 
-def export_deprecated_versions_metrics(
+def export_deprecated_versions_metrics(  # noqa: C901
     threads: int,
     q: queue.Queue,
     exit_event: threading.Event,
@@ -885,10 +643,38 @@ def export_deprecated_versions_metrics(
     data_file: str = DATA_FILE,
     run_once: bool = False,
     helm_version: str = None,
+    scheduler: ScanScheduler = None,
+    scan_event=scan_event,  # Manager.Event
 ):
+    if scheduler is None:
+        # In the rolling mode, every job checks a slice of the releases.
+        scheduler = ScanScheduler(
+            -(-parse_duration(interval) // rolling_slices),
+            parse_duration(jitter),
+            schedule,
+        )
 
     while True:
-        time.sleep(2)
+        last_run = (
+            datetime.fromisoformat(app_data["last_run"])
+            if app_data["last_run"]
+            else None
+        )
+        with lock:
+            app_data["next_run"] = scheduler.next_run(last_run).isoformat(
+                timespec="seconds"
+            )
+
+        # Sleep until the next scheduled run unless a job is requested in the meantime.
+        if not app_data["run_helm_update"]:
+            scan_event.wait(timeout=scheduler.seconds_until_next_run(last_run))
+        scan_event.clear()
+        handle_admin_requests(app_data=app_data, lock=lock)
+
+        if scheduler.is_due(last_run):
+            with lock:
+                app_data["run_helm_update"] = True
+
         if app_data["run_helm_update"] and not app_data["processing"]:
             logger.info("Fetching helm releases to update the current data.")
             get_deprecations_for_all_releases(
@@ -909,23 +695,53 @@ def export_deprecated_versions_metrics(
             break
 
 
+def request_helm_update(app_data=app_data, lock=lock, scan_event=scan_event):
+    """
+    Request a helm check releases job. The requests made while a job is running
+    are coalesced with the running job.
+    """
+    with lock:
+        app_data["run_helm_update"] = True
+    scan_event.set()
+
+
 def get_fetched_helm_data(app_data=app_data, lock=lock):
 
+    trigger_helm_update_if_outdated(app_data=app_data, lock=lock)
+
+    if not app_data["deprecations"]:
+        return []
+
+    return app_data["deprecations"]
+
+
+def trigger_helm_update_if_outdated(app_data=app_data, lock=lock):
+
     if not app_data["last_run"]:
-        with lock:
-            app_data["run_helm_update"] = True
+        request_helm_update(app_data=app_data, lock=lock)
 
     elif is_older_than(interval, datetime.fromisoformat(app_data["last_run"])):
         logger.info(
             f"Data is older than {interval}, will trigger helm check releases job to update the data."
         )
-        with lock:
-            app_data["run_helm_update"] = True
+        request_helm_update(app_data=app_data, lock=lock)
 
-    if not app_data["deprecations"]:
-        return []
 
-    return app_data["deprecations"]
+def get_published_results(app_data=app_data, lock=lock) -> PublishedResults:
+    """
+    Get the indexes of the published scan. The indexes are rebuilt once per published scan,
+    so the results are copied from the shared app data only when they change.
+    """
+    global published_results
+
+    if app_data["generation"] != published_results.generation:
+        with lock:
+            generation = app_data["generation"]
+            deprecations = app_data["deprecations"]
+            release_stats = app_data["release_stats"]
+        published_results = PublishedResults(deprecations, release_stats, generation)
+
+    return published_results
 
 
 def is_older_than(interval: str, old_date: datetime):
@@ -934,7 +750,7 @@ def is_older_than(interval: str, old_date: datetime):
     except TypeError:
         return False
 
-    if time_between_dates.seconds >= parse_duration(interval):
+    if time_between_dates.total_seconds() >= parse_duration(interval):
         return True
 
     return False
@@ -956,30 +772,44 @@ def app_is_healthy():
     return "OK"
 
 
-@app.route("/metrics")
-def get_metrics():
-    data = get_fetched_helm_data()
+def get_metric_label_values(data: list, labels: tuple = METRIC_LABELS) -> set:
+    """
+    Project the deprecations on the configured metric labels.
+    Deprecations that only differ in the dropped labels collapse into a single series.
+    """
+    return {tuple(metric[label] for label in labels) for metric in data}
+
 
+def get_scan_progress_metrics(scan_progress: dict) -> list:
+    """
+    Export the progress of the last helm check releases job. An unknown ETA is exported as NaN.
+    """
+    metrics = []
+    for name, documentation in SCAN_PROGRESS_METRICS.items():
+        metric = Gauge(
+            name=f"wf_k8s_deprecated_versions_scan_{name}",
+            documentation=documentation,
+            registry=CollectorRegistry(),
+        )
+        value = scan_progress.get(name)
+        metric.set(float("nan") if value is None else value)
+        metrics.append(metric)
+
+    return metrics
+
+
+def render_metrics(  # noqa: C901
+    data: list, aggregates: dict, cluster_metrics: bool = True
+) -> str:
+    """
+    Render the deprecations in the Prometheus text format.
+    The cluster wide release counts are exported only when cluster_metrics is set
+    to avoid duplicating them across filtered and sharded scrapes.
+    """
     wf_k8s_deprecated_versions = Info(
         name="wf_k8s_deprecated_versions",
         documentation="Deprecated API versions",
-        labelnames=(
-            "deprecated",
-            "removed",
-            "kind",
-            "api_version",
-            "name",
-            "release_name",
-            "namespace",
-            "helm_version",
-            "replacement_api",
-            "deprecated_in_version",
-            "removed_in_version",
-            "release_last_update",
-            "k8s_version",
-            "removed_in_next_release",
-            "removed_in_next_2_releases",
-        ),
+        labelnames=metric_labels,
         registry=CollectorRegistry(),
     )
     wf_k8s_deprecated_versions_job = Info(
@@ -991,6 +821,21 @@ def get_metrics():
     wf_k8s_deprecated_versions_job.labels(
         app_data["last_run"], app_data["duration_seconds"]
     )
+    wf_k8s_deprecated_versions_data_age_seconds = Gauge(
+        name="wf_k8s_deprecated_versions_data_age_seconds",
+        documentation="Age of the exported deprecated API versions data in seconds",
+        registry=CollectorRegistry(),
+    )
+    wf_k8s_deprecated_versions_data_age_seconds.set(get_data_age_seconds())
+    wf_k8s_deprecated_versions_scan_in_progress = Gauge(
+        name="wf_k8s_deprecated_versions_scan_in_progress",
+        documentation="Whether a helm check releases job is running and its results are partially published",
+        registry=CollectorRegistry(),
+    )
+    wf_k8s_deprecated_versions_scan_in_progress.set(
+        1 if app_data["scan_in_progress"] else 0
+    )
+    scan_progress_metrics = get_scan_progress_metrics(app_data["scan_progress"])
 
     wf_k8s_deployed_releases = Gauge(
         name="wf_k8s_deployed_releases",
@@ -1007,48 +852,330 @@ def get_metrics():
         documentation="Total number of the deployed releases that have removed apiVersions",
         registry=CollectorRegistry(),
     )
-
-    wf_k8s_deployed_releases.set(app_data["number_deployed_releases"])
-    wf_k8s_deployed_releases_with_deprecated_api_version.set(
-        app_data["number_releases_with_deprecated_api_versions"]
+    wf_k8s_deprecated_versions_count = Gauge(
+        name="wf_k8s_deprecated_versions_count",
+        documentation="Number of objects using deprecated or removed API versions",
+        labelnames=("namespace", "kind", "api_version", "status"),
+        registry=CollectorRegistry(),
     )
-    wf_k8s_deployed_releases_with_removed_api_version.set(
-        app_data["number_releases_with_removed_api_versions"]
+    wf_k8s_deprecated_versions_replacement_api_count = Gauge(
+        name="wf_k8s_deprecated_versions_replacement_api_count",
+        documentation="Number of objects that should be migrated to the replacement API version",
+        labelnames=("replacement_api",),
+        registry=CollectorRegistry(),
     )
 
-    for metric in data:
-        wf_k8s_deprecated_versions.labels(
-            metric["deprecated"],
-            metric["removed"],
-            metric["kind"],
-            metric["api_version"],
-            metric["name"],
-            metric["release_name"],
-            metric["namespace"],
-            metric["helm_version"],
-            metric["replacement_api"],
-            metric["deprecated_in_version"],
-            metric["removed_in_version"],
-            metric["release_last_update"],
-            metric["k8s_version"],
-            metric["removed_in_next_release"],
-            metric["removed_in_next_2_releases"],
+    if cluster_metrics:
+        wf_k8s_deployed_releases.set(app_data["number_deployed_releases"])
+        wf_k8s_deployed_releases_with_deprecated_api_version.set(
+            app_data["number_releases_with_deprecated_api_versions"]
+        )
+        wf_k8s_deployed_releases_with_removed_api_version.set(
+            app_data["number_releases_with_removed_api_versions"]
         )
 
-    _metrics = (
+    for count in aggregates.get("by_status", []):
+        wf_k8s_deprecated_versions_count.labels(
+            count["namespace"], count["kind"], count["api_version"], count["status"]
+        ).set(count["count"])
+    for count in aggregates.get("by_replacement_api", []):
+        wf_k8s_deprecated_versions_replacement_api_count.labels(
+            count["replacement_api"]
+        ).set(count["count"])
+
+    if metrics_mode == METRICS_MODE_FULL:
+        label_values = get_metric_label_values(data, metric_labels)
+        if max_series and len(label_values) > max_series:
+            logger.warning(
+                f"Exporting {len(label_values)} deprecated API versions series exceeds the series budget of {max_series}. "
+                "Only the aggregated metrics are exported."
+            )
+        else:
+            for values in label_values:
+                wf_k8s_deprecated_versions.labels(*values)
+
+    _metrics = [
         CollectorRegistry(),
         wf_k8s_deprecated_versions_job,
+        wf_k8s_deprecated_versions_data_age_seconds,
+        wf_k8s_deprecated_versions_scan_in_progress,
+        *scan_progress_metrics,
         wf_k8s_deprecated_versions,
-        wf_k8s_deployed_releases,
-        wf_k8s_deployed_releases_with_deprecated_api_version,
-        wf_k8s_deployed_releases_with_removed_api_version,
-    )
+        wf_k8s_deprecated_versions_count,
+        wf_k8s_deprecated_versions_replacement_api_count,
+    ]
+    if cluster_metrics:
+        _metrics.extend(
+            [
+                wf_k8s_deployed_releases,
+                wf_k8s_deployed_releases_with_deprecated_api_version,
+                wf_k8s_deployed_releases_with_removed_api_version,
+            ]
+        )
 
     result = ""
     for m in _metrics:
         result += generate_latest(m).decode("utf-8")
 
-    return Response(result, mimetype="text/plain")
+    return result
+
+
+def get_query_filters(args, names: tuple = METRIC_FILTERS) -> dict:
+    """
+    Get the filters from the query string. Every filter accepts multiple
+    values either as repeated arguments or separated with commas.
+    """
+    filters = {}
+    for name in names:
+        values = [
+            value for arg in args.getlist(name) for value in arg.split(",") if value
+        ]
+        if values:
+            filters[name] = values
+
+    return filters
+
+
+def get_filtered_metrics(filters: dict, shard: int = None, total_shards: int = None):
+    trigger_helm_update_if_outdated()
+    data = get_published_results().deprecations.select(filters, shard, total_shards)
+
+    return Response(
+        render_metrics(data, aggregate_deprecations(data), cluster_metrics=False),
+        mimetype="text/plain",
+    )
+
+
+@app.route("/metrics")
+def get_metrics():
+    filters = get_query_filters(request.args)
+    if filters:
+        return get_filtered_metrics(filters)
+
+    data = get_fetched_helm_data()
+
+    return Response(render_metrics(data, app_data["aggregates"]), mimetype="text/plain")
+
+
+@app.route("/metrics/self")
+def get_self_metrics():
+    """
+    Export the self-monitoring metrics of the scan pipeline. They are recorded by the
+    helm-handler process and published with the progress of the running job.
+    """
+    return Response(app_data["self_metrics"], mimetype="text/plain")
+
+
+@app.route("/metrics/shard/<int:shard>/<int:total_shards>")
+def get_shard_metrics(shard: int, total_shards: int):
+    if total_shards < 1 or shard >= total_shards:
+        return Response(
+            f"Invalid shard {shard}/{total_shards}. The shard must be lower than the total number of shards.",
+            status=400,
+            mimetype="text/plain",
+        )
+
+    return get_filtered_metrics(
+        get_query_filters(request.args), shard=shard, total_shards=total_shards
+    )
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    """
+    Decode a cursor into the identity key of a record, a list of size strings.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    if (
+        not isinstance(key, list)
+        or len(key) != size
+        or not all(isinstance(value, str) for value in key)
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    return tuple(key)
+
+
+def query_results(index):
+    """
+    Query an index of the published results with the filters and the cursor pagination
+    provided in the query string.
+    """
+    try:
+        limit = int(request.args.get("limit", API_DEFAULT_LIMIT))
+        if not 0 < limit <= API_MAX_LIMIT:
+            raise ValueError(f"The limit must be between 1 and {API_MAX_LIMIT}.")
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor, index.key_size) if cursor else None
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    items, total, next_key = index.page(
+        get_query_filters(request.args, API_FILTERS), after, limit
+    )
+
+    return jsonify(
+        items=[dict(item) for item in items],
+        total=total,
+        next_cursor=encode_cursor(next_key) if next_key else None,
+        data_last_run=app_data["data_last_run"],
+    )
+
+
+@app.route("/api/v1/deprecations")
+def get_deprecations_api():
+    trigger_helm_update_if_outdated()
+    return query_results(get_published_results().deprecations)
+
+
+@app.route("/api/v1/releases")
+def get_releases_api():
+    trigger_helm_update_if_outdated()
+    return query_results(get_published_results().releases)
+
+
+def get_scan_status(app_data=app_data) -> dict:
+    return {
+        "processing": app_data["processing"],
+        "in_progress": app_data["scan_in_progress"],
+        "requested": app_data["run_helm_update"],
+        "last_run": app_data["last_run"],
+        "next_run": app_data["next_run"],
+        "duration_seconds": app_data["duration_seconds"],
+        "data_last_run": app_data["data_last_run"],
+        "error_triggered": app_data["error_triggered"],
+        "progress": app_data["scan_progress"],
+        "trace_requested": app_data["trace_requested"],
+        "last_trace": app_data["last_trace"],
+    }
+
+
+@app.route("/api/v1/scan", methods=["GET"])
+def get_scan_api():
+    return jsonify(get_scan_status())
+
+
+@app.route("/api/v1/scan", methods=["POST"])
+def trigger_scan_api():
+    """
+    Trigger a helm check releases job. If a job is already running, the request is
+    coalesced with it instead of starting another job.
+    With the "trace" argument, the next job records a Chrome trace.
+    """
+    if request.args.get("trace", "").lower() in ("1", "true"):
+        with lock:
+            app_data["trace_requested"] = True
+
+    if app_data["processing"]:
+        logger.info("A helm check releases job is already running.")
+    else:
+        logger.info("A helm check releases job was requested.")
+        request_helm_update()
+
+    return jsonify(get_scan_status()), 202
+
+
+def admin_required(func):
+    """
+    Guard an admin endpoint with the admin token. The admin endpoints are disabled
+    unless the admin token is configured.
+    """
+
+    @wraps(func)
+    def guarded(*args, **kwargs):
+        if not admin_token:
+            return jsonify({"error": "The admin endpoints are disabled."}), 404
+
+        authorization = request.headers.get("Authorization", "")
+        # compare_digest raises a TypeError on non-ASCII strings, so the bytes are compared.
+        if not hmac.compare_digest(
+            authorization.encode("utf-8"), f"Bearer {admin_token}".encode("utf-8")
+        ):
+            return jsonify({"error": "Invalid admin token."}), 401
+
+        return func(*args, **kwargs)
+
+    return guarded
+
+
+@app.route("/admin/profile", methods=["POST"])
+@admin_required
+def request_profile_api():
+    """
+    Profile the next helm check releases job.
+    """
+    with lock:
+        app_data["profile_requested"] = True
+
+    return jsonify({"profile_requested": True}), 202
+
+
+@app.route("/admin/profile", methods=["GET"])
+@admin_required
+def get_profile_api():
+    """
+    Get the profile of the last profiled job, as a pstats report or as collapsed stacks
+    for flame graphs with ?format=collapsed.
+    """
+    output_format = request.args.get("format", "pstats")
+    if output_format not in ("pstats", "collapsed"):
+        return jsonify({"error": f"Invalid format: {output_format}"}), 400
+
+    profile = app_data["profile"]
+    if not profile:
+        return jsonify({"error": "No helm check releases job was profiled."}), 404
+
+    return Response(profile[output_format], mimetype="text/plain")
+
+
+@app.route("/admin/tracemalloc/flask-app", methods=["GET"])
+@admin_required
+def get_flask_app_allocations_api():
+    return Response(profiling.allocation_tracker.report(), mimetype="text/plain")
+
+
+@app.route("/admin/tracemalloc/helm-handler", methods=["POST"])
+@admin_required
+def request_helm_handler_allocations_api():
+    """
+    Request a snapshot of the allocations of the helm-handler process. The snapshot is
+    taken as soon as the process handles the request, within a few seconds during a job.
+    """
+    with lock:
+        app_data["tracemalloc_requested"] = True
+    scan_event.set()
+
+    return jsonify({"tracemalloc_requested": True}), 202
+
+
+@app.route("/admin/tracemalloc/helm-handler", methods=["GET"])
+@admin_required
+def get_helm_handler_allocations_api():
+    if not app_data["tracemalloc_report"]:
+        return jsonify({"error": "No snapshot of the helm-handler was taken."}), 404
+
+    return Response(app_data["tracemalloc_report"], mimetype="text/plain")
+
+
+def parse_metric_labels(labels: str) -> tuple:
+    """
+    Parse a comma separated list of labels for the "wf_k8s_deprecated_versions" metric.
+    """
+    result = tuple(label.strip() for label in labels.split(",") if label.strip())
+    unknown = [label for label in result if label not in METRIC_LABELS]
+    if unknown or not result:
+        raise argparse.ArgumentTypeError(
+            f"Invalid metric labels: {labels}. Accepted labels are: {', '.join(METRIC_LABELS)}"
+        )
+
+    return result
 
 
 def get_arguments():
@@ -1078,6 +1205,57 @@ def get_arguments():
         type=str,
         default="1d",
     )
+    parser.add_argument(
+        "--jitter",
+        help="Maximum random delay added to every scheduled helm check releases job. Accepted suffix (s, m, h, d, w). Default is (0s)",
+        type=str,
+        default="0s",
+    )
+    parser.add_argument(
+        "--publish-interval",
+        help="The interval between the publications of the partial results of a running helm check releases job. Accepted suffix (s, m, h, d, w). Default is (30s)",
+        type=str,
+        default="30s",
+    )
+    parser.add_argument(
+        "--schedule",
+        help='Cron expression to schedule the helm check releases jobs instead of the interval, for example "0 3 * * *"',
+        type=CronExpression,
+        default=None,
+    )
+    parser.add_argument(
+        "--trace-scans",
+        help="Record a Chrome trace of every helm check releases job. A single job can be traced with POST /api/v1/scan?trace=true",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trace-dir",
+        help=f"The directory of the Chrome traces of the helm check releases jobs (Default: {TRACE_DIR})",
+        type=str,
+        default=TRACE_DIR,
+    )
+    parser.add_argument(
+        "--profile-scans",
+        help="Profile every helm check releases job with cProfile. A single job can be profiled with POST /admin/profile",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        help="Trace the memory allocations from the start of the server for the /admin/tracemalloc endpoints",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--admin-token",
+        help="The bearer token of the /admin endpoints. The admin endpoints are disabled if it's not provided. Default is the KDAVE_ADMIN_TOKEN environment variable",
+        type=str,
+        default=os.environ.get("KDAVE_ADMIN_TOKEN"),
+    )
+    parser.add_argument(
+        "--rolling-slices",
+        help="Split the releases in slices by namespace and check a single slice every interval divided by the number of slices, instead of checking all the releases every interval. Default is 1 (no slices)",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "-l",
         "--delay",
@@ -1113,6 +1291,25 @@ def get_arguments():
         type=str,
         default=None,
     )
+    parser.add_argument(
+        "--metric-labels",
+        help="Comma separated list of labels exported for every deprecated object. Dropping labels such as release_last_update reduces the number of series. Default is all the labels",
+        type=parse_metric_labels,
+        default=METRIC_LABELS,
+    )
+    parser.add_argument(
+        "--metrics-mode",
+        help='Use "full" to export a series for every deprecated object along with the aggregated metrics, or "aggregated" to export the aggregated metrics only. Default is full',
+        type=str,
+        choices=(METRICS_MODE_FULL, METRICS_MODE_AGGREGATED),
+        default=METRICS_MODE_FULL,
+    )
+    parser.add_argument(
+        "--max-series",
+        help="Maximum number of deprecated object series to export. When exceeded, only the aggregated metrics are exported. Default is 0 (unlimited)",
+        type=int,
+        default=0,
+    )
     args = parser.parse_args()
 
     return args
@@ -1122,6 +1319,17 @@ if __name__ == "__main__":
     args = get_arguments()
     interval = args.interval
     delay = args.delay
+    jitter = args.jitter
+    publish_interval = args.publish_interval
+    trace_scans = args.trace_scans
+    trace_dir = args.trace_dir
+    profile_scans = args.profile_scans
+    admin_token = args.admin_token
+    schedule = args.schedule
+    rolling_slices = args.rolling_slices
+    metric_labels = args.metric_labels
+    metrics_mode = args.metrics_mode
+    max_series = args.max_series
     max = args.max
     helm_binary = args.helm_binary
     helm_version = args.helm_version
@@ -1129,15 +1337,20 @@ if __name__ == "__main__":
     exit_event = threading.Event()
     error_event = threading.Event()
     logger = _logger()
+    checker.logger = logger
+    if args.tracemalloc:
+        tracemalloc.start(profiling.TRACEMALLOC_FRAMES)
 
+    load_persisted_data(args.data_file)
     app_server = WSGIServer((args.address, args.port), app)
     logger.info("Starting kdave server.")
     logger.info(f"Running on http://{args.address}:{args.port}/")
-    k8s_version = _k8s_version()
-
     flask_app = multiprocessing.Process(
         name="flask-app", target=app_server.serve_forever
     )
+    flask_app.start()
+
+    k8s_version = _k8s_version()
     helm = multiprocessing.Process(
         name="helm-handler",
         target=export_deprecated_versions_metrics,
@@ -1145,7 +1358,6 @@ if __name__ == "__main__":
         kwargs={"data_file": args.data_file, "helm_version": args.helm_version},
     )
 
-    flask_app.start()
     helm.start()
     flask_app.join()
     helm.join()
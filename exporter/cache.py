@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from os.path import isdir, isfile
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import yaml
+
+from exporter.constants import CACHE_MAX_SIZE, DEPENDENCY_FILES
+
+logger = logging.getLogger("exporter")
+
+# Bump it when the shape of the cached results changes.
+CACHE_FORMAT = "1"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def prune_entries(
+    entries: Iterable[Tuple[float, int, str]],
+    max_size: int,
+    remove: Callable[[str], None],
+):
+    """
+    Remove the least recently used entries until their size fits in max_size.
+    """
+    entries = sorted(entries)
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, path in entries:
+        if size <= max_size:
+            break
+        try:
+            remove(path)
+        except OSError:
+            continue
+        size -= entry_size
+
+
+class ResultCache:
+    """
+    An on-disk cache of the deprecation checks of the files, keyed by the hash of the
+    content of a file, the hash of the versions catalog and the checked k8s version. An
+    unchanged file costs a read and a hash instead of parsing and checking it.
+
+    The entries are written to a temporary file renamed in place, so the CI jobs sharing
+    a cache never read a partial entry. A hit refreshes the modification time of the
+    entry, and the least recently used entries are pruned when the size of the cache
+    exceeds max_size.
+    """
+
+    def __init__(self, path: str, catalog_file: str, max_size: int = CACHE_MAX_SIZE):
+        self.path = os.path.expanduser(path)
+        self.catalog_hash = hash_file(catalog_file)
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_key(self, file: str, k8s_version: str) -> str:
+        return hashlib.sha256(
+            "\0".join(
+                (CACHE_FORMAT, hash_file(file), self.catalog_hash, k8s_version)
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[list]:
+        path = self.get_entry_path(key)
+        try:
+            with open(path) as fd:
+                result = json.load(fd)
+            os.utime(path)
+        except (OSError, ValueError):
+            # A missing, pruned or unreadable entry is a miss.
+            return None
+
+        return result
+
+    def put(self, key: str, result: list):
+        path = self.get_entry_path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as tmp:
+                    json.dump(result, tmp)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write the cache entry: {path}. {e}")
+
+    def list_entries(self) -> Iterator[Tuple[float, int, str]]:
+        for directory in os.scandir(self.path):
+            # The other caches sharing the directory are not results.
+            if len(directory.name) != 2 or not directory.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(directory.path):
+                # The entries being written by other jobs are left alone.
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    def prune(self):
+        """
+        Remove the least recently used entries until the cache fits in max_size.
+        """
+        prune_entries(self.list_entries(), self.max_size, os.unlink)
+
+
+def get_dependencies_field(path: str, field: str):
+    """
+    Get the field of a dependencies file which changes with the dependencies only. The
+    lock files are rewritten with a new generated date by every dependency update.
+    """
+    if not isfile(path):
+        return None
+
+    try:
+        with open(path) as fd:
+            data = yaml.safe_load(fd)
+    except yaml.YAMLError:
+        # helm fails on an invalid file, which is keyed by its content.
+        return hash_file(path)
+
+    return data.get(field) if isinstance(data, dict) else None
+
+
+def get_directory_size(path: str) -> int:
+    size = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(directory, name)).st_size
+            except OSError:
+                continue
+
+    return size
+
+
+class DependencyCache:
+    """
+    An on-disk cache of the charts/ directories downloaded by helm dependency update,
+    keyed by the hash of the dependencies of a chart: the dependencies of its
+    requirements.yaml and its Chart.yaml, and the digest of its lock file. A hit copies
+    the cached charts/ directory to the chart instead of downloading the dependencies
+    again.
+
+    The entries are copied to a temporary directory renamed in place, and the jobs
+    sharing the cache take a lock per key, so the dependencies of a chart are only
+    downloaded by one of the jobs missing them. A hit refreshes the modification time
+    of the entry, and the least recently used entries are pruned when the size of the
+    cache exceeds max_size.
+    """
+
+    def __init__(self, path: str, max_size: int = CACHE_MAX_SIZE):
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_key(self, chart_path: str, helm_binary: str) -> str:
+        dependencies = {
+            name: get_dependencies_field(f"{chart_path}/{name}", field)
+            for name, field in DEPENDENCY_FILES.items()
+        }
+        return hashlib.sha256(
+            json.dumps(
+                [CACHE_FORMAT, os.path.basename(helm_binary), dependencies],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    @contextmanager
+    def lock(self, key: str):
+        # fcntl is not available on Windows, only the CLI cache needs it.
+        import fcntl
+
+        path = f"{self.get_entry_path(key)}.lock"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def restore(self, key: str, chart_path: str) -> bool:
+        """
+        Replace the charts/ directory of the chart with the cached one, and return
+        whether the key was in the cache.
+        """
+        entry = self.get_entry_path(key)
+        if not isdir(entry):
+            return False
+
+        charts_dir = f"{chart_path}/charts"
+        tmp_dir = tempfile.mkdtemp(dir=chart_path, prefix=".charts-")
+        # The entry is copied to a path which doesn't exist yet, then renamed in place.
+        tmp_charts_dir = os.path.join(tmp_dir, "charts")
+        try:
+            shutil.copytree(entry, tmp_charts_dir)
+            if isdir(charts_dir):
+                shutil.rmtree(charts_dir)
+            os.replace(tmp_charts_dir, charts_dir)
+            os.utime(entry)
+        except OSError as e:
+            logger.warning(f"Failed to restore the cache entry: {entry}. {e}")
+            return False
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return True
+
+    def put(self, key: str, chart_path: str):
+        charts_dir = f"{chart_path}/charts"
+        entry = self.get_entry_path(key)
+        if not isdir(charts_dir) or isdir(entry):
+            return
+
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry), suffix=".tmp")
+            try:
+                tmp_entry = os.path.join(tmp_dir, "charts")
+                shutil.copytree(charts_dir, tmp_entry)
+                os.rename(tmp_entry, entry)
+                # copytree copies the modification time of the charts/ directory.
+                os.utime(entry)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except OSError as e:
+            logger.warning(f"Failed to write the cache entry: {entry}. {e}")
+
+    def list_entries(self) -> Iterator[Tuple[float, int, str]]:
+        for directory in os.scandir(self.path):
+            if len(directory.name) != 2 or not directory.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(directory.path):
+                # The locks and the entries being written by other jobs are left alone.
+                if entry.name.endswith((".tmp", ".lock")) or not entry.is_dir(
+                    follow_symlinks=False
+                ):
+                    continue
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+                yield mtime, get_directory_size(entry.path), entry.path
+
+    def remove_entry(self, path: str):
+        # An entry isn't removed while another job restores it.
+        with self.lock(os.path.basename(path)):
+            shutil.rmtree(path)
+
+    def prune(self):
+        """
+        Remove the least recently used entries until the cache fits in max_size.
+        """
+        prune_entries(self.list_entries(), self.max_size, self.remove_entry)
@@ -0,0 +1,1241 @@
+import logging
+import os
+import os.path
+import posixpath
+import re
+import subprocess  # nosec
+import tarfile
+from collections import deque
+from collections.abc import Sized
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from functools import partial
+from os.path import isdir, isfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import semver
+import yaml
+
+from exporter import tracing
+from exporter.cache import DependencyCache, ResultCache
+from exporter.constants import (
+    ARCHIVE_SUFFIXES,
+    DEFAULT_VERSIONS_FILE,
+    DEPENDENCY_CACHE_DIR,
+    FILES_INCLUDE,
+    HELM_2_VERSION,
+    HELM_3_VERSION,
+    HELM_TEMPLATE_TMP_DIRECTORY,
+    HELM_V2_BINARY,
+    HELM_V3_BINARY,
+    MAX_FILES_CHUNK_SIZE,
+    STREAM_FILES_CHUNK_SIZE,
+)
+from exporter.exceptions import (
+    DeprecatedAPIVersionError,
+    FailedChartsError,
+    HelmCommandError,
+    HelmError,
+    InvalidSemVerError,
+    K8sYAMLReadError,
+    KubeError,
+    RemovedAPIVersionError,
+    RemovedNextReleaseAPIVersionError,
+    UnauthorizedError,
+    versionsFileNotFoundError,
+)
+from exporter.helper import (
+    _table,
+    applogger,
+    helm_get,
+    helm_list_namespace_releases,
+    helm_template_manifests,
+    is_packaged_chart,
+    iter_helm_template,
+    load_multiple_yaml_documents,
+    load_yaml_file,
+    prepare_template_tmp_dir,
+)
+from exporter.telemetry import observe_check, observe_manifest_parse
+
+# The deprecation checks shared by the kdave CLI and the server. This module must stay
+# light to import: the CLI imports it for every command, so the server dependencies
+# (flask, gevent, prometheus_client, the multiprocessing manager) are never imported
+# here, and the kubernetes client is only imported when the cluster is queried.
+logger = logging.getLogger("exporter")
+
+
+class k8sClient:
+    def __init__(self):
+        """
+        Initialize connection to Kubernetes
+        """
+        # The kubernetes client is imported on use, the files checks of the CLI don't
+        # need it.
+        from kubernetes import client, config
+
+        try:
+            config.load_incluster_config()
+        except config.config_exception.ConfigException:
+            config.load_kube_config()
+
+        client_config = client.Configuration()
+        self.api_client = client.api_client.ApiClient(client_config)
+        self.core_api = client.CoreV1Api(self.api_client)
+        self.version_api = client.VersionApi(self.api_client)
+
+    def list_namespaces(self):
+        return self.core_api.list_namespace()
+
+    def k8s_version(self):
+        return self.version_api.get_code().git_version
+
+
+def get_versions_file(versions_file: str = DEFAULT_VERSIONS_FILE) -> str:
+    """
+    Get the path of the versions.yaml file, ~/.kdave/versions.yaml takes precedence
+    """
+    home_dir = os.getenv("HOME")
+    versions_file = (
+        f"{home_dir}/.kdave/versions.yaml"
+        if os.path.exists(f"{home_dir}/.kdave/versions.yaml")
+        else versions_file
+    )
+    if not os.path.isfile(versions_file):
+        raise versionsFileNotFoundError(
+            (f"Versions file: {versions_file} doesn't exist")
+        )
+
+    return versions_file
+
+
+# The loaded versions files by path and modification time.
+_catalogs: Dict[tuple, dict] = {}
+
+
+def get_all_deprecations(versions_file: str = DEFAULT_VERSIONS_FILE):
+    """ "
+    Get all the deprecated apiVersions from versions.yaml file
+    """
+    versions_file = get_versions_file(versions_file)
+    # The file is loaded again only when it changes, so the checks of the objects share
+    # the catalog.
+    key = (versions_file, os.stat(versions_file).st_mtime_ns)
+    if key not in _catalogs:
+        _catalogs.clear()
+        _catalogs[key] = load_yaml_file(versions_file)["deprecatedVersions"]
+
+    return _catalogs[key]
+
+
+def get_deprecated_kind_versions(kind: str, all_deprecated_versions: dict):
+    """
+    Get all the deprecated apiVersions of specific kind such as Deployment, or DaemonSet.
+    """
+    deprecations = []
+    for dep in all_deprecated_versions:
+        if dep["kind"] == kind:
+            deprecations.append(dep)
+
+    return deprecations
+
+
+def get_kinds_in_deprecation_file(deprecated_versions: dict):
+    """
+    Get all kinds that have deprecated apiVersions in the deprecation file "versions.yaml"
+    """
+    kinds: List = []
+    for dep in deprecated_versions:
+        if dep["kind"] not in kinds:
+            kinds.append(dep["kind"])
+
+    return kinds
+
+
+def is_deprecated_version(
+    kind: str, apiVersion: str, k8sVersion: str, all_deprecated_versions: dict
+):
+    """
+    Check if the provided apiVersion of specific kind is deprecated based on the
+    current k8s version and the deprecation file "versions.yaml"
+    """
+    deprecated_kind_versions = get_deprecated_kind_versions(
+        kind, all_deprecated_versions
+    )
+    for deprecation in deprecated_kind_versions:
+        if apiVersion == deprecation["version"]:
+            if deprecation["deprecatedInVersion"] == "":
+                return False
+            if is_newer_or_equal_version(
+                k8sVersion, deprecation["deprecatedInVersion"]
+            ):
+                return True
+
+    return False
+
+
+def is_removed_version(
+    kind: str, apiVersion: str, k8sVersion: str, all_deprecated_versions: dict
+):
+    """
+    Check if the provided apiVersion of specific kind is removed based on the
+    current k8s version and the deprecation file "versions.yaml"
+    """
+    deprecated_kind_versions = get_deprecated_kind_versions(
+        kind, all_deprecated_versions
+    )
+
+    for deprecation in deprecated_kind_versions:
+        if apiVersion == deprecation["version"]:
+            if deprecation["removedInVersion"] == "":
+                return False
+            if is_newer_or_equal_version(k8sVersion, deprecation["removedInVersion"]):
+                return True
+
+    return False
+
+
+def get_deprecated_kind_info(kind: str, apiVersion: str, all_deprecated_versions: dict):
+    """
+    Get all the information about the deprecated or removed apiVersion for specific kind such as:
+    replacement_api: The new apiVersion that should be used instead of the current deprecated or removed apiVersion
+    deprecated_in_version: The apiVersion was deprecated in which k8s version.
+    removed_in_version: The apiVersion was removed in which k8s version
+    """
+    result = {}
+
+    deprecated_kind_versions = get_deprecated_kind_versions(
+        kind, all_deprecated_versions
+    )
+
+    for deprecation in deprecated_kind_versions:
+        if apiVersion == deprecation["version"]:
+            replacement_api = (
+                deprecation["replacementApi"]
+                if deprecation["replacementApi"]
+                else "n/a"
+            )
+            removed_in_version = (
+                deprecation["removedInVersion"]
+                if deprecation["removedInVersion"]
+                else "n/a"
+            )
+            deprecated_in_version = (
+                deprecation["deprecatedInVersion"]
+                if deprecation["deprecatedInVersion"]
+                else "n/a"
+            )
+
+            result["replacement_api"] = replacement_api
+            result["removed_in_version"] = removed_in_version
+            result["deprecated_in_version"] = deprecated_in_version
+
+    return result
+
+
+def is_newer_or_equal_version(current_k8s_version, yaml_file_version):
+    """Compare two SemVersions"""
+    if semver.compare(
+        parse_semver(current_k8s_version), parse_semver(yaml_file_version)
+    ) in [0, 1]:
+        return True
+
+    return False
+
+
+def parse_semver(version: str):
+    """
+    Parse Semantic Version and return it in a numeric format such as 1.20.11
+    For example:
+    > parse_semver(v1.18.16) returns 1.18.16
+    > parse_semver(v1.21.0-alpha.1) returns 1.21.0
+    > parse_semver(v1.21.0-rc.0) returns 1.21.0
+    If the version is not valid k8s version,
+    It'll raise InvalidSemVerError which will be handled by other functions.
+    """
+    if re.match(r"(v?)(\d+\.\d+\.?\d*)(.*?)", version):
+        match = re.match(r"(v?)(\d+\.\d+\.?\d*)(.*?)", version)
+        return match.group(2)  # type: ignore
+
+    else:
+        raise InvalidSemVerError
+
+
+def increment_semver(version: str, steps: int):
+    """
+    Bump the Minor version and leave other parts unchanged
+    """
+    ver = semver.parse_version_info(parse_semver(version))
+    minor_ver = ver.minor + steps
+    return f"{ver.major}.{minor_ver}.{ver.patch}"
+
+
+def _k8s_version():
+    """Get current K8s version"""
+    from kubernetes.client.rest import ApiException
+
+    client = k8sClient()
+    try:
+        k8s_version = client.k8s_version()
+    except ApiException as e:
+        if e.status == 401:
+            raise UnauthorizedError
+
+    return k8s_version
+
+
+def check_deprecations(data: dict, k8s_version: str):
+    """
+    Check the deprecated apiVersions based on the current or provided K8s version
+    and the source of truth yaml file "versions.yaml"
+    """
+    result = {}
+
+    deprecations = get_all_deprecations()
+
+    if data:
+        deprecated = (
+            "true"
+            if is_deprecated_version(
+                data["kind"], data["apiVersion"], k8s_version, deprecations
+            )
+            else "false"
+        )
+        removed = (
+            "true"
+            if is_removed_version(
+                data["kind"], data["apiVersion"], k8s_version, deprecations
+            )
+            else "false"
+        )
+
+        if deprecated == "true" or removed == "true":
+            deprecated_kind_info = get_deprecated_kind_info(
+                data["kind"], data["apiVersion"], deprecations
+            )
+            result["deprecated"] = deprecated
+            result["removed"] = removed
+            result["replacement_api"] = deprecated_kind_info["replacement_api"]
+            result["removed_in_version"] = deprecated_kind_info["removed_in_version"]
+            result["deprecated_in_version"] = deprecated_kind_info[
+                "deprecated_in_version"
+            ]
+            result["kind"] = data["kind"]
+            result["api_version"] = data["apiVersion"]
+            result["name"] = data["metadata"]["name"]
+            result["k8s_version"] = k8s_version
+
+            result["removed_in_next_release"] = (
+                "true"
+                if is_removed_version(
+                    data["kind"],
+                    data["apiVersion"],
+                    increment_semver(k8s_version, 1),
+                    deprecations,
+                )
+                else "false"
+            )
+            result["removed_in_next_2_releases"] = (
+                "true"
+                if is_removed_version(
+                    data["kind"],
+                    data["apiVersion"],
+                    increment_semver(k8s_version, 2),
+                    deprecations,
+                )
+                else "false"
+            )
+
+    return result
+
+
+def check_deprecations_in_files(
+    source: str, k8s_version: str = None, helm_binary: str = HELM_V2_BINARY
+):
+    """
+    Check the deprecated apiVersions for a yaml file or a group of yaml files. Source can be a full file path
+    or a directory. Yaml file can be a single YAML document or a yaml with multiple documents
+    """
+    result = []
+
+    version = k8s_version if k8s_version else _k8s_version()
+    if is_archive(source):
+        return check_deprecations_in_archive(source, version, helm_binary)
+
+    try:
+        data = load_yaml_file(source)
+
+    except yaml.composer.ComposerError:
+        data = load_multiple_yaml_documents(source)
+
+    if isinstance(data, list):
+        for dep in data:
+            result.append(check_deprecations(dep, version))
+    else:
+        result.append(check_deprecations(data, version))
+
+    return result
+
+
+def is_archive(path: str) -> bool:
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_archive_documents(
+    archive: str, include: tuple = FILES_INCLUDE
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the YAML documents of the files of a .tgz or .tar archive matching the include
+    globs, along with the name of their file. The files are parsed straight from the
+    archive, nothing is extracted to the disk.
+    """
+    try:
+        with tarfile.open(archive, "r|*") as tar:
+            for member in tar:
+                name = member.name
+                if not member.isfile() or not match_globs(
+                    posixpath.basename(name), name, include
+                ):
+                    continue
+                for data in yaml.safe_load_all(tar.extractfile(member)):
+                    yield name, data
+    except (OSError, tarfile.TarError) as e:
+        raise K8sYAMLReadError(e)
+
+
+def check_deprecations_in_archive(
+    archive: str, k8s_version: str, helm_binary: str = HELM_V2_BINARY
+) -> list:
+    """
+    Check the deprecated apiVersions of the manifests of an archive. A chart packaged by
+    helm package is rendered by helm template, the files of a bundle of manifests are
+    checked as they are. Every finding keeps the file of the archive it was found in.
+    """
+    if is_packaged_chart(archive):
+        return check_packaged_chart_deprecations(archive, k8s_version, helm_binary)
+
+    result = []
+    for member, data in iter_archive_documents(archive):
+        # The other YAML files of a bundle, like its values files, aren't manifests.
+        if (
+            not isinstance(data, dict)
+            or not data.get("kind")
+            or not data.get("apiVersion")
+        ):
+            continue
+        dep = check_deprecations(data, k8s_version)
+        if dep:
+            dep["member"] = member
+        result.append(dep)
+
+    return result
+
+
+def check_packaged_chart_deprecations(
+    archive: str, k8s_version: str, helm_binary: str = HELM_V2_BINARY
+) -> list:
+    """
+    Template a packaged chart from its archive and check its rendered manifests, named
+    after the template of the archive they are rendered from.
+    """
+    result = []
+    for _, source, manifest in helm_template_manifests(archive, helm_binary):
+        for dep in check_deprecations_in_manifest(manifest, k8s_version):
+            if dep:
+                dep["member"] = source
+            result.append(dep)
+
+    return result
+
+
+def get_files(path, include: tuple = FILES_INCLUDE, exclude: tuple = ()):
+    """
+    Get all the files that end with .yaml or .yml from a specific path
+    """
+    return list(iter_files(path, include, exclude))
+
+
+def match_globs(name: str, path: str, globs: tuple) -> bool:
+    return any(fnmatchcase(name, glob) or fnmatchcase(path, glob) for glob in globs)
+
+
+def iter_files(
+    path: str, include: tuple = FILES_INCLUDE, exclude: tuple = ()
+) -> Iterator[str]:
+    """
+    Walk the files from a specific path matching the include globs, skipping the files
+    and the directories matching the exclude globs. The globs are matched against the
+    name and the path relative to the walked directory. The files are yielded as soon as
+    they are found, in the order of their names.
+    """
+    if isfile(path):
+        yield path
+        return
+
+    if not os.path.exists(path) or not isdir(path):
+        logger.error(f"The provided path: {path} doesn't exist or is not a directory.")
+        return
+
+    yield from _walk_files(path, path, include, exclude)
+
+
+def _walk_files(root: str, path: str, include: tuple, exclude: tuple):
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.warning(f"Failed to list the directory: {path}. {e}")
+        return
+
+    for entry in entries:
+        relative_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+        if match_globs(entry.name, relative_path, exclude):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_files(root, entry.path, include, exclude)
+        elif entry.is_file() and match_globs(entry.name, relative_path, include):
+            yield entry.path
+
+
+def run_git_command(directory: str, *args: str) -> List[str]:
+    result = subprocess.run(  # nosec
+        ["git", "-C", directory, *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return result.stdout.splitlines()
+
+
+def is_excluded(relative_path: str, exclude: tuple) -> bool:
+    # A file is excluded when itself or one of its parent directories matches.
+    parts = relative_path.split("/")
+    return any(
+        match_globs(part, "/".join(parts[: i + 1]), exclude)
+        for i, part in enumerate(parts)
+    )
+
+
+def get_changed_files(
+    source: str, ref: str, include: tuple = FILES_INCLUDE, exclude: tuple = ()
+) -> Optional[List[str]]:
+    """
+    Get the files of a source changed or added since a git ref with git diff. It returns
+    None when all the files have to be checked, because the versions file changed or the
+    changed files can't be listed.
+    """
+    directory = source if isdir(source) else os.path.dirname(source) or "."
+    try:
+        root = run_git_command(directory, "rev-parse", "--show-toplevel")[0]
+        changed = run_git_command(
+            directory, "diff", "--name-only", "--diff-filter=ACMRT", ref, "--"
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(
+            f"Failed to list the files changed since {ref}, checking all the files. {e}"
+        )
+        return None
+
+    paths = [os.path.realpath(os.path.join(root, path)) for path in changed]
+    if os.path.realpath(get_versions_file()) in paths:
+        logger.info("The versions file changed, checking all the files.")
+        return None
+
+    source_path = os.path.realpath(source)
+    if isfile(source_path):
+        return [source] if source_path in paths else []
+
+    files = []
+    for path in paths:
+        relative_path = os.path.relpath(path, source_path).replace(os.sep, "/")
+        if (
+            not relative_path.startswith("../")
+            and match_globs(os.path.basename(path), relative_path, include)
+            and not is_excluded(relative_path, exclude)
+        ):
+            files.append(os.path.join(source, relative_path))
+
+    return files
+
+
+def check_deprecations_all(  # noqa: C901
+    source: str,
+    helm_binary: str,
+    k8s_version: str = None,
+    message: bool = False,
+    chart: str = None,
+    tabulate=True,
+    format: bool = False,
+    output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    namespace: str = None,
+    release: str = None,
+    jobs: int = 1,
+    include: tuple = FILES_INCLUDE,
+    exclude: tuple = (),
+    stream: bool = False,
+    cache_dir: str = None,
+    changed_since: str = None,
+    in_memory: bool = False,
+    charts: tuple = (),
+):
+    """
+    This is the main function which calls other functions to check the deprecated apiVersions.
+    It can check the deprecated apiVersions for a release, namespace, chart, charts, directory, or file(s)
+    """
+    result = []
+    failed_charts: List[str] = []
+    # The findings of the files are printed as soon as they are found in stream mode.
+    report = partial(report_line, format=format) if stream else None
+    cache = ResultCache(cache_dir, get_versions_file()) if cache_dir else None
+    dependency_cache = (
+        DependencyCache(os.path.join(cache_dir, DEPENDENCY_CACHE_DIR))
+        if cache_dir
+        else None
+    )
+
+    if release:
+        deprecations = check_release_deprecation(
+            helm_binary, release, namespace, k8s_version
+        )
+        for dep in deprecations:
+            result.append(dep)
+    elif namespace:
+        deprecations = check_deprecation_for_namespace_releases(
+            helm_binary, namespace, k8s_version
+        )
+        for dep in deprecations:
+            result.append(dep)
+    elif chart:
+        checked = check_chart_deprecations(
+            chart,
+            helm_binary,
+            k8s_version,
+            output_dir,
+            values,
+            custom_values,
+            skip_dependencies,
+            jobs,
+            include,
+            exclude,
+            cache,
+            dependency_cache,
+            in_memory,
+        )
+        result = merge_files_deprecations(checked, report)
+    elif charts:
+        result, failed_charts = check_charts_deprecations(
+            charts,
+            helm_binary,
+            k8s_version,
+            output_dir,
+            values,
+            custom_values,
+            skip_dependencies,
+            jobs,
+            include,
+            exclude,
+            cache,
+            dependency_cache,
+            in_memory,
+            report,
+        )
+    else:
+        files = (
+            get_changed_files(source, changed_since, include, exclude)
+            if changed_since
+            else None
+        )
+        if files is None:
+            files = iter_files(source, include, exclude)
+        result = handle_deprecation_in_files_output(k8s_version, files, jobs, report, cache, helm_binary)  # type: ignore
+
+    if cache:
+        cache.prune()
+    if dependency_cache:
+        dependency_cache.prune()
+
+    try:
+        if stream:
+            if release or namespace:
+                for dep in result:
+                    report_line(dep, format)
+            if result:
+                raise_api_versions_exception(result)
+        elif message:
+            report_status(result, format)
+        else:
+            type = "release" if release or namespace else None
+            print_table_format(result, type)
+    except (
+        DeprecatedAPIVersionError,
+        RemovedNextReleaseAPIVersionError,
+        RemovedAPIVersionError,
+    ):
+        # The findings of the other charts are incomplete, the failed charts set the
+        # exit code.
+        if not failed_charts:
+            raise
+
+    if failed_charts:
+        raise FailedChartsError(
+            f"Failed to check the charts: {', '.join(failed_charts)}"
+        )
+
+    return result
+
+
+def check_chart_deprecations(
+    chart: str,
+    helm_binary: str,
+    k8s_version: str = None,
+    output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    jobs: int = 1,
+    include: tuple = FILES_INCLUDE,
+    exclude: tuple = (),
+    cache: ResultCache = None,
+    dependency_cache: DependencyCache = None,
+    in_memory: bool = False,
+) -> Iterator[Tuple[str, list]]:
+    """
+    Template a chart and check its rendered manifests, either from the output directory
+    or from the helm stdout when in_memory.
+    """
+    if in_memory:
+        manifests = helm_template_manifests(
+            chart,
+            helm_binary,
+            values,
+            custom_values,
+            skip_dependencies,
+            jobs,
+            dependency_cache,
+        )
+        return check_manifests_deprecations(k8s_version, manifests)
+
+    renders = iter_helm_template(
+        chart,
+        output_dir,
+        helm_binary,
+        values,
+        custom_values,
+        skip_dependencies,
+        jobs,
+        dependency_cache,
+    )
+    return check_rendered_files_deprecations(
+        k8s_version, renders, include, exclude, jobs, cache
+    )
+
+
+def discover_charts(root: str) -> List[str]:
+    """
+    Find the charts of a directory, the directories with a Chart.yaml file. The
+    dependencies in the charts/ directory of a chart are not checked on their own.
+    """
+    charts = []
+    for directory, directories, files in os.walk(root):
+        directories.sort()
+        if "Chart.yaml" in files:
+            charts.append(directory)
+            directories[:] = [name for name in directories if name != "charts"]
+
+    return charts
+
+
+def get_chart_summary(chart: str, deprecations: List[Dict]) -> str:
+    removed = sum(1 for dep in deprecations if dep["removed"] == "true")
+    return f"{chart}: {removed} removed and {len(deprecations) - removed} deprecated apiVersions"
+
+
+def check_charts_deprecations(  # noqa: C901
+    charts: Iterable[str],
+    helm_binary: str,
+    k8s_version: str = None,
+    output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    jobs: int = 1,
+    include: tuple = FILES_INCLUDE,
+    exclude: tuple = (),
+    cache: ResultCache = None,
+    dependency_cache: DependencyCache = None,
+    in_memory: bool = False,
+    report: Callable[[dict], None] = None,
+) -> Tuple[list, List[str]]:
+    """
+    Check several charts in a single run, up to jobs charts concurrently (0 uses all the
+    CPUs). The charts share the cluster version, the versions catalog and the caches,
+    and every chart is templated to its own directory of the output directory.
+
+    A summary line is printed for every chart in the order of the charts, and the file
+    names of the findings are prefixed with their chart. The charts which failed to be
+    templated or checked are returned along with the findings.
+    """
+    charts = list(charts)
+    version = k8s_version if k8s_version else _k8s_version()
+    if not in_memory:
+        prepare_template_tmp_dir(output_dir)
+
+    def check_chart(index: int, chart: str) -> list:
+        chart_output_dir = f"{output_dir}/{index}-{os.path.basename(chart)}"
+        checked = check_chart_deprecations(
+            chart,
+            helm_binary,
+            version,
+            chart_output_dir,
+            values,
+            custom_values,
+            skip_dependencies,
+            1,
+            include,
+            exclude,
+            cache,
+            dependency_cache,
+            in_memory,
+        )
+        chart_name = os.path.normpath(chart)
+        return merge_files_deprecations(
+            (f"{chart_name}/{file_name}", deprecations)
+            for file_name, deprecations in checked
+        )
+
+    result = []
+    failed_charts = []
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(jobs, len(charts)) or 1) as executor:
+        futures = [
+            executor.submit(check_chart, index, chart)
+            for index, chart in enumerate(charts)
+        ]
+        for chart, future in zip(charts, futures):
+            try:
+                deprecations = future.result()
+            except (HelmError, KubeError, yaml.YAMLError) as e:
+                logger.error(f"Failed to check the chart: {chart}. {e}")
+                print(f"{chart}: failed", flush=True)
+                failed_charts.append(chart)
+                continue
+
+            print(get_chart_summary(chart, deprecations), flush=True)
+            if report:
+                for dep in deprecations:
+                    report(dep)
+            result.extend(deprecations)
+
+    return result, failed_charts
+
+
+def get_file_deprecation_key(dep: dict) -> tuple:
+    return (dep["file_name"], dep["kind"], dep["name"], dep["api_version"])
+
+
+def check_file(
+    file: str,
+    k8s_version: Optional[str],
+    cache: ResultCache = None,
+    helm_binary: str = HELM_V2_BINARY,
+) -> list:
+    """
+    Check the deprecated apiVersions of a file, or get them from the cache if the file
+    was already checked.
+    """
+    # The cached results are keyed by the version, resolved by the callers using a cache.
+    if cache is None or not k8s_version:
+        return check_deprecations_in_files(file, k8s_version, helm_binary)
+
+    try:
+        key = cache.get_key(file, k8s_version)
+    except OSError:
+        return check_deprecations_in_files(file, k8s_version, helm_binary)
+
+    result = cache.get(key)
+    if result is None:
+        result = check_deprecations_in_files(file, k8s_version, helm_binary)
+        cache.put(key, result)
+
+    return result
+
+
+def check_files(
+    k8s_version: Optional[str],
+    files: list,
+    cache: ResultCache = None,
+    helm_binary: str = HELM_V2_BINARY,
+) -> list:
+    """
+    Check the deprecated apiVersions of a chunk of files, the work unit of the parallel
+    files checks.
+    """
+    return [check_file(file, k8s_version, cache, helm_binary) for file in files]
+
+
+def iter_files_chunks(files: Iterable[str], jobs: int) -> Iterator[list]:
+    # A few chunks per worker balance the load when the files sizes differ. The number
+    # of the files of a walk is unknown, so its chunks are small to start early.
+    if isinstance(files, Sized):
+        size = min(-(-len(files) // (jobs * 4)), MAX_FILES_CHUNK_SIZE) or 1
+    else:
+        size = STREAM_FILES_CHUNK_SIZE
+
+    chunk = []
+    for file in files:
+        chunk.append(file)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def check_files_deprecations(
+    k8s_version: Optional[str],
+    files: Iterable[str],
+    jobs: int = 1,
+    cache: ResultCache = None,
+    helm_binary: str = HELM_V2_BINARY,
+) -> Iterator[Tuple[str, list]]:
+    """
+    Check the deprecated apiVersions of the files, fanned out over a pool of jobs
+    processes when jobs is not 1 (0 uses all the CPUs). The results are yielded in the
+    order of the files whatever the number of jobs, as soon as they are checked.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if not k8s_version and (cache or jobs != 1):
+        # The cached results are keyed by the version, and the workers share it, so
+        # the cluster version is fetched once.
+        k8s_version = _k8s_version()
+
+    if jobs == 1 or (isinstance(files, Sized) and len(files) < 2):
+        for file in files:
+            yield file, check_file(file, k8s_version, cache, helm_binary)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: deque = deque()
+        for chunk in iter_files_chunks(files, jobs):
+            pending.append(
+                (
+                    chunk,
+                    executor.submit(
+                        check_files, k8s_version, chunk, cache, helm_binary
+                    ),
+                )
+            )
+            # Keep a bounded number of chunks in flight, and yield the results of the
+            # oldest chunks which are already checked.
+            while pending and (len(pending) > jobs * 2 or pending[0][1].done()):
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+
+        for chunk, future in pending:
+            yield from zip(chunk, future.result())
+
+
+def handle_deprecation_in_files_output(
+    k8s_version: Optional[str],
+    files: Iterable[str],
+    jobs: int = 1,
+    report: Callable[[dict], None] = None,
+    cache: ResultCache = None,
+    helm_binary: str = HELM_V2_BINARY,
+):
+    """
+    This function handles the deprecated apiVersions result by appending the file name to the output.
+    The duplicated objects are dropped by their identity key, and every new finding is
+    passed to report as soon as it's found.
+    """
+    checked = check_files_deprecations(k8s_version, files, jobs, cache, helm_binary)
+    return merge_files_deprecations(
+        ((get_file_name(file), deprecations) for file, deprecations in checked), report
+    )
+
+
+def get_file_name(file: str, site_dir: str = None) -> str:
+    """
+    Get the reported name of a checked file, prefixed with its site for the rendered
+    files of a chart site values set.
+    """
+    file_name = file.split("/")[-1]
+    return f"{site_dir}/{file_name}" if site_dir else file_name
+
+
+def get_finding_file_name(file_name: str, dep: dict) -> str:
+    """
+    Get the reported name of the file of a finding, followed by the file of the archive
+    it was found in.
+    """
+    return f"{file_name}/{dep['member']}" if dep.get("member") else file_name
+
+
+def check_rendered_files_deprecations(
+    k8s_version: Optional[str],
+    renders: Iterable[Tuple[Optional[str], str]],
+    include: tuple = FILES_INCLUDE,
+    exclude: tuple = (),
+    jobs: int = 1,
+    cache: ResultCache = None,
+) -> Iterator[Tuple[str, list]]:
+    """
+    Check the rendered files of the sites of a chart as soon as every site is rendered,
+    and name them after their site. The files of all the sites share the jobs.
+    """
+    sites: Dict[str, Optional[str]] = {}
+
+    def iter_rendered_files() -> Iterator[str]:
+        for site_dir, rendered_dir in renders:
+            for file in iter_files(rendered_dir, include, exclude):
+                sites[file] = site_dir
+                yield file
+
+    checked = check_files_deprecations(k8s_version, iter_rendered_files(), jobs, cache)
+    for file, deprecations in checked:
+        yield get_file_name(file, sites.pop(file)), deprecations
+
+
+def merge_files_deprecations(
+    checked: Iterable[Tuple[str, list]], report: Callable[[dict], None] = None
+) -> list:
+    result: Dict[tuple, dict] = {}
+    for file_name, deprecations in checked:
+        for dep in deprecations:
+            if dep:
+                dep["file_name"] = get_finding_file_name(file_name, dep)
+                key = get_file_deprecation_key(dep)
+                if key not in result:
+                    result[key] = dep
+                    if report:
+                        report(dep)
+
+    return list(result.values())
+
+
+def check_deprecations_in_manifest(manifest: str, k8s_version: str) -> list:
+    """
+    Check the deprecated apiVersions of the documents of a rendered manifest.
+    """
+    return [
+        check_deprecations(data, k8s_version) for data in yaml.safe_load_all(manifest)
+    ]
+
+
+def check_manifests_deprecations(
+    k8s_version: Optional[str], manifests: Iterable[Tuple[Optional[str], str, str]]
+) -> Iterator[Tuple[str, list]]:
+    version = k8s_version if k8s_version else _k8s_version()
+    for site_dir, source, manifest in manifests:
+        yield get_file_name(source, site_dir), check_deprecations_in_manifest(
+            manifest, version
+        )
+
+
+def check_deprecation_for_namespace_releases(
+    helm_binary: str, namespace: str, k8s_version: str = None, helm_version: str = None
+):
+    """
+    Check the deprecated apiVersions for all the releases in a namespace.
+    """
+    result = []
+
+    releases = helm_list_namespace_releases(helm_binary, namespace)
+    for _release in releases:
+        deprecations = get_deployed_deprecated_kinds(
+            helm_binary, _release, namespace, k8s_version
+        )
+        for dep in deprecations:
+            result.append(dep)
+
+    return result
+
+
+def check_release_deprecation(
+    helm_binary: str, release: str, namespace: str = None, k8s_version: str = None
+):
+    """
+    Check the deprecated apiVersions of the deployed release.
+    """
+    result = []
+
+    deprecations = get_deployed_deprecated_kinds(
+        helm_binary, release, namespace, k8s_version
+    )
+
+    for dep in deprecations:
+        result.append(dep)
+
+    return result
+
+
+@_table
+def print_table_format(data: dict, type: str):
+    """
+    Print the deprecation result in a table format
+    """
+    msg = "Checking the used apiVersions:"
+    title = [
+        "Release name" if type == "release" else "File Name",
+        "Kind",
+        "API Version",
+        "Name",
+        "Deprecated",
+        "Removed",
+        "Deprecated In Version",
+        "Removed In Version",
+        "Replacement API",
+    ]
+    table_data = [["\033[1m" + " %s" % word + "\033[0m" for word in title]]
+
+    for d in data:
+        table_data.append(
+            [
+                d["release_name"] if type == "release" else d["file_name"],
+                d["kind"],
+                d["api_version"],
+                d["name"],
+                d["deprecated"],
+                d["removed"],
+                d["deprecated_in_version"],
+                d["removed_in_version"],
+                d["replacement_api"],
+            ]
+        )
+
+    return table_data, msg
+
+
+def get_deprecation_message(dep: dict) -> Tuple[str, str]:
+    status = "removed" if dep["removed"] == "true" else "deprecated"
+    msg = f'The {dep["kind"]}: {dep["name"]} uses the {status} apiVersion: {dep["api_version"]}. Use {dep["replacement_api"]} instead.'
+    return status, msg
+
+
+def report_status(deprecations: List[Dict], format: bool = False):
+    _logger = applogger("exporter")
+    for dep in deprecations:
+        status, msg = get_deprecation_message(dep)
+        if format:
+            _logger.warning(msg) if status == "deprecated" else _logger.error(msg)
+        else:
+            print(msg)
+
+    if deprecations:
+        raise_api_versions_exception(deprecations)
+
+
+def report_line(dep: dict, format: bool = False, prefix: str = ""):
+    """
+    Print a finding on a single line prefixed with its file or release name.
+    """
+    status, msg = get_deprecation_message(dep)
+    msg = f'{prefix}{dep.get("file_name") or dep["release_name"]}: {msg}'
+    if format:
+        _logger = applogger("exporter")
+        _logger.warning(msg) if status == "deprecated" else _logger.error(msg)
+    else:
+        print(msg, flush=True)
+
+
+def raise_api_versions_exception(deprecations: List[Dict]) -> None:
+    """
+    This function raises an exception depending on the current deprecation status.
+    This exception will be handled later to set the Exit Code.
+    """
+    status = set()
+
+    for dep in deprecations:
+        if dep["removed"] == "true":
+            status.add("removed")
+        if dep["removed_in_next_release"] == "true":
+            status.add("removed_in_next_release")
+        if dep["deprecated"] == "true":
+            status.add("deprecated")
+
+    if "removed" in status:
+        raise RemovedAPIVersionError
+    if "removed_in_next_release" in status:
+        raise RemovedNextReleaseAPIVersionError
+    if "deprecated" in status:
+        raise DeprecatedAPIVersionError
+
+
+def get_kinds_from_helm_release(  # noqa: C901
+    helm_binary: str, release_name: str, namespace: str = None, helm_version: str = None
+):
+    """
+    Get all kinds from a helm release a long with the apiVersions to check the deprecation
+    """
+    result: List = []
+
+    if helm_version == HELM_2_VERSION:
+        helm_binary = HELM_V2_BINARY
+    elif helm_version == HELM_3_VERSION:
+        helm_binary = HELM_V3_BINARY
+
+    try:
+        release_info = helm_get(helm_binary, release_name, namespace)
+    except HelmCommandError:
+        logger.warning(f"release: {release_name} not found.")
+        return result
+
+    try:
+        with observe_manifest_parse(release_info), tracing.span(
+            "parse manifest", size=len(release_info)
+        ):
+            content = [data for data in yaml.safe_load_all(release_info)]
+    except yaml.scanner.ScannerError:
+        logger.error(f"Failed to parse the yaml content for release {release_name}.")
+
+        return result
+
+    for _kind in content:
+        if _kind:
+            if "REVISION" in _kind:
+                continue
+            dep = {
+                "kind": _kind["kind"],
+                "apiVersion": _kind["apiVersion"],
+                "metadata": {"name": _kind["metadata"]["name"]},
+            }
+            result.append(dep)
+
+    return result
+
+
+def get_deployed_deprecated_kinds(
+    helm_binary: str,
+    release_name: str,
+    namespace: str = None,
+    k8s_version: str = None,
+    helm_version: str = None,
+):
+    """
+    Get the deprecated apiVersions for the deployed kinds which are fetched from a helm release.
+    """
+    result: List = []
+    version = k8s_version if k8s_version else _k8s_version()
+
+    kinds = get_kinds_from_helm_release(
+        helm_binary, release_name, namespace, helm_version
+    )
+
+    if not kinds:
+        return result
+
+    logger.info(f"Checking the used apiVersions for release: {release_name}")
+    with tracing.span("check", objects=len(kinds)):
+        for _kind in kinds:
+            with observe_check():
+                dep = check_deprecations(_kind, version)
+            if dep:
+                dep["release_name"] = release_name
+                dep["namespace"] = namespace if namespace else release_name
+                result.append(dep)
+
+    return result
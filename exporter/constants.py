@@ -7,12 +7,32 @@ HELM_V3_BINARY = "helm3"
 HELM_2_VERSION = "v2"
 HELM_3_VERSION = "v3"
 HELM_2_AND_3_VERSION = "v23"  # Used to collect both Helm V2 and V3 releases
-DATA_FILE = "data/data.json"
+DATA_FILE = "data/kdave.db"
+LEGACY_DATA_FILE = "data/data.json"  # The default data file of the previous versions
+TRACE_DIR = "data/traces"
+CACHE_DIR = "~/.kdave/cache"
+CACHE_MAX_SIZE = 256 * 1024 * 1024  # Maximum size of the CLI cache in bytes
+DEPENDENCY_CACHE_DIR = "dependencies"  # The charts dependencies in the CLI cache
+DEPENDENCY_FILES = {  # The dependencies files of a chart and their keyed field
+    "Chart.yaml": "dependencies",
+    "requirements.yaml": "dependencies",
+    "requirements.lock": "digest",
+    "Chart.lock": "digest",
+}
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 MAXIMUM = 256  # Maximum Number of releases to fetch at once
+MAX_FILES_CHUNK_SIZE = 256  # Maximum Number of files checked by a worker at once
+STREAM_FILES_CHUNK_SIZE = 16  # Number of files checked by a worker during a walk
+FILES_INCLUDE = ("*.yaml", "*.yml")  # The globs of the checked files
+ARCHIVE_SUFFIXES = (".tgz", ".tar.gz", ".tar")  # The archives of charts and manifests
+WATCH_POLL_INTERVAL_SECONDS = 0.5  # Interval between the scans of the polling watcher
+WATCH_DEBOUNCE_SECONDS = 0.1  # Wait for the end of a burst of changes
+# The paths of a chart written by helm dependency update.
+CHART_DEPENDENCY_PATHS = ("charts", "tmpcharts", "requirements.lock", "Chart.lock")
 DEPRECATED_API_EXIT_CODE = 0
 REMOVED_NEXT_RELEASE_API_EXIT_CODE = 0
 REMOVED_API_EXIT_CODE = 10  # Non-zero exit code.
+FAILED_CHARTS_EXIT_CODE = 20  # Non-zero exit code.
 TIME_UNIT_TO_SECONDS = {
     "s": 1,
     "m": 60,
@@ -21,3 +41,47 @@ TIME_UNIT_TO_SECONDS = {
     "w": 60 * 60 * 24 * 7,
 }
 TIME_PATTERN = re.compile(r"^(\d+)([smhdw])$")
+# The documents of the helm template output, and the comment naming their template.
+HELM_DOCUMENT_SEPARATOR = re.compile(r"^---[ \t]*$", re.MULTILINE)
+HELM_SOURCE_PATTERN = re.compile(r"^# Source: (.+)$", re.MULTILINE)
+HELM_UNKNOWN_SOURCE = "manifest.yaml"
+PACKAGED_CHART_YAML_PATTERN = re.compile(r"^[^/]+/Chart\.yaml$")
+# Labels of the per-object "wf_k8s_deprecated_versions" metric.
+METRIC_LABELS = (
+    "deprecated",
+    "removed",
+    "kind",
+    "api_version",
+    "name",
+    "release_name",
+    "namespace",
+    "helm_version",
+    "replacement_api",
+    "deprecated_in_version",
+    "removed_in_version",
+    "release_last_update",
+    "k8s_version",
+    "removed_in_next_release",
+    "removed_in_next_2_releases",
+)
+METRICS_MODE_FULL = "full"  # Per-object series and aggregated families
+METRICS_MODE_AGGREGATED = "aggregated"  # Aggregated families only
+# Query string arguments accepted to filter the exported metrics.
+METRIC_FILTERS = ("namespace", "helm_version", "status")
+# Query string arguments accepted to filter the results of the JSON API.
+API_FILTERS = ("namespace", "release", "kind", "api_version", "status", "helm_version")
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+# Interval between the updates of the progress of a running helm check releases job.
+SCAN_PROGRESS_INTERVAL_SECONDS = 5
+# Progress of a running helm check releases job exported as gauges.
+SCAN_PROGRESS_METRICS = {
+    "releases_listed": "Number of the releases listed by the running job",
+    "releases_checked": "Number of the releases checked by the running job",
+    "queue_depth": "Number of the listed releases waiting to be checked",
+    "helm_calls_in_flight": "Number of the running helm calls to check releases",
+    "active_threads": "Number of the active release checker threads",
+    "throughput": "Number of the releases checked per second over the last 5 minutes",
+    "eta_seconds": "Estimated time left to check the listed releases in seconds",
+    "seconds_since_last_check": "Time since the last release was checked in seconds",
+}
@@ -48,3 +48,7 @@ class JobExecutionError(Exception):
 
 class HelmChartYamlFileMissing(HelmError):
     pass
+
+
+class FailedChartsError(HelmError):
+    pass
@@ -5,23 +5,32 @@ import queue
 import shutil
 import subprocess  # nosec
 import sys
+import tarfile
 import threading
 import time
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 from os.path import isdir, isfile
 from pathlib import Path
-from typing import Optional, TextIO
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
 
 import yaml
 from terminaltables import AsciiTable
 
+from exporter import tracing
+from exporter.cache import DependencyCache
 from exporter.constants import (
+    ARCHIVE_SUFFIXES,
     HELM_2_AND_3_VERSION,
     HELM_2_VERSION,
     HELM_3_VERSION,
+    HELM_DOCUMENT_SEPARATOR,
+    HELM_SOURCE_PATTERN,
     HELM_TEMPLATE_TMP_DIRECTORY,
+    HELM_UNKNOWN_SOURCE,
     HELM_V2_BINARY,
     HELM_V3_BINARY,
+    PACKAGED_CHART_YAML_PATTERN,
     TIME_PATTERN,
     TIME_UNIT_TO_SECONDS,
 )
@@ -30,6 +39,8 @@ from exporter.exceptions import (
     HelmCommandError,
     K8sYAMLReadError,
 )
+from exporter.progress import ScanProgress
+from exporter.telemetry import count_retry, observe_helm_command
 
 logger = logging.getLogger("exporter")
 
@@ -139,6 +150,7 @@ def retry(exec=HelmCommandError, total_tries=3, delay=1, backoff_factor=2):
                         f"Exception when executing the function: {func.__name__}\n {e}"
                     )
                     logger.warning(f"Retrying in {_delay} seconds.")
+                    count_retry(func.__name__)
                     time.sleep(_delay)
                     _delay *= backoff_factor
 
@@ -157,9 +169,10 @@ def _run_helm_command(command: list, capture_output=True):
         stdout = None
 
     try:
-        res = subprocess.run(  # nosec
-            command, capture_output=capture_output, stdout=stdout, check=True
-        )
+        with observe_helm_command(command):
+            res = subprocess.run(  # nosec
+                command, capture_output=capture_output, stdout=stdout, check=True
+            )
     except subprocess.CalledProcessError as e:
         error_msg = "Error while executing helm command: {} \n".format(e)
         if e.stdout is not None:
@@ -180,6 +193,9 @@ def _run_helm_command(command: list, capture_output=True):
 
 
 def get_chart_name(chart_path: str):
+    if chart_path.endswith(ARCHIVE_SUFFIXES) and isfile(chart_path):
+        return get_packaged_chart_name(chart_path)
+
     chart_yaml = f"{chart_path}/Chart.yaml"
     if not os.path.exists(chart_yaml) or os.stat(chart_yaml).st_size == 0:
         raise HelmChartYamlFileMissing(
@@ -190,26 +206,68 @@ def get_chart_name(chart_path: str):
     return chart_info["name"]
 
 
-def helm_build_dependencies(helm_binary: str, chart_path: str):
-    logger.info("Updating chart dependencies")
-    helm_command = [helm_binary, "dependency", "update", chart_path]
-    _run_helm_command(helm_command)
+def is_packaged_chart(archive: str) -> bool:
+    """
+    Check if an archive is a chart packaged by helm package, with a Chart.yaml file at
+    the root of its chart directory, rather than a bundle of manifests.
+    """
+    try:
+        with tarfile.open(archive, "r|*") as tar:
+            return any(
+                member.isfile() and PACKAGED_CHART_YAML_PATTERN.match(member.name)
+                for member in tar
+            )
+    except (OSError, tarfile.TarError) as e:
+        raise K8sYAMLReadError(e)
 
 
-def helm_template(  # noqa: C901
-    chart_path: str,
-    output_dir: str,
-    helm_binary: str,
-    values: str = None,
-    custom_values: str = None,
-    skip_dependencies: bool = False,
+def get_packaged_chart_name(chart_path: str):
+    """
+    Get the name of a chart packaged by helm package from the Chart.yaml file at the
+    root of its archive, without extracting it.
+    """
+    try:
+        with tarfile.open(chart_path, "r|*") as tar:
+            for member in tar:
+                if member.isfile() and PACKAGED_CHART_YAML_PATTERN.match(member.name):
+                    chart_info = yaml.safe_load(tar.extractfile(member))
+                    if chart_info:
+                        return chart_info["name"]
+    except (OSError, tarfile.TarError) as e:
+        raise K8sYAMLReadError(e)
+
+    raise HelmChartYamlFileMissing(
+        f"The Chart.yaml file is missing or is empty for chart: {chart_path}"
+    )
+
+
+def helm_build_dependencies(
+    helm_binary: str, chart_path: str, cache: DependencyCache = None
 ):
-    values_dir = f"{chart_path}/values"
-    prepare_template_tmp_dir(output_dir)
+    """
+    Update the dependencies of a chart, or restore them from the cache if the same
+    dependencies were already downloaded.
+    """
+    helm_command = [helm_binary, "dependency", "update", chart_path]
+    if cache is None:
+        logger.info("Updating chart dependencies")
+        _run_helm_command(helm_command)
+        return
+
+    key = cache.get_key(chart_path, helm_binary)
+    with cache.lock(key):
+        if cache.restore(key, chart_path):
+            logger.info("Restored chart dependencies from the cache")
+            return
+
+        logger.info("Updating chart dependencies")
+        _run_helm_command(helm_command)
+        cache.put(key, chart_path)
 
-    if isfile(f"{chart_path}/requirements.yaml") and not skip_dependencies:
-        helm_build_dependencies(helm_binary, chart_path)
 
+def get_helm_template_command(
+    chart_path: str, helm_binary: str, custom_values: str = None
+) -> list:
     name = get_chart_name(chart_path)
 
     helm_command = [helm_binary, "template", chart_path]
@@ -220,37 +278,187 @@ def helm_template(  # noqa: C901
 
     if custom_values:
         helm_command.extend(["--set", custom_values])
+
+    return helm_command
+
+
+def get_site_values(values_dir: str) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Get the instance, the site and the values file of every site of a chart values
+    directory, along with the directory of the rendered manifests of the site.
+    """
+    for val in Path(values_dir).glob("**/*.yaml"):
+        yield (*get_site(str(val)), str(val))
+
+
+def get_site(val: str) -> Tuple[str, str, str]:
+    """
+    Get the instance, the site and the directory of the rendered manifests of a site
+    values file.
+    """
+    instance = val.split("/")[-2]
+    site = (val.split("/")[-1]).split(".")[0]
+    site_dir = f"{instance}/{site}" if instance != "values" else site
+    return instance, site, site_dir
+
+
+def helm_template_site(
+    helm_command: List[str], output_dir: str, site_dir: str, val: str
+) -> str:
+    """
+    Template the values set of a site to its own directory of the output directory.
+    """
+    temp_values_dir = f"{output_dir}/{site_dir}"
+    make_dir(temp_values_dir)
+
+    helm_command_with_site_values = helm_command + [
+        "--output-dir",
+        temp_values_dir,
+        "--values",
+        val,
+    ]
+    _run_helm_command(helm_command_with_site_values)
+    return temp_values_dir
+
+
+def render_sites(
+    render: Callable[[str, str], Any], values_dir: str, jobs: int = 1
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Render the values set of every site of a chart values directory with render, running
+    up to jobs helm commands concurrently (0 uses all the CPUs). The result of every
+    site is yielded in the order of the sites as soon as it's rendered, and the failed
+    sites are logged and skipped.
+    """
+    sites = list(get_site_values(values_dir))
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(jobs, len(sites)) or 1) as executor:
+        futures = [
+            executor.submit(render, site_dir, val) for *_, site_dir, val in sites
+        ]
+        try:
+            for (instance, site, site_dir, _), future in zip(sites, futures):
+                try:
+                    yield site_dir, future.result()
+                except HelmCommandError:
+                    logger.error(
+                        f"Failed while templating for instance: {instance}, and site: {site}."
+                    )
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_helm_template(
+    chart_path: str,
+    output_dir: str,
+    helm_binary: str,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    jobs: int = 1,
+    dependency_cache: DependencyCache = None,
+) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    Template a chart to the output directory, and yield the site and the directory of
+    every rendered values set as soon as it's rendered. Every site is rendered to its
+    own directory, and the site is None if the chart has no values directory.
+    """
+    values_dir = f"{chart_path}/values"
+    prepare_template_tmp_dir(output_dir)
+
+    if isfile(f"{chart_path}/requirements.yaml") and not skip_dependencies:
+        helm_build_dependencies(helm_binary, chart_path, dependency_cache)
+
+    helm_command = get_helm_template_command(chart_path, helm_binary, custom_values)
     if values:
         helm_command.extend(["--values", values, "--output-dir", output_dir])
         _run_helm_command(helm_command)
+        yield None, output_dir
 
     elif isdir(values_dir):
-        site_values = list(Path(values_dir).glob("**/*.yaml"))
-        for val in site_values:
-            instance = str(val).split("/")[-2]
-            site = (str(val).split("/")[-1]).split(".")[0]
-            temp_values_dir = (
-                f"{output_dir}/{instance}/{site}"
-                if instance != "values"
-                else f"{output_dir}/{site}"
-            )
-            make_dir(temp_values_dir)
-
-            helm_command_with_site_values = helm_command + [
-                "--output-dir",
-                temp_values_dir,
-                "--values",
-                str(val),
-            ]
-            try:
-                _run_helm_command(helm_command_with_site_values)
-            except HelmCommandError:
-                logger.error(
-                    f"Failed while templating for instance: {instance}, and site: {site}."
-                )
+        render = partial(helm_template_site, helm_command, output_dir)
+        yield from render_sites(render, values_dir, jobs)
     else:
         helm_command.extend(["--output-dir", output_dir])
         _run_helm_command(helm_command)
+        yield None, output_dir
+
+
+def helm_template(
+    chart_path: str,
+    output_dir: str,
+    helm_binary: str,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    jobs: int = 1,
+    dependency_cache: DependencyCache = None,
+):
+    for _ in iter_helm_template(
+        chart_path,
+        output_dir,
+        helm_binary,
+        values,
+        custom_values,
+        skip_dependencies,
+        jobs,
+        dependency_cache,
+    ):
+        pass
+
+
+def split_helm_manifests(output: str) -> List[Tuple[str, str]]:
+    """
+    Split the output of helm template in the manifests of its templates, named after
+    the "# Source:" comment helm writes at the top of every rendered document.
+    """
+    manifests: Dict[str, List[str]] = {}
+    for document in HELM_DOCUMENT_SEPARATOR.split(output):
+        if not document.strip():
+            continue
+        match = HELM_SOURCE_PATTERN.search(document)
+        source = match.group(1).strip() if match else HELM_UNKNOWN_SOURCE
+        manifests.setdefault(source, []).append(document)
+
+    return [
+        (source, "\n---\n".join(documents)) for source, documents in manifests.items()
+    ]
+
+
+def helm_template_manifests(
+    chart_path: str,
+    helm_binary: str,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    jobs: int = 1,
+    dependency_cache: DependencyCache = None,
+) -> Iterator[Tuple[Optional[str], str, str]]:
+    """
+    Template a chart and yield its rendered manifests from the helm stdout, without any
+    output directory. Every manifest is yielded with its site, None if the chart has no
+    values directory, and named after the path helm writes it to with --output-dir.
+    """
+    values_dir = f"{chart_path}/values"
+
+    if isfile(f"{chart_path}/requirements.yaml") and not skip_dependencies:
+        helm_build_dependencies(helm_binary, chart_path, dependency_cache)
+
+    helm_command = get_helm_template_command(chart_path, helm_binary, custom_values)
+    if values or not isdir(values_dir):
+        if values:
+            helm_command.extend(["--values", values])
+        for source, manifest in split_helm_manifests(_run_helm_command(helm_command)):
+            yield None, source, manifest
+        return
+
+    def render(site_dir: str, val: str) -> List[Tuple[str, str]]:
+        return split_helm_manifests(_run_helm_command(helm_command + ["--values", val]))
+
+    for site_dir, manifests in render_sites(render, values_dir, jobs):
+        for source, manifest in manifests:
+            yield site_dir, f"{site_dir}/{source}", manifest
 
 
 def prepare_template_tmp_dir(output_dir: str):
@@ -313,6 +521,8 @@ def put_helm_v2_releases_in_queue(
     exit_event: threading.Event,
     error_event: threading.Event,
     max: int,
+    release_filter: Callable = None,
+    progress: ScanProgress = None,
 ):
     exit_event.clear()
     error_event.clear()
@@ -324,14 +534,14 @@ def put_helm_v2_releases_in_queue(
             releases = releases_info["Releases"]
             for release in releases:
                 release["helm_version"] = HELM_2_VERSION
-                put_release_in_queue(q, release)
+                put_release_in_queue(q, release, release_filter, progress)
             next = releases_info.get("Next")
             while next and not error_event.is_set():
                 remaining_releases = helm_list_all_releases(helm_binary, max, next)
                 next = yaml.safe_load(remaining_releases)["Next"]
                 for release in yaml.safe_load(remaining_releases)["Releases"]:
                     release["helm_version"] = HELM_2_VERSION
-                    put_release_in_queue(q, release)
+                    put_release_in_queue(q, release, release_filter, progress)
         while not q.empty():
             pass
 
@@ -347,6 +557,8 @@ def put_helm_v3_releases_in_queue(
     exit_event: threading.Event,
     error_event: threading.Event,
     max: int,
+    release_filter: Callable = None,
+    progress: ScanProgress = None,
 ):
     exit_event.clear()
     error_event.clear()
@@ -357,7 +569,7 @@ def put_helm_v3_releases_in_queue(
         if releases:
             for release in releases:
                 release["helm_version"] = HELM_3_VERSION
-                put_release_in_queue(q, release)
+                put_release_in_queue(q, release, release_filter, progress)
             next = max
             remaining_releases = yaml.safe_load(
                 helm_list_all_releases(helm_binary, max, next)
@@ -365,7 +577,7 @@ def put_helm_v3_releases_in_queue(
             while remaining_releases:
                 for release in remaining_releases:
                     release["helm_version"] = HELM_3_VERSION
-                    put_release_in_queue(q, release)
+                    put_release_in_queue(q, release, release_filter, progress)
                 next = next + max
                 remaining_releases = yaml.safe_load(
                     helm_list_all_releases(helm_binary, max, next)
@@ -383,7 +595,14 @@ def put_all_helm_releases_in_queue(
     error_event: threading.Event,
     max: int,
     helm_version: str = None,
+    release_filter: Callable = None,
+    progress: ScanProgress = None,
 ):
+    """
+    Put the deployed helm releases in the queue to be checked.
+    If a release filter is provided, only the releases accepted by the filter are checked.
+    The listed releases are counted in the scan progress if it's provided.
+    """
     # If the helm version is not provided, it collects the helm releases based on the helm binary
     if not helm_version:
         if helm_binary == HELM_V2_BINARY:
@@ -392,12 +611,23 @@ def put_all_helm_releases_in_queue(
             helm_version = HELM_3_VERSION
 
     if helm_version == HELM_2_VERSION:
-        put_helm_v2_releases_in_queue(HELM_V2_BINARY, q, exit_event, error_event, max)
+        put_helm_v2_releases_in_queue(
+            HELM_V2_BINARY, q, exit_event, error_event, max, release_filter, progress
+        )
     elif helm_version == HELM_3_VERSION:
-        put_helm_v3_releases_in_queue(HELM_V3_BINARY, q, exit_event, error_event, max)
+        put_helm_v3_releases_in_queue(
+            HELM_V3_BINARY, q, exit_event, error_event, max, release_filter, progress
+        )
     elif helm_version == HELM_2_AND_3_VERSION:
-        put_helm_v2_releases_in_queue(HELM_V2_BINARY, q, exit_event, error_event, max)
-        put_helm_v3_releases_in_queue(HELM_V3_BINARY, q, exit_event, error_event, max)
+        put_helm_v2_releases_in_queue(
+            HELM_V2_BINARY, q, exit_event, error_event, max, release_filter, progress
+        )
+        put_helm_v3_releases_in_queue(
+            HELM_V3_BINARY, q, exit_event, error_event, max, release_filter, progress
+        )
+
+    if progress:
+        progress.complete_listing()
 
 
 @retry(HelmCommandError, total_tries=10, delay=5)
@@ -411,24 +641,33 @@ def helm_list_all_releases(helm_binary: str, max: int, offset: str = None):
     if offset:
         helm_command.extend(["--offset", str(offset)])
 
-    releases = _run_helm_command(helm_command)
+    with tracing.span("helm list", offset=offset):
+        releases = _run_helm_command(helm_command)
 
     return releases
 
 
-def put_release_in_queue(q: queue.Queue, release: dict):
-    q.put(
-        {
-            "name": release["Name"] if ("Name" in release) else release["name"],
-            "helm_version": release["helm_version"],
-            "namespace": release["Namespace"]
-            if ("Namespace" in release)
-            else release["namespace"],
-            "release_last_update": release["Updated"]
-            if ("Updated" in release)
-            else release["updated"],
-        }
-    )
+def put_release_in_queue(
+    q: queue.Queue,
+    release: dict,
+    release_filter: Callable = None,
+    progress: ScanProgress = None,
+):
+    release_info = {
+        "name": release["Name"] if ("Name" in release) else release["name"],
+        "helm_version": release["helm_version"],
+        "namespace": release["Namespace"]
+        if ("Namespace" in release)
+        else release["namespace"],
+        "release_last_update": release["Updated"]
+        if ("Updated" in release)
+        else release["updated"],
+    }
+    if release_filter is None or release_filter(release_info):
+        q.put(release_info)
+        tracing.counter("queue", depth=q.qsize())
+        if progress:
+            progress.listed()
 
 
 def helm_get(helm_binary: str, release_name: str, namespace: str = None):
@@ -443,7 +682,8 @@ def helm_get(helm_binary: str, release_name: str, namespace: str = None):
 
         helm_command.extend(["--namespace", namespace])
 
-    return _run_helm_command(helm_command)
+    with tracing.span("helm get manifest", release=release_name, namespace=namespace):
+        return _run_helm_command(helm_command)
 
 
 def helm_release_exists(
@@ -467,12 +707,6 @@ def helm_release_exists(
     return True
 
 
-def append_to_list(first_list: list, second_list: list):
-    for item in first_list:
-        if item not in second_list:
-            second_list.append(item)
-
-
 def parse_duration(duration: str) -> int:
     match = TIME_PATTERN.match(duration)
     if not match:
@@ -0,0 +1,197 @@
+import zlib
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def get_shard(namespace: str, total: int) -> int:
+    """
+    Get the shard of a namespace. crc32 is used instead of hash() to keep the
+    shards stable across processes and restarts.
+    """
+    return zlib.crc32(namespace.encode("utf-8")) % total
+
+
+def get_release_key(item) -> Tuple[str, str, str]:
+    """
+    Get the identity of the release of a release or a deprecation. The releases of
+    helm 2 and helm 3 may have the same name in a namespace.
+    """
+    return (item["namespace"], item["release_name"], item["helm_version"])
+
+
+def get_deprecation_status(deprecation: dict) -> str:
+    return "removed" if deprecation["removed"] == "true" else "deprecated"
+
+
+def get_release_status(release: dict) -> str:
+    if release["has_removed_api_versions"] == "true":
+        return "removed"
+    if release["has_deprecated_api_versions"] == "true":
+        return "deprecated"
+
+    return "none"
+
+
+class ResultIndex:
+    """
+    In-memory secondary indexes over a published result set.
+    The records are sorted by their identity key, and every index maps a field value
+    to the sorted positions of the matching records. A selection costs the size of
+    its answer, and the identity key of the last record is a stable pagination cursor.
+    """
+
+    fields: Dict[str, Callable[[dict], str]] = {}
+    # The number of the fields of the identity key.
+    key_size = 0
+
+    def __init__(self, records: list):
+        self.records = sorted(records, key=self.sort_key)
+        self.keys = [self.sort_key(record) for record in self.records]
+        self.indexes: Dict[str, Dict[str, List[int]]] = {
+            field: {} for field in self.fields
+        }
+
+        for position, record in enumerate(self.records):
+            for field, get_value in self.fields.items():
+                self.indexes[field].setdefault(get_value(record), []).append(position)
+
+    @staticmethod
+    def sort_key(record: dict) -> Tuple:
+        return ()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _lookup(self, field: str, values: List[str]) -> set:
+        index = self.indexes[field]
+        positions: set = set()
+        for value in values:
+            positions.update(index.get(value, ()))
+
+        return positions
+
+    def _shard_positions(self, shard: int, total: int) -> set:
+        positions: set = set()
+        for namespace, namespace_positions in self.indexes["namespace"].items():
+            if get_shard(namespace, total) == shard:
+                positions.update(namespace_positions)
+
+        return positions
+
+    def positions(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        shard: Optional[int] = None,
+        total_shards: Optional[int] = None,
+    ):
+        """
+        Get the sorted positions of the records matching all the filters. Every filter
+        accepts a list of values which are matched if any of them matches.
+        """
+        candidates = [
+            self._lookup(field, values) for field, values in (filters or {}).items()
+        ]
+        if total_shards:
+            candidates.append(self._shard_positions(shard or 0, total_shards))
+
+        if not candidates:
+            return range(len(self.records))
+
+        candidates.sort(key=len)
+        return sorted(candidates[0].intersection(*candidates[1:]))
+
+    def select(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        shard: Optional[int] = None,
+        total_shards: Optional[int] = None,
+    ) -> list:
+        return [
+            self.records[position]
+            for position in self.positions(filters, shard, total_shards)
+        ]
+
+    def page(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        after: Optional[Tuple] = None,
+        limit: int = 100,
+    ) -> Tuple[list, int, Optional[Tuple]]:
+        """
+        Get a page of the records matching the filters which come after the identity key
+        of the previous page. Return the records, the total number of matches, and the
+        identity key to continue from if there are more records.
+        """
+        positions = self.positions(filters)
+        start = 0
+        if after is not None:
+            start = bisect_left(positions, bisect_right(self.keys, after))
+
+        page = [self.records[position] for position in positions[start : start + limit]]
+        more = start + limit < len(positions)
+
+        return page, len(positions), self.sort_key(page[-1]) if more else None
+
+
+class DeprecationIndex(ResultIndex):
+    fields = {
+        "namespace": lambda dep: dep["namespace"],
+        "release": lambda dep: dep["release_name"],
+        "kind": lambda dep: dep["kind"],
+        "api_version": lambda dep: dep["api_version"],
+        "helm_version": lambda dep: dep["helm_version"],
+        "status": get_deprecation_status,
+    }
+    key_size = 6
+
+    @staticmethod
+    def sort_key(dep: dict) -> Tuple:
+        return (
+            dep["namespace"],
+            dep["release_name"],
+            dep["helm_version"],
+            dep["kind"],
+            dep["name"],
+            dep["api_version"],
+        )
+
+
+class ReleaseIndex(ResultIndex):
+    fields = {
+        "namespace": lambda release: release["namespace"],
+        "release": lambda release: release["release_name"],
+        "helm_version": lambda release: release["helm_version"],
+        "status": get_release_status,
+    }
+    key_size = 3
+
+    @staticmethod
+    def sort_key(release: dict) -> Tuple:
+        return (release["namespace"], release["release_name"], release["helm_version"])
+
+    def __init__(self, release_stats: list, deprecations: DeprecationIndex):
+        super().__init__(release_stats)
+        positions = {key: position for position, key in enumerate(self.keys)}
+
+        # A release matches a kind or an apiVersion if any of its deprecations does.
+        for field in ("kind", "api_version"):
+            index: Dict[str, List[int]] = {}
+            for value, dep_positions in deprecations.indexes[field].items():
+                release_positions = {
+                    positions[key[:3]]
+                    for key in (deprecations.keys[p] for p in dep_positions)
+                    if key[:3] in positions
+                }
+                index[value] = sorted(release_positions)
+            self.indexes[field] = index
+
+
+class PublishedResults:
+    """
+    The indexes of a published scan identified by its generation.
+    """
+
+    def __init__(self, deprecations: list, release_stats: list, generation: int = 0):
+        self.generation = generation
+        self.deprecations = DeprecationIndex(deprecations)
+        self.releases = ReleaseIndex(release_stats, self.deprecations)
@@ -1,10 +1,14 @@
 import logging
 
 import click
+from click.core import ParameterSource
 
-from exporter.app import check_deprecations_all
+from exporter.checker import check_deprecations_all, discover_charts
 from exporter.constants import (
+    CACHE_DIR,
     DEPRECATED_API_EXIT_CODE,
+    FAILED_CHARTS_EXIT_CODE,
+    FILES_INCLUDE,
     HELM_TEMPLATE_TMP_DIRECTORY,
     HELM_V2_BINARY,
     REMOVED_API_EXIT_CODE,
@@ -12,6 +16,7 @@ from exporter.constants import (
 )
 from exporter.exceptions import (
     DeprecatedAPIVersionError,
+    FailedChartsError,
     RemovedAPIVersionError,
     RemovedNextReleaseAPIVersionError,
 )
@@ -38,9 +43,31 @@ def cli(ctx, debug):
     ctx.obj["debug"] = debug
 
 
+def get_charts(chart: tuple, charts_root: str = None) -> list:
+    charts = list(chart)
+    if charts_root:
+        charts.extend(discover_charts(charts_root))
+        if not charts:
+            raise click.UsageError(f"No chart found in {charts_root}.")
+
+    return charts
+
+
 @cli.command()
 @click.option("--source", "-s", "source", help="The full path of a file or directory.")
-@click.option("--chart", "-c", "chart", default=None, help="The full path of a chart.")
+@click.option(
+    "--chart",
+    "-c",
+    "chart",
+    multiple=True,
+    help="The full path of a chart. It can be repeated to check several charts.",
+)
+@click.option(
+    "--charts-root",
+    "charts_root",
+    default=None,
+    help="A directory whose charts, the directories with a Chart.yaml file, are all checked.",
+)
 @click.option(
     "--release", "-r", "release", default=None, help="The name of the release."
 )
@@ -106,6 +133,65 @@ def cli(ctx, debug):
     default=False,
     help="Skip building dependencies for the given chart. You can skip it if dependencies already exist in charts/ folder.",
 )
+@click.option(
+    "--in-memory/--no-in-memory",
+    "in_memory",
+    default=False,
+    help="Check the chart manifests rendered by helm template on its stdout, without writing them to the output directory.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    "jobs",
+    default=1,
+    type=click.IntRange(min=0),
+    help="The number of processes used to check the files. Use 0 to use all the CPUs.",
+)
+@click.option(
+    "--include",
+    "include",
+    multiple=True,
+    default=FILES_INCLUDE,
+    show_default=True,
+    help="The globs of the files checked in a source directory. It can be repeated.",
+)
+@click.option(
+    "--exclude",
+    "exclude",
+    multiple=True,
+    help="The globs of the files or directories skipped in a source directory. It can be repeated.",
+)
+@click.option(
+    "--stream/--no-stream",
+    "stream",
+    default=False,
+    help="Print every finding on a line as soon as it's found instead of the output at the end.",
+)
+@click.option(
+    "--watch/--no-watch",
+    "watch",
+    default=False,
+    help="Watch the source or the chart, and print the new findings prefixed with + and the fixed ones with - on every change.",
+)
+@click.option(
+    "--changed-since",
+    "changed_since",
+    default=None,
+    help="Check only the files of the source changed or added since a git ref, using git diff. All the files are checked if the versions file changed.",
+)
+@click.option(
+    "--cache/--no-cache",
+    "cache",
+    default=False,
+    help="Cache the results of the checked files, the unchanged files are not checked again.",
+)
+@click.option(
+    "--cache-dir",
+    "cache_dir",
+    default=CACHE_DIR,
+    show_default=True,
+    help="The cache directory used with --cache. It can be shared by concurrent runs.",
+)
 @click.option(
     "--deprecated-apis-exit-code",
     "deprecated_apis_exit_code",
@@ -124,13 +210,20 @@ def cli(ctx, debug):
     default=REMOVED_API_EXIT_CODE,
     help="Removed API versions exit code.",
 )
+@click.option(
+    "--failed-charts-exit-code",
+    "failed_charts_exit_code",
+    default=FAILED_CHARTS_EXIT_CODE,
+    help="The exit code when some of the checked charts failed to be checked.",
+)
 @click.pass_context
-def check(
+def check(  # noqa: C901
     ctx,
     source,
     tabulate,
     message,
     chart,
+    charts_root,
     helm_binary,
     version,
     format,
@@ -140,10 +233,49 @@ def check(
     namespace,
     release,
     skip_dependencies,
+    in_memory,
+    jobs,
+    include,
+    exclude,
+    stream,
+    watch,
+    changed_since,
+    cache,
+    cache_dir,
     deprecated_apis_exit_code,
     removed_apis_exit_code,
     removed_apis_in_next_release_exit_code,
+    failed_charts_exit_code,
 ):
+    if not cache and ctx.get_parameter_source("cache_dir") != ParameterSource.DEFAULT:
+        raise click.UsageError("--cache-dir is only used with --cache.")
+
+    charts = get_charts(chart, charts_root)
+    # A single chart is checked on its own, several charts are checked together.
+    chart = charts[0] if len(charts) == 1 else None
+
+    if watch:
+        if release or namespace or len(charts) > 1:
+            raise click.UsageError("--watch checks a source or a chart.")
+
+        # The watch mode is imported only when it's used.
+        from exporter.watch import watch_check
+
+        watch_check(
+            source,
+            helm_binary,
+            k8s_version=version,
+            chart=chart,
+            format=format,
+            output_dir=output_dir,
+            values=values,
+            custom_values=custom_values,
+            skip_dependencies=skip_dependencies,
+            include=include,
+            exclude=exclude,
+        )
+        return
+
     try:
         check_deprecations_all(
             source,
@@ -159,6 +291,14 @@ def check(
             skip_dependencies=skip_dependencies,
             release=release,
             namespace=namespace,
+            jobs=jobs,
+            include=include,
+            exclude=exclude,
+            stream=stream,
+            cache_dir=cache_dir if cache else None,
+            changed_since=changed_since,
+            in_memory=in_memory,
+            charts=tuple(charts) if len(charts) > 1 else (),
         )
     except RemovedAPIVersionError:
         ctx.exit(removed_apis_exit_code)
@@ -166,6 +306,8 @@ def check(
         ctx.exit(removed_apis_in_next_release_exit_code)
     except DeprecatedAPIVersionError:
         ctx.exit(deprecated_apis_exit_code)
+    except FailedChartsError:
+        ctx.exit(failed_charts_exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import cProfile
+import io
+import os.path
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+# Interval between the samples of the stacks of the profiled threads.
+SAMPLE_INTERVAL_SECONDS = 0.01
+# Number of frames stored by tracemalloc for every allocation.
+TRACEMALLOC_FRAMES = 1
+TOP_ALLOCATIONS = 25
+
+
+class ScanProfiler:
+    """
+    Profile the threads of a helm check releases job. Every thread gets its own
+    cProfile profiler since cProfile only profiles the thread which enables it, and
+    the profiles are merged in a single pstats report. A sampler thread also records
+    the stacks of the profiled threads in the collapsed format used by flame graphs.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.profiles: List[cProfile.Profile] = []
+        self.threads: Dict[int, str] = {}
+        self.stacks: Counter = Counter()
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(
+            target=self._sample, name="profile-sampler", daemon=True
+        )
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.sampler.join()
+
+    def profile(self, func: Callable) -> Callable:
+        @wraps(func)
+        def profiled(*args, **kwargs):
+            profile = cProfile.Profile()
+            tid = threading.get_ident()
+            with self.lock:
+                self.threads[tid] = threading.current_thread().name
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self.lock:
+                    self.profiles.append(profile)
+                    del self.threads[tid]
+
+        return profiled
+
+    def _sample(self):
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                threads = dict(self.threads)
+
+            for tid, name in threads.items():
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)})"
+                    )
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join([name] + stack[::-1])] += 1
+
+    def pstats(self, sort: str = "cumulative", limit: int = 50) -> str:
+        with self.lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return ""
+
+        stream = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+_profiler: Optional[ScanProfiler] = None
+
+
+def start_profiling() -> ScanProfiler:
+    global _profiler
+    _profiler = ScanProfiler()
+    _profiler.start()
+    return _profiler
+
+
+def stop_profiling() -> Optional[ScanProfiler]:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+
+    return profiler
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Profile the function in the thread which runs it if the profiling is enabled.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return func
+
+    return profiler.profile(func)
+
+
+class AllocationTracker:
+    """
+    Report the top allocation sites of the current process with tracemalloc. Every
+    report after the first one shows the growth since the previous report.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def report(self, limit: int = TOP_ALLOCATIONS) -> str:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.snapshot = None
+            return "Started tracing the memory allocations. Request a snapshot again to get the top allocation sites.\n"
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        if self.snapshot is None:
+            title = "Top allocation sites"
+            stats = snapshot.statistics("lineno")
+        else:
+            title = "Top allocation sites growth since the previous snapshot"
+            stats = snapshot.compare_to(self.snapshot, "lineno")
+        self.snapshot = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            title,
+            f"Traced memory: current {current} B, peak {peak} B",
+        ] + [str(stat) for stat in stats[:limit]]
+        return "\n".join(lines) + "\n"
+
+
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional
+
+# The throughput is computed over the releases checked in this window.
+THROUGHPUT_WINDOW_SECONDS = 300
+
+
+class ScanProgress:
+    """
+    Progress of a running helm check releases job, fed by the thread listing the
+    releases and by the release checker threads. The throughput is computed over a
+    rolling window, so the ETA follows the current pace of the job rather than its
+    average since the start.
+    """
+
+    def __init__(self, window: int = THROUGHPUT_WINDOW_SECONDS):
+        self.window = window
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.last_check = self.started
+        self.releases_listed = 0
+        self.releases_checked = 0
+        self.helm_calls_in_flight = 0
+        self.active_threads = 0
+        self.listing_completed = False
+        self.checks: Deque[float] = deque()
+
+    def listed(self):
+        with self.lock:
+            self.releases_listed += 1
+
+    def complete_listing(self):
+        with self.lock:
+            self.listing_completed = True
+
+    def checked(self):
+        now = time.monotonic()
+        with self.lock:
+            self.releases_checked += 1
+            self.last_check = now
+            self.checks.append(now)
+
+    @contextmanager
+    def helm_call(self):
+        with self.lock:
+            self.helm_calls_in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.helm_calls_in_flight -= 1
+
+    @contextmanager
+    def checker_thread(self):
+        with self.lock:
+            self.active_threads += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active_threads -= 1
+
+    def throughput(self, now: float) -> float:
+        """
+        Get the number of releases checked per second over the rolling window.
+        """
+        while self.checks and self.checks[0] < now - self.window:
+            self.checks.popleft()
+
+        elapsed = min(self.window, now - self.started)
+        return len(self.checks) / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self, throughput: float) -> Optional[float]:
+        """
+        Estimate the time left to check the listed releases. The estimate is a lower
+        bound until all the releases are listed, and unknown until a release is checked.
+        """
+        if not throughput:
+            return None
+
+        return (self.releases_listed - self.releases_checked) / throughput
+
+    def snapshot(self, queue_depth: int = 0) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            throughput = self.throughput(now)
+            return {
+                "releases_listed": self.releases_listed,
+                "releases_checked": self.releases_checked,
+                "queue_depth": queue_depth,
+                "helm_calls_in_flight": self.helm_calls_in_flight,
+                "active_threads": self.active_threads,
+                "listing_completed": self.listing_completed,
+                "throughput": round(throughput, 3),
+                "eta_seconds": self.eta_seconds(throughput),
+                "seconds_since_last_check": round(now - self.last_check, 3),
+            }
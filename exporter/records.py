@@ -0,0 +1,186 @@
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, FrozenSet, Iterator, List, Tuple
+
+from exporter.constants import METRIC_LABELS
+
+
+class Record(Mapping):
+    """
+    A compact read-only record of a check result. The fields are stored in __slots__,
+    the flags as booleans, and the strings are interned since most of them repeat across
+    the records (k8s version, kinds, apiVersions, namespaces...). A record is a mapping
+    of its fields to the exported values, so it can be read like the dicts used by the
+    metrics, the data file and the JSON API, where dict(record) gets the exported shape.
+    """
+
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    # The boolean fields, exported as "true" or "false".
+    flags: FrozenSet[str] = frozenset()
+
+    def __init__(self, **values):
+        flags = self.flags
+        for field in self.fields:
+            value = values[field]
+            if field in flags:
+                value = value is True or value == "true"
+            elif type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(self, field, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        return data if type(data) is cls else cls(**data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, field: str):
+        if field not in self.fields:
+            raise KeyError(field)
+
+        value = getattr(self, field)
+        if field in self.flags:
+            return "true" if value else "false"
+
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def values_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.values_tuple() == other.values_tuple()
+
+        return super().__eq__(other)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        # Pickle the raw values only, the strings repeated across the records of a
+        # list are written once by the pickle memo.
+        return _restore, (type(self), self.values_tuple())
+
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+def _restore(cls, values: tuple):
+    record = object.__new__(cls)
+    for field, value in zip(cls.fields, values):
+        if isinstance(value, str):
+            value = sys.intern(value)
+        object.__setattr__(record, field, value)
+
+    return record
+
+
+class Deprecation(Record):
+    """
+    A deployed object using a deprecated or removed apiVersion.
+    """
+
+    __slots__ = METRIC_LABELS
+    fields = METRIC_LABELS
+    deprecated: bool
+    removed: bool
+    kind: str
+    api_version: str
+    name: str
+    release_name: str
+    namespace: str
+    helm_version: str
+    replacement_api: str
+    deprecated_in_version: str
+    removed_in_version: str
+    release_last_update: str
+    k8s_version: str
+    removed_in_next_release: bool
+    removed_in_next_2_releases: bool
+    flags = frozenset(
+        (
+            "deprecated",
+            "removed",
+            "removed_in_next_release",
+            "removed_in_next_2_releases",
+        )
+    )
+
+    @property
+    def key(self) -> tuple:
+        return (
+            self.release_name,
+            self.namespace,
+            self.helm_version,
+            self.kind,
+            self.name,
+            self.api_version,
+        )
+
+
+class ReleaseStatus(Record):
+    """
+    The deprecation status of a deployed helm release.
+    """
+
+    __slots__ = (
+        "release_name",
+        "namespace",
+        "helm_version",
+        "has_deprecated_api_versions",
+        "has_removed_api_versions",
+    )
+    fields = __slots__
+    flags = frozenset(("has_deprecated_api_versions", "has_removed_api_versions"))
+    release_name: str
+    namespace: str
+    helm_version: str
+    has_deprecated_api_versions: bool
+    has_removed_api_versions: bool
+
+    @property
+    def key(self) -> tuple:
+        return (self.namespace, self.release_name, self.helm_version)
+
+
+class ResultSet:
+    """
+    The results of a scan indexed by their identity key. Adding the result of a release
+    replaces the previous result of the release and all its deprecations in constant
+    time, so the results of the checker threads are merged in linear time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.releases: Dict[tuple, ReleaseStatus] = {}
+        self.deprecations: Dict[tuple, Dict[tuple, Deprecation]] = {}
+
+    def __len__(self) -> int:
+        return len(self.releases)
+
+    def add(self, release: ReleaseStatus, deprecations: List[Deprecation]):
+        with self.lock:
+            self.releases[release.key] = release
+            self.deprecations[release.key] = {dep.key: dep for dep in deprecations}
+
+    def snapshot(self) -> Tuple[List[Deprecation], List[ReleaseStatus]]:
+        with self.lock:
+            return (
+                [
+                    dep
+                    for release_deprecations in self.deprecations.values()
+                    for dep in release_deprecations.values()
+                ],
+                list(self.releases.values()),
+            )
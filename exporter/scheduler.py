@@ -0,0 +1,137 @@
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+
+
+def _parse_cron_field(field: str, name: str, minimum: int, maximum: int) -> Set[int]:
+    """
+    Parse a cron field such as "*", "*/15", "1-5", "0,30" or "8-18/2"
+    """
+    values: Set[int] = set()
+    for part in field.split(","):
+        expression, _, step = part.partition("/")
+        if expression == "*":
+            start, end = minimum, maximum
+        elif "-" in expression:
+            start, end = (int(value) for value in expression.split("-", 1))
+        else:
+            start = int(expression)
+            end = maximum if step else start
+
+        if not minimum <= start <= end <= maximum:
+            raise ValueError(f'Invalid {name} "{part}" in cron expression')
+
+        values.update(range(start, end + 1, int(step) if step else 1))
+
+    return values
+
+
+class CronExpression:
+    """
+    A standard five fields cron expression: minute, hour, day of month, month and day of week.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(
+                f'The cron expression "{expression}" must have {len(CRON_FIELDS)} fields'
+            )
+        self.expression = expression
+        parsed: List[Set[int]] = []
+        try:
+            for field, (name, minimum, maximum) in zip(fields, CRON_FIELDS):
+                parsed.append(_parse_cron_field(field, name, minimum, maximum))
+        except ValueError as e:
+            raise ValueError(f'Invalid cron expression "{expression}": {e}')
+
+        self.minutes, self.hours, self.days, self.months, days_of_week = parsed
+        # Both 0 and 7 are Sunday.
+        self.days_of_week = {day % 7 for day in days_of_week}
+        self.any_day = fields[2] == "*"
+        self.any_day_of_week = fields[4] == "*"
+
+    def __repr__(self):
+        return f"CronExpression({self.expression!r})"
+
+    def _matches_day(self, date: datetime) -> bool:
+        day = date.day in self.days
+        day_of_week = (date.weekday() + 1) % 7 in self.days_of_week
+        # Like cron, a restricted day of month and day of week match if either matches.
+        if self.any_day or self.any_day_of_week:
+            return day and day_of_week
+
+        return day or day_of_week
+
+    def next_after(self, date: datetime) -> datetime:
+        """
+        Get the first time matching the expression strictly after the provided date.
+        """
+        date = date.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = date + timedelta(days=366 * 5)
+        while date < limit:
+            if date.month not in self.months:
+                date = (
+                    date.replace(day=1, hour=0, minute=0) + timedelta(days=32)
+                ).replace(day=1)
+            elif not self._matches_day(date):
+                date = date.replace(hour=0, minute=0) + timedelta(days=1)
+            elif date.hour not in self.hours:
+                date = date.replace(minute=0) + timedelta(hours=1)
+            elif date.minute not in self.minutes:
+                date += timedelta(minutes=1)
+            else:
+                return date
+
+        raise ValueError(f'The cron expression "{self.expression}" never matches')
+
+
+class ScanScheduler:
+    """
+    Schedule the helm check releases jobs every interval after the last run, or at the
+    times matching a cron expression. A random jitter is added to every scheduled run
+    to avoid running the jobs of several servers at the same time.
+    """
+
+    def __init__(
+        self, interval: int, jitter: int = 0, cron: Optional[CronExpression] = None
+    ):
+        self.interval = interval
+        self.jitter = jitter
+        self.cron = cron
+        self._last_run: Optional[datetime] = None
+        self._next_run: Optional[datetime] = None
+
+    def next_run(self, last_run: Optional[datetime]) -> datetime:
+        """
+        Get the time of the next run after the provided last run.
+        The next run is computed once per last run, so the jitter stays the same.
+        """
+        if last_run is None:
+            return datetime.now()
+
+        if last_run != self._last_run or self._next_run is None:
+            scheduled = (
+                self.cron.next_after(last_run)
+                if self.cron
+                else last_run + timedelta(seconds=self.interval)
+            )
+            jitter = random.uniform(0, self.jitter) if self.jitter else 0  # nosec
+            self._last_run = last_run
+            self._next_run = scheduled + timedelta(seconds=jitter)
+
+        return self._next_run
+
+    def seconds_until_next_run(self, last_run: Optional[datetime]) -> float:
+        return max(0.0, (self.next_run(last_run) - datetime.now()).total_seconds())
+
+    def is_due(self, last_run: Optional[datetime]) -> bool:
+        return self.seconds_until_next_run(last_run) == 0
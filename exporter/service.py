@@ -4,7 +4,7 @@ import logging
 from flask import Flask
 from gevent.pywsgi import WSGIServer
 
-from exporter.app import check_release_deprecation
+from exporter.checker import check_release_deprecation
 from exporter.constants import HELM_V2_BINARY
 from exporter.helper import helm_release_exists
 
@@ -0,0 +1,300 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Mapping, Optional, cast
+
+from exporter.constants import DATA_FILE, LEGACY_DATA_FILE, METRIC_LABELS
+from exporter.index import get_release_key, get_shard
+from exporter.records import Deprecation, ReleaseStatus
+
+logger = logging.getLogger("exporter")
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+RELEASE_COLUMNS = (
+    "namespace",
+    "release_name",
+    "helm_version",
+    "has_deprecated_api_versions",
+    "has_removed_api_versions",
+)
+DEPRECATION_COLUMNS = METRIC_LABELS
+SCAN_COLUMNS = (
+    "last_run",
+    "duration_seconds",
+    "number_deployed_releases",
+    "number_releases_with_deprecated_api_versions",
+    "number_releases_with_removed_api_versions",
+)
+NEXT_SHARD_KEY = "next_shard"
+
+# The version of the schema, saved as the user_version of the data file.
+SCHEMA_VERSION = 1
+RELEASES_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS releases (
+    {", ".join(f"{column} TEXT NOT NULL" for column in RELEASE_COLUMNS)},
+    scan_id INTEGER NOT NULL,
+    PRIMARY KEY (namespace, release_name, helm_version)
+);
+"""
+# The releases of the schema version 0 were keyed by their namespace and name only.
+RELEASES_MIGRATION = f"""
+BEGIN;
+ALTER TABLE releases RENAME TO previous_releases;
+{RELEASES_SCHEMA}
+INSERT INTO releases SELECT * FROM previous_releases;
+DROP TABLE previous_releases;
+COMMIT;
+"""
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    last_run TEXT NOT NULL,
+    duration_seconds INTEGER,
+    number_deployed_releases INTEGER,
+    number_releases_with_deprecated_api_versions INTEGER,
+    number_releases_with_removed_api_versions INTEGER,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+{RELEASES_SCHEMA}
+CREATE TABLE IF NOT EXISTS deprecations (
+    {", ".join(f"{column} TEXT NOT NULL" for column in DEPRECATION_COLUMNS)},
+    scan_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deprecations_release ON deprecations (namespace, release_name);
+CREATE INDEX IF NOT EXISTS deprecations_kind ON deprecations (kind);
+CREATE INDEX IF NOT EXISTS deprecations_api_version ON deprecations (api_version);
+"""
+
+
+def _insert(table: str, columns: tuple) -> str:
+    return f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"  # nosec
+
+
+class ResultStore:
+    """
+    SQLite store of the helm releases check results.
+    Every release is upserted with its deprecations in a single transaction as soon as
+    it's checked, and a scan is marked as completed once all the releases are checked.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        legacy_path = path
+        if os.path.normpath(path) == os.path.normpath(DATA_FILE) and not os.path.exists(
+            path
+        ):
+            # The previous versions wrote their data to another default file.
+            legacy_path = LEGACY_DATA_FILE
+        legacy_data = self._read_legacy_data_file(legacy_path)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.create_function("shard", 2, get_shard)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        if legacy_data:
+            logger.info(f"Importing the JSON data file: {legacy_path}")
+            self.save(
+                legacy_data.get("deprecations", []),
+                legacy_data.get("release_stats", []),
+                {column: legacy_data.get(column) for column in SCAN_COLUMNS},
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _read_legacy_data_file(self, path: str) -> Optional[dict]:
+        """
+        Read the data file written by the previous versions as a single JSON document.
+        The JSON file is renamed so the store can be created in its place.
+        """
+        if not os.path.isfile(path) or os.stat(path).st_size == 0:
+            return None
+
+        with open(path, "rb") as fd:
+            if fd.read(len(SQLITE_HEADER)) == SQLITE_HEADER:
+                return None
+            fd.seek(0)
+            try:
+                data = json.load(fd)
+            except ValueError:
+                logger.error(f"Ignoring the invalid data file: {path}")
+                data = None
+
+        os.replace(path, f"{path}.bak")
+        return data if data and data.get("last_run") else None
+
+    def _migrate(self):
+        """
+        Migrate the tables of a data file created by a previous version of the schema.
+        """
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        has_releases = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'releases'"
+        ).fetchone()
+        if version < 1 and has_releases:
+            logger.info(f"Migrating the releases of the data file: {self.path}")
+            self.connection.executescript(RELEASES_MIGRATION)
+
+    def _insert_scan(self, last_run: str) -> int:
+        cursor = self.connection.execute(
+            "INSERT INTO scans (last_run) VALUES (?)", (last_run,)
+        )
+        # The id of a row inserted by an INSERT is never None.
+        return cast(int, cursor.lastrowid)
+
+    def start_scan(self, last_run: str) -> int:
+        with self.lock, self.connection:
+            return self._insert_scan(last_run)
+
+    def _upsert_release(
+        self, scan_id: int, release: Mapping, deprecations: List[Mapping]
+    ):
+        self.connection.execute(
+            _insert("releases", RELEASE_COLUMNS + ("scan_id",)),
+            [release[column] for column in RELEASE_COLUMNS] + [scan_id],
+        )
+        self.connection.execute(
+            "DELETE FROM deprecations WHERE namespace = ? AND release_name = ? AND helm_version = ?",
+            get_release_key(release),
+        )
+        self.connection.executemany(
+            _insert("deprecations", DEPRECATION_COLUMNS + ("scan_id",)),
+            (
+                [dep[column] for column in DEPRECATION_COLUMNS] + [scan_id]
+                for dep in deprecations
+            ),
+        )
+
+    def upsert_release(
+        self, scan_id: int, release: Mapping, deprecations: List[Mapping]
+    ):
+        """
+        Replace the stored check result of a release.
+        """
+        with self.lock, self.connection:
+            self._upsert_release(scan_id, release, deprecations)
+
+    def finish_scan(
+        self,
+        scan_id: int,
+        stats: dict,
+        shard: Optional[int] = None,
+        total_shards: Optional[int] = None,
+    ):
+        """
+        Mark the scan as completed and delete the releases that were not seen by it.
+        If the scan checked a shard of the namespaces, only the releases of this shard are deleted.
+        """
+        with self.lock, self.connection:
+            self._finish_scan(scan_id, stats, shard, total_shards)
+
+    def _finish_scan(
+        self,
+        scan_id: int,
+        stats: dict,
+        shard: Optional[int] = None,
+        total_shards: Optional[int] = None,
+    ):
+        self.connection.execute(
+            f"UPDATE scans SET {', '.join(f'{column} = ?' for column in SCAN_COLUMNS)}, completed = 1 WHERE id = ?",  # nosec
+            [stats[column] for column in SCAN_COLUMNS] + [scan_id],
+        )
+        outdated = "scan_id != ?"
+        parameters: tuple = (scan_id,)
+        if total_shards:
+            outdated += " AND shard(namespace, ?) = ?"
+            parameters += (total_shards, shard)
+        for table in ("releases", "deprecations"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE {outdated}", parameters  # nosec
+            )
+        self.connection.execute("DELETE FROM scans WHERE id < ?", (scan_id,))
+        if total_shards:
+            # The next scan checks the next shard, even after a restart.
+            self._set_metadata(NEXT_SHARD_KEY, str(((shard or 0) + 1) % total_shards))
+
+    def save(
+        self, deprecations: List[Mapping], release_stats: List[Mapping], stats: dict
+    ):
+        """
+        Replace all the stored results with a completed scan in a single transaction.
+        """
+        releases: dict = {get_release_key(release): [] for release in release_stats}
+        for dep in deprecations:
+            releases.setdefault(get_release_key(dep), []).append(dep)
+
+        with self.lock, self.connection:
+            scan_id = self._insert_scan(stats["last_run"])
+            for release in release_stats:
+                self._upsert_release(
+                    scan_id,
+                    release,
+                    releases[get_release_key(release)],
+                )
+            self._finish_scan(scan_id, stats)
+
+    def _set_metadata(self, key: str, value: str):
+        self.connection.execute(_insert("metadata", ("key", "value")), (key, value))
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+
+        return row["value"] if row else None
+
+    def last_scan(self) -> Optional[dict]:
+        """
+        Get the statistics of the last completed scan.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM scans WHERE completed = 1 ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+
+        return dict(row) if row else None
+
+    def load(self) -> dict:
+        """
+        Load the results of the last completed scan as records.
+        """
+        scan = self.last_scan() or {}
+        with self.lock:
+            deprecations = self.connection.execute(
+                f"SELECT {', '.join(DEPRECATION_COLUMNS)} FROM deprecations "  # nosec
+                "ORDER BY namespace, release_name, helm_version, kind, name, api_version"
+            ).fetchall()
+            releases = self.connection.execute(
+                f"SELECT {', '.join(RELEASE_COLUMNS)} FROM releases "  # nosec
+                "ORDER BY namespace, release_name, helm_version"
+            ).fetchall()
+
+        return {
+            "data": [Deprecation(**row) for row in deprecations],
+            "release_stats": [ReleaseStatus(**row) for row in releases],
+            "last_run": scan.get("last_run", ""),
+            "duration_seconds": scan.get("duration_seconds", ""),
+        }
@@ -0,0 +1,163 @@
+import os.path
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from exporter.constants import (
+    HELM_2_VERSION,
+    HELM_3_VERSION,
+    HELM_V2_BINARY,
+    HELM_V3_BINARY,
+)
+
+# Upper bounds of the manifest size buckets in bytes.
+MANIFEST_SIZE_BUCKETS = (
+    (10 * 1024, "10KiB"),
+    (100 * 1024, "100KiB"),
+    (1024 * 1024, "1MiB"),
+)
+
+NULL_OBSERVATION = nullcontext()
+
+
+class PipelineMetrics:
+    """
+    The self-monitoring metrics of the scan pipeline. They are kept in a separate
+    registry so they are never mixed with the exported deprecations.
+    """
+
+    def __init__(self):
+        from prometheus_client import Counter, Histogram
+        from prometheus_client.core import CollectorRegistry
+
+        self.registry = CollectorRegistry()
+        self.helm_command_duration = Histogram(
+            name="wf_k8s_deprecated_versions_helm_command_duration_seconds",
+            documentation="Duration of the helm commands by subcommand and helm version",
+            labelnames=("subcommand", "helm_version"),
+            buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+            registry=self.registry,
+        )
+        self.helm_command_errors = Counter(
+            name="wf_k8s_deprecated_versions_helm_command_errors_total",
+            documentation="Number of the failed helm commands by subcommand and helm version",
+            labelnames=("subcommand", "helm_version"),
+            registry=self.registry,
+        )
+        self.retries = Counter(
+            name="wf_k8s_deprecated_versions_retries_total",
+            documentation="Number of the retried function calls by function",
+            labelnames=("function",),
+            registry=self.registry,
+        )
+        self.manifest_parse_duration = Histogram(
+            name="wf_k8s_deprecated_versions_manifest_parse_duration_seconds",
+            documentation="Duration of the parsing of the helm release manifests by manifest size",
+            labelnames=("manifest_size",),
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+            registry=self.registry,
+        )
+        self.check_duration = Histogram(
+            name="wf_k8s_deprecated_versions_check_duration_seconds",
+            documentation="Duration of the deprecation check of a single object",
+            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+            registry=self.registry,
+        )
+
+    def render(self) -> str:
+        from prometheus_client import generate_latest
+
+        return generate_latest(self.registry).decode("utf-8")
+
+
+_metrics: Optional[PipelineMetrics] = None
+
+
+def enable() -> PipelineMetrics:
+    """
+    Record the self-monitoring metrics. Only the server enables them, so the CLI never
+    imports prometheus_client and the observations below are no-ops there.
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = PipelineMetrics()
+
+    return _metrics
+
+
+def get_helm_version_label(helm_binary: str) -> str:
+    if helm_binary == HELM_V2_BINARY:
+        return HELM_2_VERSION
+    if helm_binary == HELM_V3_BINARY:
+        return HELM_3_VERSION
+
+    return os.path.basename(helm_binary)
+
+
+def get_manifest_size_label(size: int) -> str:
+    for bound, label in MANIFEST_SIZE_BUCKETS:
+        if size <= bound:
+            return label
+
+    return "+Inf"
+
+
+@contextmanager
+def _observe_helm_command(metrics: PipelineMetrics, command: list):
+    labels = (
+        command[1] if len(command) > 1 else "",
+        get_helm_version_label(command[0]),
+    )
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        metrics.helm_command_errors.labels(*labels).inc()
+        raise
+    finally:
+        metrics.helm_command_duration.labels(*labels).observe(
+            time.perf_counter() - start
+        )
+
+
+def observe_helm_command(command: list):
+    """
+    Observe the duration of a helm command, and count it as an error if it fails.
+    """
+    metrics = _metrics
+    if metrics is None:
+        return NULL_OBSERVATION
+
+    return _observe_helm_command(metrics, command)
+
+
+def observe_manifest_parse(manifest: str):
+    metrics = _metrics
+    if metrics is None:
+        return NULL_OBSERVATION
+
+    return metrics.manifest_parse_duration.labels(
+        get_manifest_size_label(len(manifest))
+    ).time()
+
+
+def observe_check():
+    metrics = _metrics
+    if metrics is None:
+        return NULL_OBSERVATION
+
+    return metrics.check_duration.time()
+
+
+def count_retry(function: str):
+    metrics = _metrics
+    if metrics is not None:
+        metrics.retries.labels(function).inc()
+
+
+def render_self_metrics() -> str:
+    metrics = _metrics
+    if metrics is None:
+        return ""
+
+    return metrics.render()
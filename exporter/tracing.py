@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+# Returned by span() when the tracing is disabled, so a disabled span costs a
+# global lookup and nothing is recorded.
+NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Record the spans of a helm check releases job as Chrome trace events, which
+    can be opened in Perfetto or chrome://tracing. Every thread gets its own track.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        self.events: List[dict] = []
+        self.threads: Dict[int, str] = {}
+
+    def _timestamp(self) -> float:
+        return (time.perf_counter() - self.started) * 1e6
+
+    def _thread(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            with self.lock:
+                self.threads[tid] = threading.current_thread().name
+
+        return tid
+
+    @contextmanager
+    def span(self, name: str, category: str, args: dict):
+        tid = self._thread()
+        start = self._timestamp()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": self._timestamp() - start,
+                "pid": self.pid,
+                "tid": tid,
+                "args": args,
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def counter(self, name: str, values: dict):
+        event = {
+            "name": name,
+            "ph": "C",
+            "ts": self._timestamp(),
+            "pid": self.pid,
+            "args": values,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def trace_events(self) -> List[dict]:
+        with self.lock:
+            metadata = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self.threads.items()
+            ]
+            return metadata + sorted(self.events, key=lambda event: event["ts"])
+
+    def save(self, path: str):
+        """
+        Write the trace events in the Chrome JSON trace format.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as fd:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, fd)
+        os.replace(tmp_path, path)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, category: str = "scan", **args):
+    """
+    Record a span of the running job if the tracing is enabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+
+    return tracer.span(name, category, args)
+
+
+def counter(name: str, **values):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.counter(name, values)
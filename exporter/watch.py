@@ -0,0 +1,487 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import os.path
+import select
+import shutil
+import struct
+import sys
+import time
+from os.path import isdir, isfile
+from typing import Dict, Iterator, Set, Tuple
+
+from exporter.cache import hash_file
+from exporter.checker import (
+    _k8s_version,
+    check_deprecations_in_files,
+    get_finding_file_name,
+    is_excluded,
+    iter_files,
+    match_globs,
+    report_line,
+)
+from exporter.constants import (
+    CHART_DEPENDENCY_PATHS,
+    FILES_INCLUDE,
+    HELM_TEMPLATE_TMP_DIRECTORY,
+    WATCH_DEBOUNCE_SECONDS,
+    WATCH_POLL_INTERVAL_SECONDS,
+)
+from exporter.exceptions import HelmCommandError
+from exporter.helper import (
+    get_helm_template_command,
+    get_site,
+    helm_template,
+    helm_template_site,
+)
+
+logger = logging.getLogger("exporter")
+
+# inotify events, see inotify(7).
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+# struct inotify_event: wd, mask, cookie, len, followed by the name.
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+    Watch the files of a directory by comparing their modification times and sizes
+    every interval.
+    """
+
+    def __init__(self, root: str, interval: float = WATCH_POLL_INTERVAL_SECONDS):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> Dict[str, tuple]:
+        snapshot = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def changes(self, timeout: float = None) -> Set[str]:
+        """
+        Wait for changes, and return the changed paths or an empty set after timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def parse_inotify_events(data: bytes) -> Iterator[Tuple[int, int, str]]:
+    offset = 0
+    while offset < len(data):
+        wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+        offset += INOTIFY_EVENT.size
+        name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+        offset += length
+        yield wd, mask, name
+
+
+class InotifyWatcher:
+    """
+    Watch the files of a directory with the Linux inotify API called through ctypes.
+    Every directory of the tree is watched, including the ones created later.
+    """
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError(f"inotify is not available on {sys.platform}")
+
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.watches: Dict[int, str] = {}
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add_tree(self, root: str) -> Set[str]:
+        """
+        Watch the directories of a tree, and return its files.
+        """
+        files: Set[str] = set()
+        for directory, _, names in os.walk(root):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"{os.strerror(errno)}: {directory}")
+            self.watches[wd] = directory
+            files.update(os.path.join(directory, name) for name in names)
+
+        return files
+
+    def read_events(self) -> Set[str]:  # noqa: C901
+        changed: Set[str] = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        for wd, mask, name in parse_inotify_events(data):
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    changed.update(self.add_tree(path))
+                except OSError as e:
+                    logger.warning(f"Failed to watch the directory: {path}. {e}")
+
+        return changed
+
+    def changes(self, timeout: float = None) -> Set[str]:
+        """
+        Wait for changes, and return the changed paths or an empty set after timeout.
+        The changes are collected until the end of a burst, like an editor saving a file.
+        """
+        changed: Set[str] = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            changed.update(self.read_events())
+            ready, _, _ = select.select([self.fd], [], [], WATCH_DEBOUNCE_SECONDS)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def get_watcher(root: str):
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError) as e:
+        logger.info(f"Watching the files by polling, inotify is not available: {e}")
+        return PollingWatcher(root)
+
+
+class WatchedSource:
+    """
+    The findings of the files of a source. Only the changed files are checked again,
+    the results of the other files are kept in memory.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        k8s_version: str,
+        include: tuple = FILES_INCLUDE,
+        exclude: tuple = (),
+    ):
+        self.source = source
+        self.k8s_version = k8s_version
+        self.include = include
+        self.exclude = exclude
+        # The watched directory, and the directory of the reported file names.
+        self.root = source if isdir(source) else os.path.dirname(source) or "."
+        self.files_root = self.root
+        self.results: Dict[str, list] = {}
+        for file in iter_files(source, include, exclude):
+            self.check(file)
+
+    def check(self, file: str):
+        try:
+            deprecations = check_deprecations_in_files(file, self.k8s_version)
+        except Exception as e:
+            # A file being edited is often invalid, it's checked again on its next change.
+            logger.error(f"Failed to check the file: {file}. {e}")
+            deprecations = []
+
+        self.results[file] = [dep for dep in deprecations if dep]
+
+    def accepts(self, path: str) -> bool:
+        if not isdir(self.source):
+            return os.path.normpath(path) == os.path.normpath(self.source)
+
+        relative_path = os.path.relpath(path, self.source).replace(os.sep, "/")
+        return match_globs(
+            os.path.basename(path), relative_path, self.include
+        ) and not is_excluded(relative_path, self.exclude)
+
+    def update(self, changed: Set[str]):
+        affected: Set[str] = set()
+        for path in changed:
+            # A moved or deleted directory affects all its files.
+            affected.update(
+                file
+                for file in self.results
+                if file == path or file.startswith(path + os.sep)
+            )
+            if not isdir(path):
+                affected.add(path)
+
+        for file in affected:
+            if isfile(file) and self.accepts(file):
+                self.check(file)
+            else:
+                self.results.pop(file, None)
+
+    def findings(self) -> Dict[tuple, dict]:
+        findings: Dict[tuple, dict] = {}
+        for file in sorted(self.results):
+            file_name = os.path.relpath(file, self.files_root)
+            for dep in self.results[file]:
+                dep_file_name = get_finding_file_name(file_name, dep)
+                findings.setdefault(
+                    (dep_file_name, dep["kind"], dep["name"], dep["api_version"]),
+                    dict(dep, file_name=dep_file_name),
+                )
+
+        return findings
+
+
+class WatchedChart(WatchedSource):
+    """
+    The findings of a chart. The chart is templated again when one of its files
+    changes, only the site of a changed site values file is templated again, and only
+    the rendered files which changed are checked again.
+    """
+
+    def __init__(
+        self,
+        chart: str,
+        helm_binary: str,
+        k8s_version: str,
+        output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
+        values: str = None,
+        custom_values: str = None,
+        skip_dependencies: bool = False,
+    ):
+        self.chart = chart
+        self.helm_binary = helm_binary
+        self.k8s_version = k8s_version
+        self.output_dir = output_dir
+        self.values = values
+        self.custom_values = custom_values
+        self.skip_dependencies = skip_dependencies
+        self.root = chart
+        self.files_root = output_dir
+        self.values_dir = os.path.join(chart, "values")
+        self.results: Dict[str, list] = {}
+        self.hashes: Dict[str, str] = {}
+        self.rendered = False
+        self.site_values = False
+        self.render()
+
+    def render(self, update_dependencies: bool = False):
+        if self.rendered and isdir(self.output_dir):
+            # The output directory is removed here since its removal was already
+            # confirmed when the chart was templated the first time.
+            shutil.rmtree(self.output_dir)
+
+        # The dependencies are updated by the first render, and again only when they
+        # change.
+        skip_dependencies = self.skip_dependencies or (
+            self.rendered and not update_dependencies
+        )
+        try:
+            helm_template(
+                self.chart,
+                self.output_dir,
+                self.helm_binary,
+                self.values,
+                self.custom_values,
+                skip_dependencies,
+            )
+        except HelmCommandError as e:
+            logger.error(f"Failed to template the chart: {self.chart}. {e}")
+            return
+
+        self.rendered = True
+        # Every site of the values directory was templated to its own directory.
+        self.site_values = not self.values and isdir(self.values_dir)
+        self.collect(self.output_dir)
+
+    def render_site(self, val: str):
+        instance, site, site_dir = get_site(val)
+        site_output_dir = f"{self.output_dir}/{site_dir}"
+        if isdir(site_output_dir):
+            shutil.rmtree(site_output_dir)
+
+        if isfile(val):
+            helm_command = get_helm_template_command(
+                self.chart, self.helm_binary, self.custom_values
+            )
+            try:
+                helm_template_site(helm_command, self.output_dir, site_dir, val)
+            except HelmCommandError:
+                logger.error(
+                    f"Failed while templating for instance: {instance}, and site: {site}."
+                )
+
+        self.collect(site_output_dir)
+
+    def collect(self, directory: str):
+        """
+        Check the rendered files of a directory which changed since they were checked.
+        """
+        prefix = os.path.join(directory, "")
+        hashes = {
+            file: self.hashes.pop(file)
+            for file in list(self.hashes)
+            if file.startswith(prefix)
+        }
+        results = {file: self.results.pop(file) for file in hashes}
+        if not isdir(directory):
+            return
+
+        for file in iter_files(directory):
+            self.hashes[file] = hash_file(file)
+            if hashes.get(file) == self.hashes[file]:
+                self.results[file] = results[file]
+            else:
+                self.check(file)
+
+    def accepts(self, path: str) -> bool:
+        output_dir = os.path.abspath(self.output_dir)
+        path = os.path.abspath(path)
+        if path == output_dir or path.startswith(output_dir + os.sep):
+            return False
+
+        # The files written by helm dependency update would template the chart again.
+        relative_path = os.path.relpath(path, os.path.abspath(self.chart))
+        return relative_path.split(os.sep)[0] not in CHART_DEPENDENCY_PATHS
+
+    def is_site_values(self, path: str) -> bool:
+        """
+        Whether the path is a site values file of a chart templated for every site.
+        """
+        values_dir = os.path.abspath(self.values_dir)
+        return (
+            self.site_values
+            and path.endswith(".yaml")
+            and os.path.abspath(path).startswith(values_dir + os.sep)
+        )
+
+    def update(self, changed: Set[str]):
+        changed = {path for path in changed if self.accepts(path)}
+        if not changed:
+            return
+
+        if all(self.is_site_values(path) for path in changed):
+            for path in sorted(changed):
+                self.render_site(path)
+        else:
+            self.render(
+                update_dependencies=any(
+                    os.path.basename(path) == "requirements.yaml" for path in changed
+                )
+            )
+
+
+def report_findings_diff(
+    findings: Dict[tuple, dict], new_findings: Dict[tuple, dict], format: bool = False
+):
+    """
+    Print the new findings prefixed with + and the fixed ones prefixed with -.
+    """
+    for key, dep in new_findings.items():
+        if key not in findings:
+            report_line(dep, format, prefix="+ ")
+    for key, dep in findings.items():
+        if key not in new_findings:
+            report_line(dep, format, prefix="- ")
+
+
+def watch_deprecations(target: WatchedSource, format: bool = False, watcher=None):
+    """
+    Print the findings of the source or the chart, then the changes of the findings
+    every time its files change, until it's interrupted.
+    """
+    findings = target.findings()
+    report_findings_diff({}, findings, format)
+    watcher = watcher or get_watcher(target.root)
+    logger.info(f"Watching {target.root} for changes. Press Ctrl+C to stop.")
+    try:
+        while True:
+            changed = watcher.changes()
+            if not changed:
+                continue
+            target.update(changed)
+            new_findings = target.findings()
+            report_findings_diff(findings, new_findings, format)
+            findings = new_findings
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    return findings
+
+
+def watch_check(
+    source: str,
+    helm_binary: str,
+    k8s_version: str = None,
+    chart: str = None,
+    format: bool = False,
+    output_dir: str = HELM_TEMPLATE_TMP_DIRECTORY,
+    values: str = None,
+    custom_values: str = None,
+    skip_dependencies: bool = False,
+    include: tuple = FILES_INCLUDE,
+    exclude: tuple = (),
+):
+    """
+    Watch a source or a chart, and print the changes of its findings.
+    """
+    version = k8s_version if k8s_version else _k8s_version()
+    target = (
+        WatchedChart(
+            chart,
+            helm_binary,
+            version,
+            output_dir,
+            values,
+            custom_values,
+            skip_dependencies,
+        )
+        if chart
+        else WatchedSource(source, version, include, exclude)
+    )
+    return watch_deprecations(target, format)
@@ -1,6 +1,10 @@
+from datetime import datetime
+
 import pytest
 from click.testing import CliRunner
 
+from exporter.store import ResultStore
+
 
 @pytest.fixture()
 def cli_runner(mocker) -> CliRunner:
@@ -12,17 +16,39 @@ def cli_runner(mocker) -> CliRunner:
 
 @pytest.fixture
 def api_mock(mocker):
-    mock = mocker.patch("exporter.app.client.CoreV1Api", autospec=True)
+    mock = mocker.patch("kubernetes.client.CoreV1Api", autospec=True)
     return mock
 
 
 @pytest.fixture
 def version_api_mock(mocker):
-    mock = mocker.patch("exporter.app.client.VersionApi", autospec=True)
+    mock = mocker.patch("kubernetes.client.VersionApi", autospec=True)
     return mock
 
 
 @pytest.fixture
 def config_mock(mocker):
-    mock = mocker.patch("exporter.app.config")
+    mock = mocker.patch("kubernetes.config")
     return mock
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """
+    A data file with an empty completed scan that ran now.
+    """
+    path = str(tmp_path / "kdave.db")
+    with ResultStore(path) as store:
+        store.save(
+            [],
+            [],
+            {
+                "last_run": datetime.now().isoformat(timespec="seconds"),
+                "duration_seconds": 0,
+                "number_deployed_releases": 0,
+                "number_releases_with_deprecated_api_versions": 0,
+                "number_releases_with_removed_api_versions": 0,
+            },
+        )
+
+    return path
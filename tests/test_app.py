@@ -1,629 +1,913 @@
-import logging
+import json
 
 import pytest
-from kubernetes.client.rest import ApiException
 
 from exporter import app
 from exporter.constants import HELM_V2_BINARY
-from exporter.exceptions import (
-    DeprecatedAPIVersionError,
-    InvalidSemVerError,
-    JobExecutionError,
-    UnauthorizedError,
-    versionsFileNotFoundError,
-)
+from exporter.exceptions import JobExecutionError, UnauthorizedError
+from exporter.index import DeprecationIndex, PublishedResults, get_shard
+from exporter.progress import ScanProgress
+from exporter.records import ReleaseStatus, ResultSet
+from exporter.scheduler import ScanScheduler
+from exporter.store import ResultStore
 
 
-def test_k8s_api_initialize__success(mocker, api_mock, config_mock):
-    # Patch load_incluster_config, it will not throw an exception
-    load_incluster_config_mock = mocker.patch(
-        "exporter.app.config.load_incluster_config"
+def test_get_deprecations_for_all_releases__update_existing_data__success(
+    mocker, data_file
+):
+    K8s_VERSION = "v1.21.0"
+    MAXIMUM = 256
+    q = app.queue.Queue()
+    exit_event = app.threading.Event()
+    put_releases_in_queue_mocker = mock_helm_releases(mocker, q, exit_event)
+    app.get_deprecations_for_all_releases(
+        1,
+        q,
+        exit_event,
+        app.threading.Event(),
+        HELM_V2_BINARY,
+        K8s_VERSION,
+        MAXIMUM,
+        app_data=app.app_data,
+        lock=app.lock,
+        data_file=data_file,
     )
+    # The data file is up to date, but the releases are checked again.
+    put_releases_in_queue_mocker.assert_called_once()
+    assert app.app_data["deprecations"] == []
 
-    app.k8sClient()
 
-    # Verify that methods were called as expected
-    load_incluster_config_mock.assert_called_once()
-    api_mock.assert_called_once()
+def test_get_rolling_slice__cycle_through_the_slices(mocker):
+    mocker.patch("exporter.app.rolling_slices", 3)
+    app_data = {"rolling_slice": 0}
 
+    slices = [
+        app.get_rolling_slice(app_data=app_data, lock=app.lock) for _ in range(4)
+    ]
 
-def test_list_namespaces__success(config_mock, api_mock):
-    client = app.k8sClient()
-    client.list_namespaces()
-    api_mock.return_value.list_namespace.assert_called_once()
+    assert slices == [0, 1, 2, 0]
+    assert app_data["rolling_slice"] == 1
 
 
-def test_get_k8s_version__success(config_mock, version_api_mock):
-    client = app.k8sClient()
-    client.k8s_version()
-    version_api_mock.return_value.get_code.assert_called_once()
+def test_get_rolling_slice__no_slices__return_none():
+    assert app.get_rolling_slice(app_data={"rolling_slice": 0}, lock=app.lock) is None
 
 
-def test_get_deprecations__missing_versions_file__raises_error():
-    with pytest.raises(versionsFileNotFoundError):
-        app.get_all_deprecations("./missing-file.yaml")
+def test_merge_rolling_slice__replace_the_results_of_the_slice(mocker):
+    mocker.patch("exporter.app.rolling_slices", 2)
+    # With 2 slices, the "test" namespace is in slice 0 and "default" in slice 1.
+    current = [
+        {"namespace": "test", "release_name": "old"},
+        {"namespace": "default", "release_name": "other"},
+    ]
+    checked = [{"namespace": "test", "release_name": "new"}]
 
+    assert app.merge_rolling_slice(current, checked, 0) == [
+        {"namespace": "default", "release_name": "other"},
+        {"namespace": "test", "release_name": "new"},
+    ]
 
-def test_get_deprecations__success():
-    kind = "Deployment"
-    deprecations = app.get_all_deprecations("tests/fixtures/versions.yaml")
-    assert deprecations[0]["kind"] == kind
 
+def test_export_deprecated_versions_metrics__success(mocker):
+    K8s_VERSION = "v1.21.0"
+    MAXIMUM = 256
+    mocked_queue = mocker.patch("exporter.app.queue.Queue")
+    mocked_exit_event = mocker.patch("exporter.app.threading.Event")
+    mocked_error_event = mocker.patch("exporter.app.threading.Event")
+    mocked_lock = mocker.patch("exporter.app.manager.Lock")
 
-def test_get_deprecated_versions__success(mocker):
-    all_deprecated_versions = app.get_all_deprecations("tests/fixtures/versions.yaml")
-    deprecated_deployment_versions = app.get_deprecated_kind_versions(
-        "Deployment", all_deprecated_versions
+    app.app_data["run_helm_update"] = True
+    app.app_data["processing"] = False
+    get_deprecations_for_all_releases_mocker = mocker.patch(
+        "exporter.app.get_deprecations_for_all_releases"
+    )
+    app.export_deprecated_versions_metrics(
+        1,
+        mocked_queue,
+        mocked_exit_event,
+        mocked_error_event,
+        HELM_V2_BINARY,
+        K8s_VERSION,
+        MAXIMUM,
+        app_data=app.app_data,
+        lock=mocked_lock,
+        data_file="tests/fixtures/data.json",
+        run_once=True,
+    )
+    get_deprecations_for_all_releases_mocker.assert_called_with(
+        1,
+        mocked_queue,
+        mocked_exit_event,
+        mocked_error_event,
+        HELM_V2_BINARY,
+        K8s_VERSION,
+        MAXIMUM,
+        app_data=app.app_data,
+        lock=mocked_lock,
+        data_file="tests/fixtures/data.json",
+        helm_version=None,
     )
-    assert isinstance(deprecated_deployment_versions, list)
-    assert isinstance(deprecated_deployment_versions[0], dict)
-    assert deprecated_deployment_versions[0]["kind"] == "Deployment"
-    assert deprecated_deployment_versions[0]["version"] == "extensions/v1beta1"
-    assert deprecated_deployment_versions[0]["replacementApi"] == "apps/v1"
 
 
-def test_get_kinds_in_deprecation_file__success(mocker):
-    all_deprecated_versions = app.get_all_deprecations("tests/fixtures/versions.yaml")
-    kinds_in_deprecation_file = app.get_kinds_in_deprecation_file(
-        all_deprecated_versions
-    )
-    assert isinstance(kinds_in_deprecation_file, list)
-    assert "Deployment" in kinds_in_deprecation_file
-    assert "DaemonSet" in kinds_in_deprecation_file
-    assert "PodSecurityPolicy" in kinds_in_deprecation_file
+def test_get_fetched_helm_data__success(mocker):
+    app.app_data["last_run"] = ""
+    app.get_fetched_helm_data(app_data=app.app_data, lock=app.lock)
+    assert app.app_data["run_helm_update"] is True
 
 
-@pytest.mark.parametrize(
-    ["kind", "api_version", "k8s_version", "result"],
-    [
-        ("Deployment", "extensions/v1beta1", "v1.12.0", True),
-        ("Deployment", "extensions/v1beta1", "v1.8.0", False),
-        ("Deployment", "apps/v1beta2", "v1.10.0", True),
-        ("StatefulSet", "apps/v1beta1", "v1.10.0", True),
-        ("NetworkPolicy", "extensions/v1beta1", "v1.10.0", True),
-        ("Ingress", "extensions/v1beta1", "v1.13.0", False),
-        ("Ingress", "extensions/v1beta1", "v1.14.0", True),
-        ("Ingress", "networking.k8s.io/v1beta1", "v1.19.0", True),
-        ("ReplicaSet", "extensions/v1beta1", "v1.17.0", False),
-        ("PriorityClass", "scheduling.k8s.io/v1beta1", "v1.17.0", True),
-    ],
-)
-def test_is_deprecated_version__success(kind, api_version, k8s_version, result):
-    all_deprecated_versions = app.get_all_deprecations("tests/fixtures/versions.yaml")
+def test_get_fetched_helm_data__is_older_than__success(mocker):
+    app.app_data["run_helm_update"] = False
+    mocker.patch("exporter.app.is_older_than", return_value=True)
+    app.get_fetched_helm_data(app_data=app.app_data, lock=app.lock)
+    assert app.app_data["run_helm_update"] is True
+    assert app.app_data["deprecations"] == []
+
+
+def test_get_metrics__success(mocker):
+    get_fetched_helm_data_mocker = mocker.patch("exporter.app.get_fetched_helm_data")
+    with app.app.test_request_context("/metrics"):
+        app.get_metrics()
+    get_fetched_helm_data_mocker.assert_called_once()
+
+
+def test_app_is_healthy__success(mocker):
+    app.app_data["last_run"] = ""
+    mocker.patch("exporter.app.is_older_than", return_value=True)
+    assert app.app_is_healthy() == "OK"
+
+
+def test_app_is_healthy__job_exceeded_accepted_delay__raises_job_execution_error(
+    mocker
+):
+    app.app_data["last_run"] = "2022-01-20T00:26:25"
+    mocker.patch("exporter.app.is_older_than", return_value=True)
+
+    with pytest.raises(JobExecutionError):
+        app.app_is_healthy()
+
+
+DEPRECATIONS = [
+    {
+        "deprecated": "true",
+        "removed": "true",
+        "kind": "Deployment",
+        "api_version": "extensions/v1beta1",
+        "name": "nginx",
+        "release_name": "nginx",
+        "namespace": "default",
+        "helm_version": "v3",
+        "replacement_api": "apps/v1",
+        "deprecated_in_version": "v1.9.0",
+        "removed_in_version": "v1.16.0",
+        "release_last_update": "2022-01-20 00:26:25",
+        "k8s_version": "v1.21.0",
+        "removed_in_next_release": "true",
+        "removed_in_next_2_releases": "true",
+    },
+    {
+        "deprecated": "true",
+        "removed": "true",
+        "kind": "Deployment",
+        "api_version": "extensions/v1beta1",
+        "name": "redis",
+        "release_name": "redis",
+        "namespace": "default",
+        "helm_version": "v3",
+        "replacement_api": "apps/v1",
+        "deprecated_in_version": "v1.9.0",
+        "removed_in_version": "v1.16.0",
+        "release_last_update": "2022-01-21 00:26:25",
+        "k8s_version": "v1.21.0",
+        "removed_in_next_release": "true",
+        "removed_in_next_2_releases": "true",
+    },
+    {
+        "deprecated": "true",
+        "removed": "false",
+        "kind": "Ingress",
+        "api_version": "networking.k8s.io/v1beta1",
+        "name": "web",
+        "release_name": "web",
+        "namespace": "web",
+        "helm_version": "v2",
+        "replacement_api": "networking.k8s.io/v1",
+        "deprecated_in_version": "v1.19.0",
+        "removed_in_version": "v1.22.0",
+        "release_last_update": "2022-01-22 00:26:25",
+        "k8s_version": "v1.21.0",
+        "removed_in_next_release": "true",
+        "removed_in_next_2_releases": "true",
+    },
+]
+
+
+def test_aggregate_deprecations__success():
+    aggregates = app.aggregate_deprecations(DEPRECATIONS)
+
+    assert sorted(aggregates["by_status"], key=lambda c: c["namespace"]) == [
+        {
+            "namespace": "default",
+            "kind": "Deployment",
+            "api_version": "extensions/v1beta1",
+            "status": "removed",
+            "count": 2,
+        },
+        {
+            "namespace": "web",
+            "kind": "Ingress",
+            "api_version": "networking.k8s.io/v1beta1",
+            "status": "deprecated",
+            "count": 1,
+        },
+    ]
+    assert sorted(
+        aggregates["by_replacement_api"], key=lambda c: c["replacement_api"]
+    ) == [
+        {"replacement_api": "apps/v1", "count": 2},
+        {"replacement_api": "networking.k8s.io/v1", "count": 1},
+    ]
+
+
+def test_get_metric_label_values__collapse_dropped_labels__success():
+    assert app.get_metric_label_values(DEPRECATIONS, ("namespace", "kind")) == {
+        ("default", "Deployment"),
+        ("web", "Ingress"),
+    }
+
+
+def test_get_metrics__export_aggregates_and_configured_labels__success(mocker):
+    mocker.patch("exporter.app.get_fetched_helm_data", return_value=DEPRECATIONS)
+    mocker.patch("exporter.app.metric_labels", ("namespace", "kind"))
+    app.app_data["aggregates"] = app.aggregate_deprecations(DEPRECATIONS)
+
+    with app.app.test_request_context("/metrics"):
+        metrics = app.get_metrics().get_data(as_text=True)
+
     assert (
-        app.is_deprecated_version(
-            kind, api_version, k8s_version, all_deprecated_versions
-        )
-        == result
+        'wf_k8s_deprecated_versions_info{kind="Deployment",namespace="default"} 1.0'
+        in metrics
+    )
+    assert "release_last_update" not in metrics
+    assert (
+        'wf_k8s_deprecated_versions_count{api_version="extensions/v1beta1",kind="Deployment",namespace="default",status="removed"} 2.0'
+        in metrics
+    )
+    assert (
+        'wf_k8s_deprecated_versions_replacement_api_count{replacement_api="apps/v1"} 2.0'
+        in metrics
     )
 
 
-@pytest.mark.parametrize(
-    ["kind", "api_version", "k8s_version", "result"],
-    [
-        ("Deployment", "extensions/v1beta1", "v1.12.0", False),
-        ("Deployment", "apps/v1beta2", "v1.16.0", True),
-        ("StatefulSet", "apps/v1beta1", "v1.16.0", True),
-        ("NetworkPolicy", "extensions/v1beta1", "v1.16.0", True),
-        ("NetworkPolicy", "extensions/v1beta1", "v1.15.0", False),
-        ("Ingress", "extensions/v1beta1", "v1.21.0", False),
-        ("Ingress", "extensions/v1beta1", "v1.22.0", True),
-        ("Ingress", "networking.k8s.io/v1beta1", "v1.20.0", False),
-        ("ReplicaSet", "extensions/v1beta1", "v1.17.0", True),
-        ("PriorityClass", "scheduling.k8s.io/v1beta1", "v1.17.0", True),
-        ("PodDisruptionBudgetList", "policy/v1beta1", "v1.17.0", False),
-    ],
-)
-def test_is_removed_version__success(kind, api_version, k8s_version, result):
-    all_deprecated_versions = app.get_all_deprecations("tests/fixtures/versions.yaml")
-    assert (
-        app.is_removed_version(kind, api_version, k8s_version, all_deprecated_versions)
-        == result
+def test_get_metrics__aggregated_mode__export_aggregates_only(mocker):
+    mocker.patch("exporter.app.get_fetched_helm_data", return_value=DEPRECATIONS)
+    mocker.patch("exporter.app.metrics_mode", "aggregated")
+    app.app_data["aggregates"] = app.aggregate_deprecations(DEPRECATIONS)
+
+    with app.app.test_request_context("/metrics"):
+        metrics = app.get_metrics().get_data(as_text=True)
+
+    assert "wf_k8s_deprecated_versions_info{" not in metrics
+    assert "wf_k8s_deprecated_versions_count{" in metrics
+
+
+def test_get_metrics__series_budget_exceeded__export_aggregates_only(mocker):
+    mocker.patch("exporter.app.get_fetched_helm_data", return_value=DEPRECATIONS)
+    mocker.patch("exporter.app.max_series", 2)
+    app.app_data["aggregates"] = app.aggregate_deprecations(DEPRECATIONS)
+
+    with app.app.test_request_context("/metrics"):
+        metrics = app.get_metrics().get_data(as_text=True)
+
+    assert "wf_k8s_deprecated_versions_info{" not in metrics
+    assert "wf_k8s_deprecated_versions_count{" in metrics
+
+
+def test_parse_metric_labels__success():
+    assert app.parse_metric_labels("namespace, kind") == ("namespace", "kind")
+
+
+def test_parse_metric_labels__unknown_label__raises_argument_type_error():
+    with pytest.raises(app.argparse.ArgumentTypeError):
+        app.parse_metric_labels("namespace,unknown")
+
+
+RELEASE_STATS = [
+    {
+        "release_name": "nginx",
+        "namespace": "default",
+        "helm_version": "v3",
+        "has_deprecated_api_versions": "true",
+        "has_removed_api_versions": "true",
+    },
+    {
+        "release_name": "redis",
+        "namespace": "default",
+        "helm_version": "v3",
+        "has_deprecated_api_versions": "true",
+        "has_removed_api_versions": "true",
+    },
+    {
+        "release_name": "clean",
+        "namespace": "default",
+        "helm_version": "v3",
+        "has_deprecated_api_versions": "false",
+        "has_removed_api_versions": "false",
+    },
+    {
+        "release_name": "web",
+        "namespace": "web",
+        "helm_version": "v2",
+        "has_deprecated_api_versions": "true",
+        "has_removed_api_versions": "false",
+    },
+]
+
+
+def publish_deprecations(deprecations, release_stats=RELEASE_STATS):
+    app.update_global_app_data(deprecations, release_stats, 0, 0, 0, 0)
+    app.app_data["last_run"] = app.datetime.now().isoformat(timespec="seconds")
+
+
+def mock_helm_releases(mocker, q, exit_event, names=()):
+    """
+    Patch the listing of the helm releases to queue the releases of the default
+    namespace with the given names, and then to stop the release checkers.
+    """
+
+    def put_releases_in_queue(**kwargs):
+        for name in names:
+            q.put(
+                {
+                    "name": name,
+                    "namespace": "default",
+                    "helm_version": "v3",
+                    "release_last_update": "2022-01-20 00:26:25",
+                }
+            )
+        exit_event.set()
+
+    return mocker.patch(
+        "exporter.app.put_all_helm_releases_in_queue", side_effect=put_releases_in_queue
     )
 
 
-@pytest.mark.parametrize(
-    ["kind", "api_version", "result"],
-    [
-        (
-            "Deployment",
-            "extensions/v1beta1",
-            {
-                "replacement_api": "apps/v1",
-                "removed_in_version": "v1.16.0",
-                "deprecated_in_version": "v1.9.0",
-            },
-        ),
-        (
-            "StatefulSet",
-            "apps/v1beta1",
-            {
-                "replacement_api": "apps/v1",
-                "removed_in_version": "v1.16.0",
-                "deprecated_in_version": "v1.9.0",
-            },
-        ),
-        (
-            "PodDisruptionBudget",
-            "policy/v1beta1",
-            {
-                "replacement_api": "n/a",
-                "removed_in_version": "n/a",
-                "deprecated_in_version": "v1.22.0",
-            },
-        ),
-    ],
-)
-def test_get_deprecated_kind_info__success(kind, api_version, result):
-    all_deprecated_versions = app.get_all_deprecations("tests/fixtures/versions.yaml")
+def test_publish_partial_results__merge_checked_releases__success():
+    publish_deprecations(DEPRECATIONS)
+    checked = dict(RELEASE_STATS[0], has_removed_api_versions="false")
+    results = ResultSet()
+    results.add(ReleaseStatus.from_dict(checked), [])
+
+    published = app.publish_partial_results(
+        results, app_data=app.app_data, lock=app.lock
+    )
+
+    assert published == 1
+    # The deprecations of the checked release are replaced, the others are kept.
+    assert app.app_data["deprecations"] == DEPRECATIONS[1:]
+    assert app.app_data["release_stats"] == RELEASE_STATS[1:] + [checked]
+    assert app.app_data["number_deployed_releases"] == 4
+    assert app.app_data["number_releases_with_removed_api_versions"] == 1
+
+    generation = app.app_data["generation"]
     assert (
-        app.get_deprecated_kind_info(kind, api_version, all_deprecated_versions)
-        == result
+        app.publish_partial_results(
+            results, published, app_data=app.app_data, lock=app.lock
+        )
+        == 1
     )
+    assert app.app_data["generation"] == generation
 
 
-@pytest.mark.parametrize(
-    ["version", "parsed_version"],
-    [
-        ("1.13.0", "1.13.0"),
-        ("v1.12.0", "1.12.0"),
-        ("v1.9.0-alpha.1", "1.9.0"),
-        ("v1.20.0-alpha.3", "1.20.0"),
-        ("v1.20.0-rc.0", "1.20.0"),
-        ("v1.22.0-alpha.1", "1.22.0"),
-    ],
-)
-def test_parse_semver__success(version, parsed_version):
-    assert app.parse_semver(version) == parsed_version
+def test_get_deprecations_for_all_releases__failure__keep_checked_releases(
+    mocker, data_file
+):
+    publish_deprecations(DEPRECATIONS)
+    q = app.queue.Queue()
+    exit_event = app.threading.Event()
 
+    mock_helm_releases(mocker, q, exit_event, ("clean", "nginx"))
+    mocker.patch(
+        "exporter.app.get_deployed_deprecated_kinds",
+        side_effect=[[], UnauthorizedError("Unauthorized")],
+    )
 
-@pytest.mark.parametrize(
-    ["version", "steps", "incremented_version"],
-    [
-        ("1.13.0", 1, "1.14.0"),
-        ("v1.12.0", 2, "1.14.0"),
-        ("v1.9.0-alpha.1", 1, "1.10.0"),
-        ("v1.20.0-alpha.3", 3, "1.23.0"),
-        ("v1.20.0-rc.0", 2, "1.22.0"),
-        ("v1.22.0-alpha.1", 3, "1.25.0"),
-    ],
-)
-def test_increment_semver__success(version, steps, incremented_version):
-    assert app.increment_semver(version, steps) == incremented_version
+    app.get_deprecations_for_all_releases(
+        1,
+        q,
+        exit_event,
+        app.threading.Event(),
+        HELM_V2_BINARY,
+        "v1.21.0",
+        256,
+        app_data=app.app_data,
+        lock=app.lock,
+        data_file=data_file,
+    )
+
+    assert app.app_data["error_triggered"] is True
+    assert app.app_data["scan_in_progress"] is False
+    # The release checked before the failure is published, the others are kept.
+    assert [release["release_name"] for release in app.app_data["release_stats"]] == [
+        "nginx",
+        "redis",
+        "web",
+        "clean",
+    ]
+    assert app.app_data["deprecations"] == DEPRECATIONS
+    assert app.app_data["processing"] is False
+    app.app_data["error_triggered"] = False
+
+
+def test_export_deprecated_versions_metrics__failed_scan__run_the_next_scan(
+    mocker, data_file
+):
+    app.app_data["processing"] = False
+    app.app_data["last_run"] = "2022-01-20T00:26:25"
+    q = app.queue.Queue()
+    exit_event = app.threading.Event()
 
+    mock_helm_releases(mocker, q, exit_event, ("nginx",))
+    get_deployed_deprecated_kinds_mocker = mocker.patch(
+        "exporter.app.get_deployed_deprecated_kinds",
+        side_effect=[UnauthorizedError("Unauthorized"), []],
+    )
 
-def test_parse_semver__invalid_k8s_version__raises_invalid_semver_error():
-    version = "v1a.12.0"
-    with pytest.raises(InvalidSemVerError):
-        assert app.parse_semver(version)
+    def run_scheduled_job():
+        app.app_data["run_helm_update"] = True
+        app.export_deprecated_versions_metrics(
+            1,
+            q,
+            exit_event,
+            app.threading.Event(),
+            HELM_V2_BINARY,
+            "v1.21.0",
+            256,
+            data_file=data_file,
+            run_once=True,
+            scheduler=ScanScheduler(3600),
+            scan_event=mocker.Mock(),
+        )
 
+    run_scheduled_job()
+    assert app.app_data["error_triggered"] is True
+    assert app.app_data["processing"] is False
+    assert app.app_data["run_helm_update"] is False
 
-def test__k8s_version__success(config_mock, version_api_mock):
-    app._k8s_version()
-    version_api_mock.return_value.get_code.assert_called_once()
+    run_scheduled_job()
+    assert get_deployed_deprecated_kinds_mocker.call_count == 2
+    assert app.app_data["error_triggered"] is False
+    assert [release["release_name"] for release in app.app_data["release_stats"]] == [
+        "nginx"
+    ]
 
 
-def test__k8s_version__unauthorized__raises_unauthorized_error(
-    config_mock, version_api_mock
+def test_trigger_scan_api__data_file_up_to_date__check_the_releases(
+    mocker, data_file
 ):
-    version_api_mock.return_value.get_code.side_effect = ApiException(status=401)
+    app.app_data["processing"] = False
+    app.app_data["last_run"] = app.datetime.now().isoformat(timespec="seconds")
+    q = app.queue.Queue()
+    exit_event = app.threading.Event()
+    put_releases_in_queue_mocker = mock_helm_releases(mocker, q, exit_event)
+    with app.app.test_client() as client:
+        assert client.post("/api/v1/scan").status_code == 202
 
-    with pytest.raises(UnauthorizedError):
-        app._k8s_version()
+    app.export_deprecated_versions_metrics(
+        1,
+        q,
+        exit_event,
+        app.threading.Event(),
+        HELM_V2_BINARY,
+        "v1.21.0",
+        256,
+        data_file=data_file,
+        run_once=True,
+        scheduler=ScanScheduler(3600),
+        scan_event=mocker.Mock(),
+    )
 
+    put_releases_in_queue_mocker.assert_called_once()
+    assert app.app_data["processing"] is False
+    assert app.app_data["run_helm_update"] is False
 
-@pytest.mark.parametrize(
-    ["data", "k8s_version", "deprecations"],
-    [
-        (
-            {
-                "kind": "Deployment",
-                "apiVersion": "extensions/v1beta1",
-                "metadata": {"name": "nginx"},
-            },
-            "1.14.0",
-            {
-                "deprecated": "true",
-                "removed": "false",
-                "replacement_api": "apps/v1",
-                "removed_in_version": "v1.16.0",
-                "deprecated_in_version": "v1.9.0",
-                "kind": "Deployment",
-                "api_version": "extensions/v1beta1",
-                "name": "nginx",
-                "k8s_version": "1.14.0",
-                "removed_in_next_release": "false",
-                "removed_in_next_2_releases": "true",
-            },
-        ),
-        (
-            {
-                "kind": "Deployment",
-                "apiVersion": "apps/v1beta2",
-                "metadata": {"name": "nginx"},
-            },
-            "v1.19.10-gke.1600",
-            {
-                "deprecated": "true",
-                "removed": "true",
-                "replacement_api": "apps/v1",
-                "removed_in_version": "v1.16.0",
-                "deprecated_in_version": "v1.9.0",
-                "kind": "Deployment",
-                "api_version": "apps/v1beta2",
-                "name": "nginx",
-                "k8s_version": "v1.19.10-gke.1600",
-                "removed_in_next_release": "true",
-                "removed_in_next_2_releases": "true",
-            },
-        ),
-    ],
-)
-def test_check_deprecations__success(
-    mocker, config_mock, version_api_mock, data, k8s_version, deprecations
+
+def test_get_deprecations_for_all_releases__trace_requested__save_trace(
+    mocker, tmp_path, data_file
 ):
-    mocker.patch("exporter.app._k8s_version", return_value="v1.17.0")
+    q = app.queue.Queue()
+    exit_event = app.threading.Event()
 
-    assert app.check_deprecations(data, k8s_version) == deprecations
+    mock_helm_releases(mocker, q, exit_event, ("clean",))
+    mocker.patch("exporter.app.get_deployed_deprecated_kinds", return_value=[])
+    mocker.patch("exporter.app.trace_dir", str(tmp_path / "traces"))
+    with app.app.test_client() as client:
+        app.app_data["processing"] = True
+        client.post("/api/v1/scan?trace=true")
+        app.app_data["processing"] = False
 
+    app.get_deprecations_for_all_releases(
+        1,
+        q,
+        exit_event,
+        app.threading.Event(),
+        HELM_V2_BINARY,
+        "v1.21.0",
+        256,
+        app_data=app.app_data,
+        lock=app.lock,
+        data_file=data_file,
+    )
 
-def test_check_deprecations_in_files__yaml_with_single_document__success():
-    assert app.check_deprecations_in_files(
-        "tests/fixtures/single-document.yaml", "v1.16.0"
-    ) == [
-        {
-            "deprecated": "true",
-            "removed": "true",
-            "replacement_api": "apps/v1",
-            "removed_in_version": "v1.16.0",
-            "deprecated_in_version": "v1.9.0",
-            "kind": "Deployment",
-            "api_version": "extensions/v1beta1",
-            "name": "nginx-deployment",
-            "k8s_version": "v1.16.0",
-            "removed_in_next_release": "true",
-            "removed_in_next_2_releases": "true",
-        }
+    assert app.app_data["trace_requested"] is False
+    with open(app.app_data["last_trace"]) as fd:
+        events = json.load(fd)["traceEvents"]
+    assert [event["args"] for event in events if event["name"] == "release"] == [
+        {"release": "clean", "namespace": "default"}
     ]
 
 
-def test_check_deprecations_in_files__yaml_with_multiple_document__success():
-    assert app.check_deprecations_in_files(
-        "tests/fixtures/multiple-document.yaml", "v1.16.0"
-    ) == [
-        {
-            "deprecated": "true",
-            "removed": "true",
-            "replacement_api": "apps/v1",
-            "removed_in_version": "v1.16.0",
-            "deprecated_in_version": "v1.9.0",
-            "kind": "Deployment",
-            "api_version": "apps/v1beta2",
-            "name": "nginx-deployment",
-            "k8s_version": "v1.16.0",
-            "removed_in_next_release": "true",
-            "removed_in_next_2_releases": "true",
-        },
-        {
-            "deprecated": "true",
-            "removed": "true",
-            "replacement_api": "apps/v1",
-            "removed_in_version": "v1.16.0",
-            "deprecated_in_version": "v1.9.0",
-            "kind": "Deployment",
-            "api_version": "extensions/v1beta1",
-            "name": "nginx-deployment",
-            "k8s_version": "v1.16.0",
-            "removed_in_next_release": "true",
-            "removed_in_next_2_releases": "true",
-        },
-    ]
+def test_deprecation_index_select__filters__success():
+    index = DeprecationIndex(DEPRECATIONS)
 
+    assert index.select({"namespace": ["default"]}) == DEPRECATIONS[:2]
+    assert index.select(
+        {"namespace": ["default", "web"], "status": ["deprecated"]}
+    ) == [DEPRECATIONS[2]]
+    assert index.select({"helm_version": ["v2"], "status": ["removed"]}) == []
+    assert index.select() == DEPRECATIONS
 
-def test_get_files__return_single_file__success():
-    assert app.get_files("tests/fixtures/multiple-document.yaml") == [
-        "tests/fixtures/multiple-document.yaml"
-    ]
 
+def test_deprecation_index_select__shards_cover_all_deprecations__success():
+    index = DeprecationIndex(DEPRECATIONS)
+    shards = [index.select(shard=i, total_shards=3) for i in range(3)]
 
-def test_get_files__return_files_in_directory__success():
-    files = app.get_files("tests/fixtures/dir")
-    assert "tests/fixtures/dir/file-a.yaml" in files
-    assert "tests/fixtures/dir/file-b.yaml" in files
-    assert "tests/fixtures/dir/file-c.yaml" in files
+    assert sorted(len(shard) for shard in shards) in ([0, 1, 2], [0, 0, 3])
+    assert sum(len(shard) for shard in shards) == len(DEPRECATIONS)
 
 
-def test_get_files__non_existing_directory__log_error_and_return_empty_list(caplog):
-    with caplog.at_level(logging.DEBUG):
-        app.get_files("/missing-dir")
+def test_deprecation_index_page__cursor__success():
+    index = DeprecationIndex(list(reversed(DEPRECATIONS)))
 
-    assert (
-        "The provided path: /missing-dir doesn't exist or is not a directory."
-        in caplog.text
-    )
-    app.get_files("/missing-dir") == []
+    page, total, after = index.page(limit=2)
+    assert page == DEPRECATIONS[:2]
+    assert total == 3
+    page, total, after = index.page(after=after, limit=2)
+    assert page == DEPRECATIONS[2:]
+    assert after is None
 
 
-def test_check_deprecations_all__check_file__success():
-    assert app.check_deprecations_all(
-        "tests/fixtures/single-document.yaml",
-        HELM_V2_BINARY,
-        k8s_version="1.9.0",
-        tabulate=False,
-    ) == [
-        {
-            "deprecated": "true",
-            "removed": "false",
-            "replacement_api": "apps/v1",
-            "removed_in_version": "v1.16.0",
-            "deprecated_in_version": "v1.9.0",
-            "kind": "Deployment",
-            "k8s_version": "1.9.0",
-            "removed_in_next_release": "false",
-            "removed_in_next_2_releases": "false",
-            "api_version": "extensions/v1beta1",
-            "name": "nginx-deployment",
-            "file_name": "single-document.yaml",
-        }
-    ]
+def test_release_index__filter_by_deprecated_kind__success():
+    results = PublishedResults(DEPRECATIONS, RELEASE_STATS)
 
+    assert results.releases.select({"kind": ["Ingress"]}) == [RELEASE_STATS[3]]
+    assert results.releases.select({"status": ["none"]}) == [RELEASE_STATS[2]]
+    assert results.releases.select(
+        {"api_version": ["extensions/v1beta1"], "release": ["redis", "web"]}
+    ) == [RELEASE_STATS[1]]
 
-def test_check_deprecations_all__tabulate_output__success(mocker):
-    mock_print_table_format = mocker.patch("exporter.app.print_table_format")
-    app.check_deprecations_all(
-        "tests/fixtures/single-document.yaml",
-        HELM_V2_BINARY,
-        k8s_version="1.9.0",
-        tabulate=True,
-    )
 
-    mock_print_table_format.assert_called_once()
+def test_get_published_results__rebuilt_once_per_published_scan__success():
+    publish_deprecations(DEPRECATIONS)
+    results = app.get_published_results()
 
+    assert app.get_published_results() is results
+    publish_deprecations(DEPRECATIONS[:1])
+    assert app.get_published_results().deprecations.records == DEPRECATIONS[:1]
 
-def test_check_deprecations_all__log_deprecation_message__raises_deprecation_error(
-    mocker, caplog
-):
 
-    with pytest.raises(DeprecatedAPIVersionError):
-        app.check_deprecations_all(
-            "tests/fixtures/single-document.yaml",
-            HELM_V2_BINARY,
-            k8s_version="1.9.0",
-            message=True,
+def test_get_metrics__filter_by_namespace_and_status__success():
+    publish_deprecations(DEPRECATIONS)
+
+    with app.app.test_client() as client:
+        metrics = client.get("/metrics?namespace=web,default&status=removed").get_data(
+            as_text=True
         )
 
+    assert 'name="nginx"' in metrics
+    assert 'name="redis"' in metrics
+    assert 'name="web"' not in metrics
+    assert "wf_k8s_deployed_releases " not in metrics
 
-def test_check_deprecations_all__check_release__success(mocker):
-    helm_template_mocker = mocker.patch("exporter.app.helm_template")
-    get_files_mocker = mocker.patch("exporter.app.get_files")
-    check_release_deprecation_mocker = mocker.patch(
-        "exporter.app.check_release_deprecation"
-    )
-    app.check_deprecations_all(
-        "tests/fixtures/single-document.yaml",
-        HELM_V2_BINARY,
-        k8s_version="1.9.0",
-        release="nginx",
-    )
 
-    check_release_deprecation_mocker.assert_called_once()
-    helm_template_mocker.assert_not_called()
-    get_files_mocker.assert_not_called()
+def test_get_shard_metrics__success():
+    publish_deprecations(DEPRECATIONS)
 
+    with app.app.test_client() as client:
+        shard = client.get(f"/metrics/shard/{get_shard('web', 2)}/2").get_data(
+            as_text=True
+        )
 
-def test_check_deprecations_all__check_namespace_releases__success(mocker):
-    helm_template_mocker = mocker.patch("exporter.app.helm_template")
-    get_files_mocker = mocker.patch("exporter.app.get_files")
-    check_release_deprecation_mocker = mocker.patch(
-        "exporter.app.check_release_deprecation"
-    )
-    check_deprecation_for_releases_mocker = mocker.patch(
-        "exporter.app.check_deprecation_for_namespace_releases"
-    )
-    app.check_deprecations_all(
-        "tests/fixtures/single-document.yaml",
-        HELM_V2_BINARY,
-        k8s_version="1.9.0",
-        namespace="nginx",
-    )
+    assert 'name="web"' in shard
 
-    check_release_deprecation_mocker.assert_not_called()
-    helm_template_mocker.assert_not_called()
-    get_files_mocker.assert_not_called()
-    check_deprecation_for_releases_mocker.assert_called_once()
 
+def test_get_shard_metrics__invalid_shard__bad_request():
+    with app.app.test_client() as client:
+        assert client.get("/metrics/shard/2/2").status_code == 400
 
-def test_check_deprecations_all__check_chart__success(mocker):
-    helm_template_mocker = mocker.patch("exporter.app.helm_template")
-    get_files_mocker = mocker.patch("exporter.app.get_files")
-    check_deprecation_for_releases_mocker = mocker.patch(
-        "exporter.app.check_deprecation_for_namespace_releases"
-    )
-    check_release_deprecation_mocker = mocker.patch(
-        "exporter.app.check_release_deprecation"
-    )
-    app.check_deprecations_all(
-        "tests/fixtures/single-document.yaml",
-        HELM_V2_BINARY,
-        k8s_version="1.9.0",
-        chart="nginx",
-    )
 
-    helm_template_mocker.assert_called_once()
-    get_files_mocker.assert_called_once()
-    check_release_deprecation_mocker.assert_not_called()
-    check_deprecation_for_releases_mocker.assert_not_called()
+def test_get_deprecations_api__filter_and_paginate__success():
+    publish_deprecations(DEPRECATIONS)
 
+    with app.app.test_client() as client:
+        first = client.get(
+            "/api/v1/deprecations?namespace=default&kind=Deployment&limit=1"
+        ).get_json()
+        second = client.get(
+            f"/api/v1/deprecations?namespace=default&kind=Deployment&limit=1&cursor={first['next_cursor']}"
+        ).get_json()
 
-def test_check_deprecation_for_releases__success(mocker):
-    helm_list_namespace_releases_mocker = mocker.patch(
-        "exporter.app.helm_list_namespace_releases"
-    )
-    get_deployed_deprecated_kinds_mocker = mocker.patch(
-        "exporter.app.get_deployed_deprecated_kinds"
-    )
-    app.check_release_deprecation(HELM_V2_BINARY, release="nginx")
+    assert [dep["name"] for dep in first["items"]] == ["nginx"]
+    assert first["total"] == 2
+    assert [dep["name"] for dep in second["items"]] == ["redis"]
+    assert second["next_cursor"] is None
 
-    helm_list_namespace_releases_mocker.assert_not_called()
-    get_deployed_deprecated_kinds_mocker.assert_called_once()
 
+def test_get_deprecations_api__invalid_arguments__bad_request():
+    with app.app.test_client() as client:
+        assert client.get("/api/v1/deprecations?limit=0").status_code == 400
+        assert client.get("/api/v1/deprecations?cursor=invalid").status_code == 400
 
-def test_check_deprecation_for_releases__check_namespace_releases__success(mocker):
-    helm_list_namespace_releases_mocker = mocker.patch(
-        "exporter.app.helm_list_namespace_releases", return_value=["release"]
-    )
-    get_deployed_deprecated_kinds_mocker = mocker.patch(
-        "exporter.app.get_deployed_deprecated_kinds"
-    )
-    app.check_deprecation_for_namespace_releases(HELM_V2_BINARY, namespace="default")
 
-    helm_list_namespace_releases_mocker.assert_called_once()
-    get_deployed_deprecated_kinds_mocker.assert_called_once()
+@pytest.mark.parametrize(
+    "key", [[1, None], ["default", "nginx"], {"namespace": "default"}, "default"]
+)
+def test_get_deprecations_api__cursor_not_an_identity_key__bad_request(key):
+    publish_deprecations(DEPRECATIONS)
 
+    with app.app.test_client() as client:
+        response = client.get(f"/api/v1/deprecations?cursor={app.encode_cursor(key)}")
 
-def test_get_kinds_from_helm_release__success(mocker):
-    helm_get_mocker = mocker.patch("exporter.app.helm_get")
-    yaml_load_mocker = mocker.patch("exporter.app.yaml.safe_load_all")
-    app.get_kinds_from_helm_release(HELM_V2_BINARY, "nginx")
+    assert response.status_code == 400
 
-    helm_get_mocker.assert_called_once()
-    yaml_load_mocker.assert_called_once()
 
+def test_get_releases_api__filter_by_api_version__success():
+    publish_deprecations(DEPRECATIONS)
 
-def test_get_deployed_deprecated_kinds__success(mocker):
-    mocker.patch(
-        "exporter.app.get_kinds_from_helm_release",
-        return_value=[
+    with app.app.test_client() as client:
+        releases = client.get(
+            "/api/v1/releases?api_version=networking.k8s.io/v1beta1"
+        ).get_json()
+
+    assert releases["items"] == [RELEASE_STATS[3]]
+
+
+def test_is_older_than__more_than_a_day__success():
+    assert app.is_older_than("1d", app.datetime(2022, 1, 20)) is True
+    assert app.is_older_than("1d", app.datetime.now()) is False
+
+
+def test_load_persisted_data__serve_persisted_data__success(data_file):
+    app.app_data["run_helm_update"] = False
+    with ResultStore(data_file) as store:
+        last_run = store.last_scan()["last_run"]
+        scan_id = store.start_scan(last_run)
+        store.upsert_release(scan_id, RELEASE_STATS[0], DEPRECATIONS[:1])
+        store.finish_scan(scan_id, dict(store.last_scan(), number_deployed_releases=1))
+
+    app.load_persisted_data(data_file)
+
+    assert app.app_data["deprecations"] == DEPRECATIONS[:1]
+    assert app.app_data["number_releases_with_removed_api_versions"] == 1
+    assert app.app_data["last_run"] == last_run
+    assert app.app_data["data_last_run"] == last_run
+    assert app.app_data["run_helm_update"] is False
+
+
+def test_load_persisted_data__outdated_data__trigger_helm_update(tmp_path):
+    data_file = str(tmp_path / "kdave.db")
+    app.app_data["run_helm_update"] = False
+    with ResultStore(data_file) as store:
+        store.save(
+            DEPRECATIONS,
+            RELEASE_STATS,
             {
-                "kind": "Deployment",
-                "apiVersion": "extensions/v1beta1",
-                "metadata": {"name": "nginx"},
-            }
-        ],
-    )
-    assert app.get_deployed_deprecated_kinds(
-        HELM_V2_BINARY, "nginx", "default", "v1.9.0"
-    ) == [
-        {
-            "deprecated": "true",
-            "removed": "false",
-            "replacement_api": "apps/v1",
-            "removed_in_version": "v1.16.0",
-            "deprecated_in_version": "v1.9.0",
-            "kind": "Deployment",
-            "api_version": "extensions/v1beta1",
-            "name": "nginx",
-            "release_name": "nginx",
-            "namespace": "default",
-            "k8s_version": "v1.9.0",
-            "removed_in_next_release": "false",
-            "removed_in_next_2_releases": "false",
-        }
-    ]
+                "last_run": "2022-01-20T00:26:25",
+                "duration_seconds": 10,
+                "number_deployed_releases": 4,
+                "number_releases_with_deprecated_api_versions": 3,
+                "number_releases_with_removed_api_versions": 2,
+            },
+        )
 
+    app.load_persisted_data(data_file)
 
-def test_get_deprecations_for_all_releases__update_existing_data__success(mocker):
-    K8s_VERSION = "v1.21.0"
-    MAXIMUM = 256
-    app.get_deprecations_for_all_releases(
-        1,
-        app.queue.Queue,
-        app.threading.Event(),
-        app.threading.Event(),
-        HELM_V2_BINARY,
-        K8s_VERSION,
-        MAXIMUM,
-        app_data=app.app_data,
-        lock=app.lock,
-        data_file="tests/fixtures/data.json",
+    assert len(app.app_data["deprecations"]) == 3
+    assert app.app_data["run_helm_update"] is True
+    assert app.get_data_age_seconds() > 86400
+
+
+def test_load_persisted_data__rolling_slices__resume_from_the_next_slice(
+    mocker, data_file
+):
+    mocker.patch("exporter.app.rolling_slices", 3)
+    mocker.patch.dict(app.app_data, {"rolling_slice": 0})
+    with ResultStore(data_file) as store:
+        stats = store.last_scan()
+        store.finish_scan(store.start_scan(stats["last_run"]), stats, 1, 3)
+
+    app.load_persisted_data(data_file)
+
+    assert app.get_rolling_slice(app_data=app.app_data, lock=app.lock) == 2
+
+
+def test_load_persisted_data__empty_data_file__do_nothing(tmp_path, mocker):
+    update_global_app_data_mocker = mocker.patch("exporter.app.update_global_app_data")
+    app.load_persisted_data(str(tmp_path / "kdave.db"))
+
+    update_global_app_data_mocker.assert_not_called()
+
+
+def test_get_metrics__export_data_age__success(mocker):
+    mocker.patch("exporter.app.get_fetched_helm_data", return_value=[])
+    app.app_data["data_last_run"] = "2022-01-20T00:26:25"
+
+    with app.app.test_request_context("/metrics"):
+        metrics = app.get_metrics().get_data(as_text=True)
+
+    assert "wf_k8s_deprecated_versions_data_age_seconds " in metrics
+
+
+def test_get_metrics__export_scan_progress__success(mocker):
+    mocker.patch("exporter.app.get_fetched_helm_data", return_value=[])
+    progress = ScanProgress()
+    progress.listed()
+    app.update_scan_progress(progress, app.queue.Queue())
+
+    with app.app.test_request_context("/metrics"):
+        metrics = app.get_metrics().get_data(as_text=True)
+
+    assert "wf_k8s_deprecated_versions_scan_releases_listed 1.0" in metrics
+    assert "wf_k8s_deprecated_versions_scan_eta_seconds NaN" in metrics
+    with app.app.test_client() as client:
+        status = client.get("/api/v1/scan").get_json()
+    assert status["progress"]["releases_listed"] == 1
+    app.app_data["scan_progress"] = {}
+
+
+def test_get_self_metrics__success():
+    progress = ScanProgress()
+    app.update_scan_progress(progress, app.queue.Queue())
+
+    with app.app.test_client() as client:
+        metrics = client.get("/metrics/self").get_data(as_text=True)
+
+    assert "wf_k8s_deprecated_versions_helm_command_duration_seconds" in metrics
+    assert "wf_k8s_deployed_releases" not in metrics
+    app.app_data["scan_progress"] = {}
+
+
+def test_admin_endpoints__guarded_by_the_admin_token(mocker):
+    with app.app.test_client() as client:
+        assert client.get("/admin/profile").status_code == 404
+
+        mocker.patch("exporter.app.admin_token", "secret")
+        assert client.get("/admin/profile").status_code == 401
+        assert (
+            client.get(
+                "/admin/profile", headers={"Authorization": "Bearer wrong"}
+            ).status_code
+            == 401
+        )
+        assert (
+            client.get(
+                "/admin/profile", headers={"Authorization": "Bearer s\u00e9cret"}
+            ).status_code
+            == 401
+        )
+
+
+def test_profile_api__profile_next_job__success(mocker):
+    mocker.patch("exporter.app.admin_token", "secret")
+    headers = {"Authorization": "Bearer secret"}
+    app.app_data["profile"] = {}
+
+    with app.app.test_client() as client:
+        assert client.get("/admin/profile", headers=headers).status_code == 404
+        assert client.post("/admin/profile", headers=headers).status_code == 202
+        assert app.app_data["profile_requested"] is True
+
+        app.profiling.start_profiling()
+        app.profiling.profiled(app.get_number_of_releases)(
+            RELEASE_STATS, "has_removed_api_versions"
+        )
+        app.save_scan_profile()
+
+        pstats = client.get("/admin/profile", headers=headers)
+        invalid = client.get("/admin/profile?format=svg", headers=headers)
+
+    assert app.app_data["profile_requested"] is False
+    assert "get_number_of_releases" in pstats.get_data(as_text=True)
+    assert invalid.status_code == 400
+    app.app_data["profile"] = {}
+
+
+def test_tracemalloc_api__helm_handler_snapshot__success(mocker):
+    mocker.patch("exporter.app.admin_token", "secret")
+    mocker.patch(
+        "exporter.app.profiling.allocation_tracker.report", return_value="Top sites\n"
     )
-    assert app.app_data["deprecations"] == []
+    headers = {"Authorization": "Bearer secret"}
+    app.app_data["tracemalloc_report"] = ""
 
+    with app.app.test_client() as client:
+        assert (
+            client.get("/admin/tracemalloc/helm-handler", headers=headers).status_code
+            == 404
+        )
+        client.post("/admin/tracemalloc/helm-handler", headers=headers)
+        app.handle_admin_requests()
+        report = client.get("/admin/tracemalloc/helm-handler", headers=headers)
+        flask_report = client.get("/admin/tracemalloc/flask-app", headers=headers)
 
-def test_is_updated_data_file():
-    assert app.is_updated_data_file("tests/fixtures/data.json") is True
+    assert app.app_data["tracemalloc_requested"] is False
+    assert report.get_data(as_text=True) == "Top sites\n"
+    assert flask_report.get_data(as_text=True) == "Top sites\n"
+    app.scan_event.clear()
 
 
-def test_load_from_data_file__success():
-    data_file = "tests/fixtures/data.json"
-    all_data = app.load_from_data_file(data_file)
-    assert all_data["data"] == []
-    assert all_data["release_stats"] == []
-    assert all_data["duration_seconds"] == 0
+def test_request_helm_update__wake_up_helm_handler__success():
+    app.app_data["run_helm_update"] = False
+    app.scan_event.clear()
 
+    app.request_helm_update()
 
-def test_export_deprecated_versions_metrics__success(mocker):
-    K8s_VERSION = "v1.21.0"
-    MAXIMUM = 256
-    mocked_queue = mocker.patch("exporter.app.queue.Queue")
-    mocked_exit_event = mocker.patch("exporter.app.threading.Event")
-    mocked_error_event = mocker.patch("exporter.app.threading.Event")
-    mocked_lock = mocker.patch("exporter.app.manager.Lock")
+    assert app.app_data["run_helm_update"] is True
+    assert app.scan_event.is_set()
 
-    app.app_data["run_helm_update"] = True
+
+def test_trigger_scan_api__job_running__coalesce_request():
+    app.app_data["processing"] = True
+    app.app_data["run_helm_update"] = False
+
+    with app.app.test_client() as client:
+        response = client.post("/api/v1/scan")
+
+    assert response.status_code == 202
+    assert response.get_json()["processing"] is True
+    assert app.app_data["run_helm_update"] is False
+    app.app_data["processing"] = False
+
+
+def test_trigger_scan_api__request_job__success():
     app.app_data["processing"] = False
+    app.app_data["run_helm_update"] = False
+
+    with app.app.test_client() as client:
+        response = client.post("/api/v1/scan")
+        status = client.get("/api/v1/scan").get_json()
+
+    assert response.status_code == 202
+    assert status["requested"] is True
+
+
+def test_export_deprecated_versions_metrics__scheduled_job_due__run_job(mocker):
+    app.app_data["run_helm_update"] = False
+    app.app_data["processing"] = False
+    app.app_data["last_run"] = "2022-01-20T00:26:25"
+    scan_event = mocker.Mock()
     get_deprecations_for_all_releases_mocker = mocker.patch(
         "exporter.app.get_deprecations_for_all_releases"
     )
+
     app.export_deprecated_versions_metrics(
         1,
-        mocked_queue,
-        mocked_exit_event,
-        mocked_error_event,
+        app.queue.Queue(),
+        app.threading.Event(),
+        app.threading.Event(),
         HELM_V2_BINARY,
-        K8s_VERSION,
-        MAXIMUM,
-        app_data=app.app_data,
-        lock=mocked_lock,
-        data_file="tests/fixtures/data.json",
+        "v1.21.0",
+        256,
         run_once=True,
+        scheduler=ScanScheduler(3600),
+        scan_event=scan_event,
     )
-    get_deprecations_for_all_releases_mocker.assert_called_with(
-        1,
-        mocked_queue,
-        mocked_exit_event,
-        mocked_error_event,
-        HELM_V2_BINARY,
-        K8s_VERSION,
-        MAXIMUM,
-        app_data=app.app_data,
-        lock=mocked_lock,
-        data_file="tests/fixtures/data.json",
-        helm_version=None,
-    )
-
 
-def test_get_fetched_helm_data__success(mocker):
-    app.app_data["last_run"] = ""
-    app.get_fetched_helm_data(app_data=app.app_data, lock=app.lock)
-    assert app.app_data["run_helm_update"] is True
+    scan_event.wait.assert_called_once_with(timeout=0.0)
+    get_deprecations_for_all_releases_mocker.assert_called_once()
+    assert app.app_data["next_run"] == "2022-01-20T01:26:25"
 
 
-def test_get_fetched_helm_data__is_older_than__success(mocker):
+def test_export_deprecated_versions_metrics__wait_for_next_run__success(mocker):
     app.app_data["run_helm_update"] = False
-    mocker.patch("exporter.app.is_older_than", return_value=True)
-    app.get_fetched_helm_data(app_data=app.app_data, lock=app.lock)
-    assert app.app_data["run_helm_update"] is True
-    assert app.app_data["deprecations"] == []
-
-
-def test_get_metrics__success(mocker):
-    get_fetched_helm_data_mocker = mocker.patch("exporter.app.get_fetched_helm_data")
-    app.get_metrics()
-    get_fetched_helm_data_mocker.assert_called_once()
-
-
-def test_app_is_healthy__success(mocker):
-    app.app_data["last_run"] = ""
-    mocker.patch("exporter.app.is_older_than", return_value=True)
-    assert app.app_is_healthy() == "OK"
-
+    app.app_data["processing"] = False
+    app.app_data["last_run"] = app.datetime.now().isoformat(timespec="seconds")
+    scan_event = mocker.Mock()
+    get_deprecations_for_all_releases_mocker = mocker.patch(
+        "exporter.app.get_deprecations_for_all_releases"
+    )
 
-def test_app_is_healthy__job_exceeded_accepted_delay__raises_job_execution_error(
-    mocker
-):
-    app.app_data["last_run"] = "2022-01-20T00:26:25"
-    mocker.patch("exporter.app.is_older_than", return_value=True)
+    app.export_deprecated_versions_metrics(
+        1,
+        app.queue.Queue(),
+        app.threading.Event(),
+        app.threading.Event(),
+        HELM_V2_BINARY,
+        "v1.21.0",
+        256,
+        run_once=True,
+        scheduler=ScanScheduler(3600),
+        scan_event=scan_event,
+    )
 
-    with pytest.raises(JobExecutionError):
-        app.app_is_healthy()
+    assert scan_event.wait.call_args[1]["timeout"] > 3500
+    get_deprecations_for_all_releases_mocker.assert_not_called()
@@ -0,0 +1,200 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from exporter import checker, helper
+from exporter.cache import DependencyCache, ResultCache
+from exporter.constants import HELM_V2_BINARY, HELM_V3_BINARY
+
+CATALOG = "tests/fixtures/versions.yaml"
+
+
+def test_result_cache__key__change_with_content_catalog_and_version(tmp_path):
+    manifest = tmp_path / "deployment.yaml"
+    manifest.write_text("kind: Deployment")
+    cache = ResultCache(str(tmp_path / "cache"), CATALOG)
+    key = cache.get_key(str(manifest), "1.16.0")
+
+    assert cache.get_key(str(manifest), "1.16.0") == key
+    assert cache.get_key(str(manifest), "1.22.0") != key
+    assert (
+        ResultCache(str(tmp_path / "cache"), str(manifest)).get_key(
+            str(manifest), "1.16.0"
+        )
+        != key
+    )
+    manifest.write_text("kind: StatefulSet")
+    assert cache.get_key(str(manifest), "1.16.0") != key
+
+
+def test_result_cache__put_and_get__success(tmp_path):
+    cache = ResultCache(str(tmp_path), CATALOG)
+    result = [{"kind": "Deployment", "deprecated": "true"}, {}]
+
+    assert cache.get("0" * 64) is None
+    cache.put("0" * 64, result)
+
+    assert cache.get("0" * 64) == result
+    assert [name for name in os.listdir(tmp_path / "00")] == [f"{'0' * 64}.json"]
+
+
+def test_result_cache__prune__remove_least_recently_used_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), CATALOG)
+    keys = [f"{i}" * 64 for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, [{"kind": "Deployment"}])
+        os.utime(cache.get_entry_path(key), (1000 - age, 1000 - age))
+    # The cache fits a single entry.
+    cache.max_size = os.path.getsize(cache.get_entry_path(keys[0]))
+    # The oldest entry is used again.
+    cache.get(keys[2])
+
+    cache.prune()
+
+    assert [cache.get(key) is not None for key in keys] == [False, False, True]
+
+
+def test_check_file__cached__skip_the_check(mocker, tmp_path):
+    cache = ResultCache(str(tmp_path), CATALOG)
+    check_mock = mocker.patch(
+        "exporter.checker.check_deprecations_in_files",
+        wraps=checker.check_deprecations_in_files,
+    )
+
+    first = checker.check_file("tests/fixtures/multiple-document.yaml", "1.16.0", cache)
+    second = checker.check_file(
+        "tests/fixtures/multiple-document.yaml", "1.16.0", cache
+    )
+
+    assert first == second
+    check_mock.assert_called_once()
+
+
+def test_check_deprecations_all__cache_dir__same_results(tmp_path):
+    def check():
+        return checker.check_deprecations_all(
+            "tests/fixtures/multiple-document.yaml",
+            HELM_V2_BINARY,
+            k8s_version="1.16.0",
+            tabulate=False,
+            cache_dir=str(tmp_path),
+        )
+
+    result = check()
+
+    assert result
+    assert check() == result
+
+
+def create_chart(path, requirements="dependencies: []"):
+    path.mkdir()
+    (path / "Chart.yaml").write_text("name: nginx\nversion: 1.0.0\n")
+    (path / "requirements.yaml").write_text(requirements)
+    return path
+
+
+def test_dependency_cache__key__change_with_the_dependencies(tmp_path):
+    chart = create_chart(tmp_path / "nginx")
+    cache = DependencyCache(str(tmp_path / "cache"))
+    key = cache.get_key(str(chart), HELM_V2_BINARY)
+
+    (chart / "templates").mkdir()
+    (chart / "templates" / "deployment.yaml").write_text("kind: Deployment")
+    assert cache.get_key(str(chart), HELM_V2_BINARY) == key
+    assert cache.get_key(str(chart), HELM_V3_BINARY) != key
+    (chart / "requirements.lock").write_text(
+        "digest: sha256:0\ngenerated: 2022-01-20T00:26:25Z\n"
+    )
+    assert cache.get_key(str(chart), HELM_V2_BINARY) != key
+    key = cache.get_key(str(chart), HELM_V2_BINARY)
+    # helm dependency update rewrites the lock file with a new generated date.
+    (chart / "requirements.lock").write_text(
+        "digest: sha256:0\ngenerated: 2022-01-21T00:26:25Z\n"
+    )
+    assert cache.get_key(str(chart), HELM_V2_BINARY) == key
+    (chart / "requirements.lock").write_text("digest: sha256:1\n")
+    assert cache.get_key(str(chart), HELM_V2_BINARY) != key
+    key = cache.get_key(str(chart), HELM_V2_BINARY)
+    (chart / "Chart.yaml").write_text(
+        "name: nginx\nversion: 1.0.0\ndependencies:\n- name: redis\n"
+    )
+    assert cache.get_key(str(chart), HELM_V2_BINARY) != key
+
+
+def test_dependency_cache__prune__remove_least_recently_used_entries(tmp_path):
+    cache = DependencyCache(str(tmp_path))
+    keys = [f"{i}" * 64 for i in range(3)]
+    for age, key in enumerate(keys):
+        chart = tmp_path / f"chart-{age}"
+        (chart / "charts").mkdir(parents=True)
+        (chart / "charts" / "redis-1.0.0.tgz").write_text("redis")
+        cache.put(key, str(chart))
+        os.utime(cache.get_entry_path(key), (1000 - age, 1000 - age))
+    # The cache fits a single entry.
+    cache.max_size = len("redis")
+    # The oldest entry is used again.
+    assert cache.restore(keys[2], str(tmp_path / "chart-0"))
+
+    cache.prune()
+
+    assert [os.path.isdir(cache.get_entry_path(key)) for key in keys] == [
+        False,
+        False,
+        True,
+    ]
+
+
+def test_helm_build_dependencies__cache__restore_the_charts_directory(mocker, tmp_path):
+    cache = DependencyCache(str(tmp_path / "cache"))
+
+    def update_dependencies(command):
+        charts = os.path.join(command[-1], "charts")
+        os.makedirs(charts)
+        with open(os.path.join(charts, "redis-1.0.0.tgz"), "w") as fd:
+            fd.write("redis")
+
+    run_mock = mocker.patch(
+        "exporter.helper._run_helm_command", side_effect=update_dependencies
+    )
+    first = create_chart(tmp_path / "first")
+    second = create_chart(tmp_path / "second")
+
+    helper.helm_build_dependencies(HELM_V2_BINARY, str(first), cache)
+    (second / "charts").mkdir()
+    (second / "charts" / "stale-0.1.0.tgz").write_text("stale")
+    helper.helm_build_dependencies(HELM_V2_BINARY, str(second), cache)
+
+    run_mock.assert_called_once_with(
+        [HELM_V2_BINARY, "dependency", "update", str(first)]
+    )
+    assert os.listdir(second / "charts") == ["redis-1.0.0.tgz"]
+    assert (second / "charts" / "redis-1.0.0.tgz").read_text() == "redis"
+    assert not [name for name in os.listdir(second) if name.startswith(".charts-")]
+
+
+def test_helm_build_dependencies__concurrent_jobs__update_the_dependencies_once(
+    mocker, tmp_path
+):
+    cache = DependencyCache(str(tmp_path / "cache"))
+
+    def update_dependencies(command):
+        time.sleep(0.1)
+        os.makedirs(os.path.join(command[-1], "charts"))
+
+    run_mock = mocker.patch(
+        "exporter.helper._run_helm_command", side_effect=update_dependencies
+    )
+    charts = [str(create_chart(tmp_path / f"chart-{i}")) for i in range(4)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                lambda chart: helper.helm_build_dependencies(
+                    HELM_V2_BINARY, chart, cache
+                ),
+                charts,
+            )
+        )
+
+    run_mock.assert_called_once()
+    assert all(os.path.isdir(os.path.join(chart, "charts")) for chart in charts)
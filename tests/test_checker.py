@@ -0,0 +1,990 @@
+import logging
+import os.path
+import shutil
+import subprocess  # nosec
+import tarfile
+
+import pytest
+from kubernetes.client.rest import ApiException
+
+from exporter import checker
+from exporter.constants import HELM_V2_BINARY
+from exporter.exceptions import (
+    DeprecatedAPIVersionError,
+    FailedChartsError,
+    HelmCommandError,
+    InvalidSemVerError,
+    K8sYAMLReadError,
+    UnauthorizedError,
+    versionsFileNotFoundError,
+)
+
+
+def test_k8s_api_initialize__success(mocker, api_mock, config_mock):
+    # The config mock's load_incluster_config will not throw an exception
+    checker.k8sClient()
+
+    # Verify that methods were called as expected
+    config_mock.load_incluster_config.assert_called_once()
+    api_mock.assert_called_once()
+
+
+def test_list_namespaces__success(config_mock, api_mock):
+    client = checker.k8sClient()
+    client.list_namespaces()
+    api_mock.return_value.list_namespace.assert_called_once()
+
+
+def test_get_k8s_version__success(config_mock, version_api_mock):
+    client = checker.k8sClient()
+    client.k8s_version()
+    version_api_mock.return_value.get_code.assert_called_once()
+
+
+def test_get_deprecations__missing_versions_file__raises_error():
+    with pytest.raises(versionsFileNotFoundError):
+        checker.get_all_deprecations("./missing-file.yaml")
+
+
+def test_get_deprecations__success():
+    kind = "Deployment"
+    deprecations = checker.get_all_deprecations("tests/fixtures/versions.yaml")
+    assert deprecations[0]["kind"] == kind
+
+
+def test_get_deprecated_versions__success(mocker):
+    all_deprecated_versions = checker.get_all_deprecations(
+        "tests/fixtures/versions.yaml"
+    )
+    deprecated_deployment_versions = checker.get_deprecated_kind_versions(
+        "Deployment", all_deprecated_versions
+    )
+    assert isinstance(deprecated_deployment_versions, list)
+    assert isinstance(deprecated_deployment_versions[0], dict)
+    assert deprecated_deployment_versions[0]["kind"] == "Deployment"
+    assert deprecated_deployment_versions[0]["version"] == "extensions/v1beta1"
+    assert deprecated_deployment_versions[0]["replacementApi"] == "apps/v1"
+
+
+def test_get_kinds_in_deprecation_file__success(mocker):
+    all_deprecated_versions = checker.get_all_deprecations(
+        "tests/fixtures/versions.yaml"
+    )
+    kinds_in_deprecation_file = checker.get_kinds_in_deprecation_file(
+        all_deprecated_versions
+    )
+    assert isinstance(kinds_in_deprecation_file, list)
+    assert "Deployment" in kinds_in_deprecation_file
+    assert "DaemonSet" in kinds_in_deprecation_file
+    assert "PodSecurityPolicy" in kinds_in_deprecation_file
+
+
+@pytest.mark.parametrize(
+    ["kind", "api_version", "k8s_version", "result"],
+    [
+        ("Deployment", "extensions/v1beta1", "v1.12.0", True),
+        ("Deployment", "extensions/v1beta1", "v1.8.0", False),
+        ("Deployment", "apps/v1beta2", "v1.10.0", True),
+        ("StatefulSet", "apps/v1beta1", "v1.10.0", True),
+        ("NetworkPolicy", "extensions/v1beta1", "v1.10.0", True),
+        ("Ingress", "extensions/v1beta1", "v1.13.0", False),
+        ("Ingress", "extensions/v1beta1", "v1.14.0", True),
+        ("Ingress", "networking.k8s.io/v1beta1", "v1.19.0", True),
+        ("ReplicaSet", "extensions/v1beta1", "v1.17.0", False),
+        ("PriorityClass", "scheduling.k8s.io/v1beta1", "v1.17.0", True),
+    ],
+)
+def test_is_deprecated_version__success(kind, api_version, k8s_version, result):
+    all_deprecated_versions = checker.get_all_deprecations(
+        "tests/fixtures/versions.yaml"
+    )
+    assert (
+        checker.is_deprecated_version(
+            kind, api_version, k8s_version, all_deprecated_versions
+        )
+        == result
+    )
+
+
+@pytest.mark.parametrize(
+    ["kind", "api_version", "k8s_version", "result"],
+    [
+        ("Deployment", "extensions/v1beta1", "v1.12.0", False),
+        ("Deployment", "apps/v1beta2", "v1.16.0", True),
+        ("StatefulSet", "apps/v1beta1", "v1.16.0", True),
+        ("NetworkPolicy", "extensions/v1beta1", "v1.16.0", True),
+        ("NetworkPolicy", "extensions/v1beta1", "v1.15.0", False),
+        ("Ingress", "extensions/v1beta1", "v1.21.0", False),
+        ("Ingress", "extensions/v1beta1", "v1.22.0", True),
+        ("Ingress", "networking.k8s.io/v1beta1", "v1.20.0", False),
+        ("ReplicaSet", "extensions/v1beta1", "v1.17.0", True),
+        ("PriorityClass", "scheduling.k8s.io/v1beta1", "v1.17.0", True),
+        ("PodDisruptionBudgetList", "policy/v1beta1", "v1.17.0", False),
+    ],
+)
+def test_is_removed_version__success(kind, api_version, k8s_version, result):
+    all_deprecated_versions = checker.get_all_deprecations(
+        "tests/fixtures/versions.yaml"
+    )
+    assert (
+        checker.is_removed_version(
+            kind, api_version, k8s_version, all_deprecated_versions
+        )
+        == result
+    )
+
+
+@pytest.mark.parametrize(
+    ["kind", "api_version", "result"],
+    [
+        (
+            "Deployment",
+            "extensions/v1beta1",
+            {
+                "replacement_api": "apps/v1",
+                "removed_in_version": "v1.16.0",
+                "deprecated_in_version": "v1.9.0",
+            },
+        ),
+        (
+            "StatefulSet",
+            "apps/v1beta1",
+            {
+                "replacement_api": "apps/v1",
+                "removed_in_version": "v1.16.0",
+                "deprecated_in_version": "v1.9.0",
+            },
+        ),
+        (
+            "PodDisruptionBudget",
+            "policy/v1beta1",
+            {
+                "replacement_api": "n/a",
+                "removed_in_version": "n/a",
+                "deprecated_in_version": "v1.22.0",
+            },
+        ),
+    ],
+)
+def test_get_deprecated_kind_info__success(kind, api_version, result):
+    all_deprecated_versions = checker.get_all_deprecations(
+        "tests/fixtures/versions.yaml"
+    )
+    assert (
+        checker.get_deprecated_kind_info(kind, api_version, all_deprecated_versions)
+        == result
+    )
+
+
+@pytest.mark.parametrize(
+    ["version", "parsed_version"],
+    [
+        ("1.13.0", "1.13.0"),
+        ("v1.12.0", "1.12.0"),
+        ("v1.9.0-alpha.1", "1.9.0"),
+        ("v1.20.0-alpha.3", "1.20.0"),
+        ("v1.20.0-rc.0", "1.20.0"),
+        ("v1.22.0-alpha.1", "1.22.0"),
+    ],
+)
+def test_parse_semver__success(version, parsed_version):
+    assert checker.parse_semver(version) == parsed_version
+
+
+@pytest.mark.parametrize(
+    ["version", "steps", "incremented_version"],
+    [
+        ("1.13.0", 1, "1.14.0"),
+        ("v1.12.0", 2, "1.14.0"),
+        ("v1.9.0-alpha.1", 1, "1.10.0"),
+        ("v1.20.0-alpha.3", 3, "1.23.0"),
+        ("v1.20.0-rc.0", 2, "1.22.0"),
+        ("v1.22.0-alpha.1", 3, "1.25.0"),
+    ],
+)
+def test_increment_semver__success(version, steps, incremented_version):
+    assert checker.increment_semver(version, steps) == incremented_version
+
+
+def test_parse_semver__invalid_k8s_version__raises_invalid_semver_error():
+    version = "v1a.12.0"
+    with pytest.raises(InvalidSemVerError):
+        assert checker.parse_semver(version)
+
+
+def test__k8s_version__success(config_mock, version_api_mock):
+    checker._k8s_version()
+    version_api_mock.return_value.get_code.assert_called_once()
+
+
+def test__k8s_version__unauthorized__raises_unauthorized_error(
+    config_mock, version_api_mock
+):
+    version_api_mock.return_value.get_code.side_effect = ApiException(status=401)
+
+    with pytest.raises(UnauthorizedError):
+        checker._k8s_version()
+
+
+@pytest.mark.parametrize(
+    ["data", "k8s_version", "deprecations"],
+    [
+        (
+            {
+                "kind": "Deployment",
+                "apiVersion": "extensions/v1beta1",
+                "metadata": {"name": "nginx"},
+            },
+            "1.14.0",
+            {
+                "deprecated": "true",
+                "removed": "false",
+                "replacement_api": "apps/v1",
+                "removed_in_version": "v1.16.0",
+                "deprecated_in_version": "v1.9.0",
+                "kind": "Deployment",
+                "api_version": "extensions/v1beta1",
+                "name": "nginx",
+                "k8s_version": "1.14.0",
+                "removed_in_next_release": "false",
+                "removed_in_next_2_releases": "true",
+            },
+        ),
+        (
+            {
+                "kind": "Deployment",
+                "apiVersion": "apps/v1beta2",
+                "metadata": {"name": "nginx"},
+            },
+            "v1.19.10-gke.1600",
+            {
+                "deprecated": "true",
+                "removed": "true",
+                "replacement_api": "apps/v1",
+                "removed_in_version": "v1.16.0",
+                "deprecated_in_version": "v1.9.0",
+                "kind": "Deployment",
+                "api_version": "apps/v1beta2",
+                "name": "nginx",
+                "k8s_version": "v1.19.10-gke.1600",
+                "removed_in_next_release": "true",
+                "removed_in_next_2_releases": "true",
+            },
+        ),
+    ],
+)
+def test_check_deprecations__success(
+    mocker, config_mock, version_api_mock, data, k8s_version, deprecations
+):
+    mocker.patch("exporter.checker._k8s_version", return_value="v1.17.0")
+
+    assert checker.check_deprecations(data, k8s_version) == deprecations
+
+
+def test_check_deprecations_in_files__yaml_with_single_document__success():
+    assert checker.check_deprecations_in_files(
+        "tests/fixtures/single-document.yaml", "v1.16.0"
+    ) == [
+        {
+            "deprecated": "true",
+            "removed": "true",
+            "replacement_api": "apps/v1",
+            "removed_in_version": "v1.16.0",
+            "deprecated_in_version": "v1.9.0",
+            "kind": "Deployment",
+            "api_version": "extensions/v1beta1",
+            "name": "nginx-deployment",
+            "k8s_version": "v1.16.0",
+            "removed_in_next_release": "true",
+            "removed_in_next_2_releases": "true",
+        }
+    ]
+
+
+def test_check_deprecations_in_files__yaml_with_multiple_document__success():
+    assert checker.check_deprecations_in_files(
+        "tests/fixtures/multiple-document.yaml", "v1.16.0"
+    ) == [
+        {
+            "deprecated": "true",
+            "removed": "true",
+            "replacement_api": "apps/v1",
+            "removed_in_version": "v1.16.0",
+            "deprecated_in_version": "v1.9.0",
+            "kind": "Deployment",
+            "api_version": "apps/v1beta2",
+            "name": "nginx-deployment",
+            "k8s_version": "v1.16.0",
+            "removed_in_next_release": "true",
+            "removed_in_next_2_releases": "true",
+        },
+        {
+            "deprecated": "true",
+            "removed": "true",
+            "replacement_api": "apps/v1",
+            "removed_in_version": "v1.16.0",
+            "deprecated_in_version": "v1.9.0",
+            "kind": "Deployment",
+            "api_version": "extensions/v1beta1",
+            "name": "nginx-deployment",
+            "k8s_version": "v1.16.0",
+            "removed_in_next_release": "true",
+            "removed_in_next_2_releases": "true",
+        },
+    ]
+
+
+def test_get_files__return_single_file__success():
+    assert checker.get_files("tests/fixtures/multiple-document.yaml") == [
+        "tests/fixtures/multiple-document.yaml"
+    ]
+
+
+def test_get_files__return_files_in_directory__success():
+    files = checker.get_files("tests/fixtures/dir")
+    assert "tests/fixtures/dir/file-a.yaml" in files
+    assert "tests/fixtures/dir/file-b.yaml" in files
+    assert "tests/fixtures/dir/file-c.yaml" in files
+
+
+def test_get_files__non_existing_directory__log_error_and_return_empty_list(caplog):
+    with caplog.at_level(logging.DEBUG):
+        checker.get_files("/missing-dir")
+
+    assert (
+        "The provided path: /missing-dir doesn't exist or is not a directory."
+        in caplog.text
+    )
+    checker.get_files("/missing-dir") == []
+
+
+def test_check_deprecations_all__check_file__success():
+    assert checker.check_deprecations_all(
+        "tests/fixtures/single-document.yaml",
+        HELM_V2_BINARY,
+        k8s_version="1.9.0",
+        tabulate=False,
+    ) == [
+        {
+            "deprecated": "true",
+            "removed": "false",
+            "replacement_api": "apps/v1",
+            "removed_in_version": "v1.16.0",
+            "deprecated_in_version": "v1.9.0",
+            "kind": "Deployment",
+            "k8s_version": "1.9.0",
+            "removed_in_next_release": "false",
+            "removed_in_next_2_releases": "false",
+            "api_version": "extensions/v1beta1",
+            "name": "nginx-deployment",
+            "file_name": "single-document.yaml",
+        }
+    ]
+
+
+def test_handle_deprecation_in_files_output__drop_duplicated_objects():
+    files = ["tests/fixtures/single-document.yaml"] * 2
+
+    result = checker.handle_deprecation_in_files_output("1.9.0", files)
+
+    assert [checker.get_file_deprecation_key(dep) for dep in result] == [
+        (
+            "single-document.yaml",
+            "Deployment",
+            "nginx-deployment",
+            "extensions/v1beta1",
+        )
+    ]
+
+
+def test_handle_deprecation_in_files_output__jobs__same_results_in_the_same_order():
+    files = [
+        "tests/fixtures/dir/file-a.yaml",
+        "tests/fixtures/multiple-document.yaml",
+        "tests/fixtures/single-document.yaml",
+        "tests/fixtures/dir/file-b.yaml",
+        "tests/fixtures/dir/file-c.yaml",
+    ]
+
+    result = checker.handle_deprecation_in_files_output("1.16.0", files, jobs=2)
+
+    assert result
+    assert result == checker.handle_deprecation_in_files_output("1.16.0", files)
+
+
+def test_iter_files_chunks__success():
+    files = [f"file-{i}.yaml" for i in range(10)]
+
+    chunks = list(checker.iter_files_chunks(files, 2))
+
+    assert chunks == [files[0:2], files[2:4], files[4:6], files[6:8], files[8:10]]
+    assert list(checker.iter_files_chunks(files[:1], 4)) == [files[:1]]
+    assert list(checker.iter_files_chunks(iter(files), 2)) == [files]
+
+
+def test_iter_files__include_and_exclude_globs__success(tmp_path):
+    for path in [
+        "b.yaml",
+        "a.yml",
+        "notes.txt",
+        "charts/dep/c.yaml",
+        "templates/d.yaml",
+        "templates/tests/e.yaml",
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+
+    def walk(**kwargs):
+        return [
+            os.path.relpath(path, tmp_path)
+            for path in checker.iter_files(str(tmp_path), **kwargs)
+        ]
+
+    assert walk() == [
+        "a.yml",
+        "b.yaml",
+        "charts/dep/c.yaml",
+        "templates/d.yaml",
+        "templates/tests/e.yaml",
+    ]
+    assert walk(exclude=("charts", "templates/tests")) == [
+        "a.yml",
+        "b.yaml",
+        "templates/d.yaml",
+    ]
+    assert walk(include=("templates/*.yaml",)) == [
+        "templates/d.yaml",
+        "templates/tests/e.yaml",
+    ]
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    def git(*args):
+        subprocess.run(["git", "-C", str(tmp_path), *args], check=True)  # nosec
+
+    git("init", "-q")
+    for path in ["manifests/a.yaml", "manifests/b.yaml", "manifests/vendor/c.yaml"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy("tests/fixtures/single-document.yaml", tmp_path / path)
+    shutil.copy("tests/fixtures/versions.yaml", tmp_path / "versions.yaml")
+    git("add", ".")
+    git(
+        "-c",
+        "user.name=kdave",
+        "-c",
+        "user.email=kdave@example.com",
+        "commit",
+        "-qm",
+        "init",
+    )
+    for path in ["manifests/b.yaml", "manifests/vendor/c.yaml"]:
+        shutil.copy("tests/fixtures/multiple-document.yaml", tmp_path / path)
+    (tmp_path / "README.md").write_text("changed")
+
+    return tmp_path
+
+
+def test_get_changed_files__success(mocker, git_repo):
+    mocker.patch(
+        "exporter.checker.get_versions_file", return_value="config/versions.yaml"
+    )
+    source = str(git_repo / "manifests")
+
+    assert checker.get_changed_files(source, "HEAD") == [
+        f"{source}/b.yaml",
+        f"{source}/vendor/c.yaml",
+    ]
+    assert checker.get_changed_files(source, "HEAD", exclude=("vendor",)) == [
+        f"{source}/b.yaml"
+    ]
+    assert checker.get_changed_files(f"{source}/a.yaml", "HEAD") == []
+
+
+def test_check_deprecations_all__changed_since__check_changed_files(git_repo):
+    result = checker.check_deprecations_all(
+        str(git_repo / "manifests"),
+        HELM_V2_BINARY,
+        k8s_version="1.16.0",
+        tabulate=False,
+        changed_since="HEAD",
+    )
+
+    assert {dep["file_name"] for dep in result} == {"b.yaml", "c.yaml"}
+
+
+def test_get_changed_files__versions_file_changed__check_all_files(mocker, git_repo):
+    mocker.patch(
+        "exporter.checker.get_versions_file",
+        return_value=str(git_repo / "versions.yaml"),
+    )
+    (git_repo / "versions.yaml").write_text("deprecatedVersions: []\n")
+
+    assert checker.get_changed_files(str(git_repo / "manifests"), "HEAD") is None
+
+
+def test_get_changed_files__unknown_ref__check_all_files(git_repo, caplog):
+    assert checker.get_changed_files(str(git_repo), "missing-ref") is None
+    assert "Failed to list the files changed since missing-ref" in caplog.text
+
+
+def test_check_deprecations_all__stream__report_findings_as_they_are_found(
+    mocker, capsys
+):
+    files = ["tests/fixtures/single-document.yaml", "tests/fixtures/empty-file.yaml"]
+    checked = []
+    check_deprecations_in_files = checker.check_deprecations_in_files
+
+    def check_file(file, k8s_version, helm_binary):
+        # The finding of the first file is printed before the next file is checked.
+        checked.append((file, capsys.readouterr().out))
+        return check_deprecations_in_files(file, k8s_version)
+
+    mocker.patch("exporter.checker.iter_files", return_value=iter(files))
+    mocker.patch("exporter.checker.check_deprecations_in_files", side_effect=check_file)
+
+    with pytest.raises(DeprecatedAPIVersionError):
+        checker.check_deprecations_all(
+            "tests/fixtures", HELM_V2_BINARY, k8s_version="1.9.0", stream=True
+        )
+
+    assert checked == [
+        (files[0], ""),
+        (
+            files[1],
+            "single-document.yaml: The Deployment: nginx-deployment uses the "
+            "deprecated apiVersion: extensions/v1beta1. Use apps/v1 instead.\n",
+        ),
+    ]
+
+
+def test_check_deprecations_all__tabulate_output__success(mocker):
+    mock_print_table_format = mocker.patch("exporter.checker.print_table_format")
+    checker.check_deprecations_all(
+        "tests/fixtures/single-document.yaml",
+        HELM_V2_BINARY,
+        k8s_version="1.9.0",
+        tabulate=True,
+    )
+
+    mock_print_table_format.assert_called_once()
+
+
+def test_check_deprecations_all__log_deprecation_message__raises_deprecation_error(
+    mocker, caplog
+):
+
+    with pytest.raises(DeprecatedAPIVersionError):
+        checker.check_deprecations_all(
+            "tests/fixtures/single-document.yaml",
+            HELM_V2_BINARY,
+            k8s_version="1.9.0",
+            message=True,
+        )
+
+
+def test_check_deprecations_all__check_release__success(mocker):
+    helm_template_mocker = mocker.patch("exporter.checker.iter_helm_template")
+    iter_files_mocker = mocker.patch("exporter.checker.iter_files")
+    check_release_deprecation_mocker = mocker.patch(
+        "exporter.checker.check_release_deprecation"
+    )
+    checker.check_deprecations_all(
+        "tests/fixtures/single-document.yaml",
+        HELM_V2_BINARY,
+        k8s_version="1.9.0",
+        release="nginx",
+    )
+
+    check_release_deprecation_mocker.assert_called_once()
+    helm_template_mocker.assert_not_called()
+    iter_files_mocker.assert_not_called()
+
+
+def test_check_deprecations_all__check_namespace_releases__success(mocker):
+    helm_template_mocker = mocker.patch("exporter.checker.iter_helm_template")
+    iter_files_mocker = mocker.patch("exporter.checker.iter_files")
+    check_release_deprecation_mocker = mocker.patch(
+        "exporter.checker.check_release_deprecation"
+    )
+    check_deprecation_for_releases_mocker = mocker.patch(
+        "exporter.checker.check_deprecation_for_namespace_releases"
+    )
+    checker.check_deprecations_all(
+        "tests/fixtures/single-document.yaml",
+        HELM_V2_BINARY,
+        k8s_version="1.9.0",
+        namespace="nginx",
+    )
+
+    check_release_deprecation_mocker.assert_not_called()
+    helm_template_mocker.assert_not_called()
+    iter_files_mocker.assert_not_called()
+    check_deprecation_for_releases_mocker.assert_called_once()
+
+
+def test_check_deprecations_all__check_chart__success(mocker):
+    helm_template_mocker = mocker.patch(
+        "exporter.checker.iter_helm_template", return_value=[(None, "/tmp/helm")]
+    )
+    iter_files_mocker = mocker.patch("exporter.checker.iter_files")
+    check_deprecation_for_releases_mocker = mocker.patch(
+        "exporter.checker.check_deprecation_for_namespace_releases"
+    )
+    check_release_deprecation_mocker = mocker.patch(
+        "exporter.checker.check_release_deprecation"
+    )
+    checker.check_deprecations_all(
+        "tests/fixtures/single-document.yaml",
+        HELM_V2_BINARY,
+        k8s_version="1.9.0",
+        chart="nginx",
+    )
+
+    helm_template_mocker.assert_called_once()
+    iter_files_mocker.assert_called_once()
+    check_release_deprecation_mocker.assert_not_called()
+    check_deprecation_for_releases_mocker.assert_not_called()
+
+
+def test_check_deprecations_all__check_chart_in_memory__success(mocker):
+    helm_template_mocker = mocker.patch("exporter.checker.iter_helm_template")
+    mocker.patch(
+        "exporter.checker.helm_template_manifests",
+        return_value=iter(
+            [
+                (
+                    None,
+                    "nginx/templates/deployment.yaml",
+                    "# Source: nginx/templates/deployment.yaml\n"
+                    "apiVersion: extensions/v1beta1\n"
+                    "kind: Deployment\n"
+                    "metadata:\n"
+                    "  name: nginx\n",
+                ),
+                (
+                    None,
+                    "nginx/templates/empty.yaml",
+                    "# Source: nginx/templates/empty.yaml",
+                ),
+            ]
+        ),
+    )
+
+    result = checker.check_deprecations_all(
+        None,
+        HELM_V2_BINARY,
+        k8s_version="1.16.0",
+        chart="tests/fixtures/nginx",
+        tabulate=False,
+        in_memory=True,
+    )
+
+    helm_template_mocker.assert_not_called()
+    assert [(dep["file_name"], dep["name"], dep["removed"]) for dep in result] == [
+        ("deployment.yaml", "nginx", "true")
+    ]
+
+
+def test_check_deprecations_all__check_chart_sites__name_files_after_their_site(
+    mocker, tmp_path
+):
+    for site_dir in ("east/prod", "west/prod"):
+        rendered_dir = tmp_path / site_dir / "nginx" / "templates"
+        rendered_dir.mkdir(parents=True)
+        shutil.copy(
+            "tests/fixtures/single-document.yaml", rendered_dir / "deployment.yaml"
+        )
+    mocker.patch(
+        "exporter.checker.iter_helm_template",
+        return_value=iter(
+            (site_dir, str(tmp_path / site_dir))
+            for site_dir in ("east/prod", "west/prod")
+        ),
+    )
+
+    result = checker.check_deprecations_all(
+        None,
+        HELM_V2_BINARY,
+        k8s_version="1.16.0",
+        chart="tests/fixtures/nginx",
+        tabulate=False,
+        jobs=2,
+    )
+
+    assert [dep["file_name"] for dep in result] == [
+        "east/prod/deployment.yaml",
+        "west/prod/deployment.yaml",
+    ]
+
+
+def create_archive(path, members, mode="w:gz"):
+    with tarfile.open(path, mode) as tar:
+        for name, fixture in members.items():
+            tar.add(fixture, arcname=name)
+    return path
+
+
+def create_packaged_chart(path):
+    # The layout of the archives of helm package, with the templates not rendered.
+    chart_dir = path.parent / "app"
+    (chart_dir / "templates").mkdir(parents=True)
+    (chart_dir / "Chart.yaml").write_text("apiVersion: v1\nname: app\nversion: 1.0.0\n")
+    (chart_dir / "values.yaml").write_text("replicas: 1\n")
+    (chart_dir / "templates" / "deployment.yaml").write_text(
+        "apiVersion: extensions/v1beta1\n"
+        "kind: Deployment\n"
+        "metadata:\n"
+        "  name: {{ .Release.Name }}\n"
+        "spec:\n"
+        "  replicas: {{ .Values.replicas }}\n"
+    )
+    with tarfile.open(path, "w:gz") as tar:
+        tar.add(chart_dir, arcname="app")
+    shutil.rmtree(chart_dir)
+    return path
+
+
+PACKAGED_CHART_TEMPLATE_OUTPUT = """---
+# Source: app/templates/deployment.yaml
+apiVersion: extensions/v1beta1
+kind: Deployment
+metadata:
+  name: app
+spec:
+  replicas: 1
+"""
+
+
+def test_check_deprecations_all__packaged_chart__check_its_rendered_manifests(
+    mocker, tmp_path
+):
+    archive = create_packaged_chart(tmp_path / "app-1.0.0.tgz")
+    run_mock = mocker.patch(
+        "exporter.helper._run_helm_command",
+        return_value=PACKAGED_CHART_TEMPLATE_OUTPUT,
+    )
+
+    result = checker.check_deprecations_all(
+        str(archive), HELM_V2_BINARY, k8s_version="1.16.0", tabulate=False
+    )
+
+    run_mock.assert_called_once_with(
+        [HELM_V2_BINARY, "template", str(archive), "--name", "app"]
+    )
+    assert [(dep["file_name"], dep["name"]) for dep in result] == [
+        ("app-1.0.0.tgz/app/templates/deployment.yaml", "app")
+    ]
+    assert os.listdir(tmp_path) == ["app-1.0.0.tgz"]
+
+
+def test_check_deprecations_all__manifests_bundle__skip_the_files_without_kind(
+    mocker, tmp_path
+):
+    (tmp_path / "values.yaml").write_text("replicas: 1\n")
+    archive = create_archive(
+        tmp_path / "manifests.tgz",
+        {
+            "manifests/deployment.yaml": "tests/fixtures/multiple-document.yaml",
+            "manifests/values.yaml": str(tmp_path / "values.yaml"),
+            "manifests/README.md": "tests/fixtures/single-document.yaml",
+        },
+    )
+    run_mock = mocker.patch("exporter.helper._run_helm_command")
+
+    result = checker.check_deprecations_all(
+        str(archive), HELM_V2_BINARY, k8s_version="1.16.0", tabulate=False
+    )
+
+    run_mock.assert_not_called()
+    assert sorted((dep["file_name"], dep["api_version"]) for dep in result) == [
+        ("manifests.tgz/manifests/deployment.yaml", "apps/v1beta2"),
+        ("manifests.tgz/manifests/deployment.yaml", "extensions/v1beta1"),
+    ]
+
+
+def test_check_deprecations_all__archives_directory__jobs__same_results(tmp_path):
+    for name in ("a", "b", "c"):
+        create_archive(
+            tmp_path / f"{name}.tar",
+            {f"{name}/deployment.yaml": "tests/fixtures/single-document.yaml"},
+            mode="w",
+        )
+
+    def check(jobs):
+        return checker.check_deprecations_all(
+            str(tmp_path),
+            HELM_V2_BINARY,
+            k8s_version="1.16.0",
+            tabulate=False,
+            include=("*.tar",),
+            jobs=jobs,
+        )
+
+    result = check(2)
+
+    assert [dep["file_name"] for dep in result] == [
+        "a.tar/a/deployment.yaml",
+        "b.tar/b/deployment.yaml",
+        "c.tar/c/deployment.yaml",
+    ]
+    assert check(1) == result
+
+
+def test_check_deprecations_in_files__invalid_archive__raises_error(tmp_path):
+    archive = tmp_path / "broken.tgz"
+    archive.write_text("not an archive")
+
+    with pytest.raises(K8sYAMLReadError):
+        checker.check_deprecations_in_files(str(archive), "1.16.0")
+
+
+def test_discover_charts__skip_the_charts_dependencies(tmp_path):
+    for chart in ("apps/nginx", "apps/nginx/charts/redis", "apps/web", "infra/dns"):
+        (tmp_path / chart).mkdir(parents=True)
+        (tmp_path / chart / "Chart.yaml").write_text("name: chart")
+    (tmp_path / "docs").mkdir()
+
+    assert checker.discover_charts(str(tmp_path)) == [
+        str(tmp_path / "apps" / "nginx"),
+        str(tmp_path / "apps" / "web"),
+        str(tmp_path / "infra" / "dns"),
+    ]
+
+
+DEPLOYMENT_MANIFEST = """# Source: app/templates/deployment.yaml
+apiVersion: extensions/v1beta1
+kind: Deployment
+metadata:
+  name: app
+"""
+
+
+def test_check_deprecations_all__charts__summary_and_aggregated_exit(
+    mocker, capsys, caplog
+):
+    def helm_template_manifests(chart, *args):
+        if chart == "failed":
+            raise HelmCommandError("helm template failed")
+        if chart == "clean":
+            return iter([])
+        return iter([(None, "app/templates/deployment.yaml", DEPLOYMENT_MANIFEST)])
+
+    mocker.patch(
+        "exporter.checker.helm_template_manifests", side_effect=helm_template_manifests
+    )
+
+    with pytest.raises(FailedChartsError):
+        checker.check_deprecations_all(
+            None,
+            HELM_V2_BINARY,
+            k8s_version="1.16.0",
+            message=True,
+            in_memory=True,
+            jobs=3,
+            charts=("charts/app", "failed", "clean"),
+        )
+
+    assert capsys.readouterr().out.splitlines() == [
+        "charts/app: 1 removed and 0 deprecated apiVersions",
+        "failed: failed",
+        "clean: 0 removed and 0 deprecated apiVersions",
+        "The Deployment: app uses the removed apiVersion: extensions/v1beta1. Use apps/v1 instead.",
+    ]
+    assert "Failed to check the chart: failed. helm template failed" in caplog.text
+
+
+def test_check_deprecations_all__charts__failed_chart__raises_failed_charts_error(
+    mocker, tmp_path
+):
+    def iter_helm_template(chart, output_dir, *args):
+        if chart == "failed":
+            raise HelmCommandError("helm template failed")
+        os.makedirs(f"{output_dir}/app/templates")
+        shutil.copy(
+            "tests/fixtures/single-document.yaml",
+            f"{output_dir}/app/templates/deployment.yaml",
+        )
+        yield None, output_dir
+
+    mocker.patch("exporter.checker.iter_helm_template", side_effect=iter_helm_template)
+    mocker.patch("exporter.checker.prepare_template_tmp_dir")
+
+    with pytest.raises(FailedChartsError, match="Failed to check the charts: failed"):
+        checker.check_deprecations_all(
+            None,
+            HELM_V2_BINARY,
+            k8s_version="1.16.0",
+            output_dir=str(tmp_path),
+            charts=("app", "failed"),
+        )
+    assert os.path.isfile(tmp_path / "0-app" / "app" / "templates" / "deployment.yaml")
+
+
+def test_check_deprecation_for_releases__success(mocker):
+    helm_list_namespace_releases_mocker = mocker.patch(
+        "exporter.checker.helm_list_namespace_releases"
+    )
+    get_deployed_deprecated_kinds_mocker = mocker.patch(
+        "exporter.checker.get_deployed_deprecated_kinds"
+    )
+    checker.check_release_deprecation(HELM_V2_BINARY, release="nginx")
+
+    helm_list_namespace_releases_mocker.assert_not_called()
+    get_deployed_deprecated_kinds_mocker.assert_called_once()
+
+
+def test_check_deprecation_for_releases__check_namespace_releases__success(mocker):
+    helm_list_namespace_releases_mocker = mocker.patch(
+        "exporter.checker.helm_list_namespace_releases", return_value=["release"]
+    )
+    get_deployed_deprecated_kinds_mocker = mocker.patch(
+        "exporter.checker.get_deployed_deprecated_kinds"
+    )
+    checker.check_deprecation_for_namespace_releases(
+        HELM_V2_BINARY, namespace="default"
+    )
+
+    helm_list_namespace_releases_mocker.assert_called_once()
+    get_deployed_deprecated_kinds_mocker.assert_called_once()
+
+
+def test_get_kinds_from_helm_release__success(mocker):
+    helm_get_mocker = mocker.patch("exporter.checker.helm_get")
+    yaml_load_mocker = mocker.patch("exporter.checker.yaml.safe_load_all")
+    checker.get_kinds_from_helm_release(HELM_V2_BINARY, "nginx")
+
+    helm_get_mocker.assert_called_once()
+    yaml_load_mocker.assert_called_once()
+
+
+def test_get_deployed_deprecated_kinds__success(mocker):
+    mocker.patch(
+        "exporter.checker.get_kinds_from_helm_release",
+        return_value=[
+            {
+                "kind": "Deployment",
+                "apiVersion": "extensions/v1beta1",
+                "metadata": {"name": "nginx"},
+            }
+        ],
+    )
+    assert checker.get_deployed_deprecated_kinds(
+        HELM_V2_BINARY, "nginx", "default", "v1.9.0"
+    ) == [
+        {
+            "deprecated": "true",
+            "removed": "false",
+            "replacement_api": "apps/v1",
+            "removed_in_version": "v1.16.0",
+            "deprecated_in_version": "v1.9.0",
+            "kind": "Deployment",
+            "api_version": "extensions/v1beta1",
+            "name": "nginx",
+            "release_name": "nginx",
+            "namespace": "default",
+            "k8s_version": "v1.9.0",
+            "removed_in_next_release": "false",
+            "removed_in_next_2_releases": "false",
+        }
+    ]
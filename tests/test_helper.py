@@ -2,7 +2,10 @@
 
 import io
 import json
+import shutil
 import subprocess  # nosec
+import tarfile
+import threading
 from contextlib import redirect_stdout
 from unittest.mock import MagicMock
 
@@ -20,6 +23,7 @@ from exporter.exceptions import (
     HelmCommandError,
     K8sYAMLReadError,
 )
+from exporter.progress import ScanProgress
 
 
 def test_load_yaml_file__non_existing_file__raises_k8s_yaml_read_error(tmpdir):
@@ -121,6 +125,41 @@ def test_get_chart_name__success():
     assert name == "ingress-nginx"
 
 
+def test_get_chart_name__packaged_chart__read_the_archive(tmp_path):
+    archive = tmp_path / "ingress-nginx-1.0.0.tgz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add("tests/fixtures/nginx/Chart.yaml", arcname="ingress-nginx/Chart.yaml")
+        tar.add(
+            "tests/fixtures/single-document.yaml",
+            arcname="ingress-nginx/charts/redis/Chart.yaml",
+        )
+
+    assert helper.get_chart_name(str(archive)) == "ingress-nginx"
+
+
+def test_get_chart_name__packaged_chart_without_chart_yaml__raises_error(tmp_path):
+    archive = tmp_path / "empty.tgz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add("tests/fixtures/single-document.yaml", arcname="empty/values.yaml")
+
+    with pytest.raises(HelmChartYamlFileMissing):
+        helper.get_chart_name(str(archive))
+
+
+def test_is_packaged_chart__chart_yaml_at_the_chart_root(tmp_path):
+    chart = tmp_path / "ingress-nginx-1.0.0.tgz"
+    with tarfile.open(chart, "w:gz") as tar:
+        tar.add("tests/fixtures/nginx/Chart.yaml", arcname="ingress-nginx/Chart.yaml")
+    bundle = tmp_path / "manifests.tgz"
+    with tarfile.open(bundle, "w:gz") as tar:
+        tar.add(
+            "tests/fixtures/nginx/Chart.yaml", arcname="manifests/charts/a/Chart.yaml"
+        )
+
+    assert helper.is_packaged_chart(str(chart)) is True
+    assert helper.is_packaged_chart(str(bundle)) is False
+
+
 def test_helm_template__success(mocker):
     sub_process_mock = mocker.patch("subprocess.run")
 
@@ -192,6 +231,120 @@ def test_helm_template__subproces_error__raises_helm_command_error(mocker):
         )
 
 
+HELM_TEMPLATE_OUTPUT = """---
+# Source: ingress-nginx/templates/deployment.yaml
+apiVersion: extensions/v1beta1
+kind: Deployment
+metadata:
+  name: nginx
+---
+# Source: ingress-nginx/templates/service.yaml
+apiVersion: v1
+kind: Service
+metadata:
+  name: nginx
+---
+# Source: ingress-nginx/templates/deployment.yaml
+apiVersion: apps/v1beta2
+kind: Deployment
+metadata:
+  name: nginx-canary
+"""
+
+
+def test_split_helm_manifests__group_documents_by_source():
+    manifests = helper.split_helm_manifests(HELM_TEMPLATE_OUTPUT)
+
+    assert [source for source, _ in manifests] == [
+        "ingress-nginx/templates/deployment.yaml",
+        "ingress-nginx/templates/service.yaml",
+    ]
+    assert "nginx-canary" in manifests[0][1]
+    assert helper.split_helm_manifests("---\n\n") == []
+
+
+def test_helm_template_manifests__site_values__name_manifests_after_the_site(
+    mocker, tmp_path
+):
+    chart_path = tmp_path / "nginx"
+    shutil.copytree("tests/fixtures/nginx", chart_path)
+    (chart_path / "values" / "east").mkdir(parents=True)
+    (chart_path / "values" / "east" / "prod.yaml").write_text("")
+    run_mock = mocker.patch(
+        "exporter.helper._run_helm_command", return_value=HELM_TEMPLATE_OUTPUT
+    )
+
+    manifests = list(helper.helm_template_manifests(str(chart_path), HELM_V2_BINARY))
+
+    assert [(site_dir, source) for site_dir, source, _ in manifests] == [
+        ("east/prod", "east/prod/ingress-nginx/templates/deployment.yaml"),
+        ("east/prod", "east/prod/ingress-nginx/templates/service.yaml"),
+    ]
+    run_mock.assert_called_once_with(
+        [
+            "helm",
+            "template",
+            str(chart_path),
+            "--name",
+            "ingress-nginx",
+            "--values",
+            str(chart_path / "values" / "east" / "prod.yaml"),
+        ]
+    )
+
+
+def test_render_sites__jobs__render_concurrently_in_order_and_log_failed_sites(
+    tmp_path, caplog
+):
+    for site in ("a", "b", "c"):
+        (tmp_path / "east").mkdir(exist_ok=True)
+        (tmp_path / "east" / f"{site}.yaml").write_text("")
+    # Every render waits for the other renders, so they only finish if they overlap.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def render(site_dir, val):
+        barrier.wait()
+        if site_dir == "east/b":
+            raise HelmCommandError("failed")
+        return val
+
+    rendered = sorted(helper.render_sites(render, str(tmp_path), jobs=3))
+
+    assert rendered == [
+        ("east/a", str(tmp_path / "east" / "a.yaml")),
+        ("east/c", str(tmp_path / "east" / "c.yaml")),
+    ]
+    assert "Failed while templating for instance: east, and site: b." in caplog.text
+
+
+def test_iter_helm_template__site_values__render_every_site_to_its_directory(
+    mocker, tmp_path
+):
+    chart_path = tmp_path / "nginx"
+    output_dir = tmp_path / "output"
+    shutil.copytree("tests/fixtures/nginx", chart_path)
+    for site in ("prod", "stage"):
+        (chart_path / "values" / "east").mkdir(parents=True, exist_ok=True)
+        (chart_path / "values" / "east" / f"{site}.yaml").write_text("")
+    run_mock = mocker.patch("exporter.helper._run_helm_command")
+
+    rendered = sorted(
+        helper.iter_helm_template(
+            str(chart_path), str(output_dir), HELM_V2_BINARY, jobs=2
+        )
+    )
+
+    assert rendered == [
+        ("east/prod", f"{output_dir}/east/prod"),
+        ("east/stage", f"{output_dir}/east/stage"),
+    ]
+    assert sorted(call.args[0][-3] for call in run_mock.call_args_list) == [
+        f"{output_dir}/east/prod",
+        f"{output_dir}/east/stage",
+    ]
+    assert (output_dir / "east" / "prod").is_dir()
+
+
 def test_helm_build_dependencies__success(mocker):
     sub_process_mock = mocker.patch("subprocess.run")
 
@@ -303,6 +456,30 @@ def test_put_all_helm_releases_in_queue__helm_version__has_precedence_over_helm_
     put_helm_v3_mocker.assert_called_once()
 
 
+def test_put_release_in_queue__release_filter__skip_filtered_releases():
+    q = helper.queue.Queue()
+    releases = [
+        {
+            "name": name,
+            "namespace": namespace,
+            "updated": "2022-01-20 00:26:25",
+            "helm_version": "v3",
+        }
+        for name, namespace in (("nginx", "default"), ("redis", "cache"))
+    ]
+
+    progress = ScanProgress()
+
+    for release in releases:
+        helper.put_release_in_queue(
+            q, release, lambda info: info["namespace"] == "default", progress
+        )
+
+    assert q.qsize() == 1
+    assert q.get()["name"] == "nginx"
+    assert progress.releases_listed == 1
+
+
 def test_helm_get__success(mocker):
     sub_process_mock = mocker.patch("subprocess.run")
 
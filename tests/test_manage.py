@@ -1,7 +1,20 @@
+import shutil
+import subprocess  # nosec
+import sys
+
+import pytest
+
 from exporter import manage
-from exporter.constants import DEPRECATED_API_EXIT_CODE, HELM_V2_BINARY
+from exporter.constants import (
+    DEPRECATED_API_EXIT_CODE,
+    FAILED_CHARTS_EXIT_CODE,
+    FILES_INCLUDE,
+    HELM_V2_BINARY,
+    REMOVED_API_EXIT_CODE,
+)
 from exporter.exceptions import (
     DeprecatedAPIVersionError,
+    HelmCommandError,
     RemovedAPIVersionError,
     RemovedNextReleaseAPIVersionError,
 )
@@ -38,7 +51,15 @@ def test_cli__check__call_args(mocker, cli_runner):
         values=None,
         custom_values=None,
         skip_dependencies=False,
+        jobs=1,
+        include=FILES_INCLUDE,
+        exclude=(),
+        stream=False,
+        cache_dir=None,
+        changed_since=None,
+        in_memory=False,
         output_dir="/tmp/helm",
+        charts=(),
     )
 
 
@@ -112,3 +133,142 @@ def test_cli__removed_next_release_api_versions__overwrite_deprecated_exit_code_
     )
 
     assert result.exit_code == 80
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cli__check__jobs__same_exit_code(cli_runner, tmp_path, jobs):
+    for i in range(4):
+        shutil.copy("tests/fixtures/multiple-document.yaml", tmp_path / f"{i}.yaml")
+
+    result = cli_runner.invoke(
+        manage.check,
+        [
+            "--source",
+            str(tmp_path),
+            "--version",
+            "1.16.0",
+            "--message",
+            "--jobs",
+            jobs,
+        ],
+    )
+
+    assert result.exit_code == REMOVED_API_EXIT_CODE
+
+
+def test_cli__import__skip_the_server_dependencies():
+    # Benchmark the import of the CLI with python -X importtime, the check commands
+    # must not import the server dependencies nor start a multiprocessing manager.
+    result = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", "import exporter.manage"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            imported[module.strip()] = int(cumulative)
+
+    assert "exporter.manage" in imported
+    server_modules = {
+        module
+        for module in imported
+        if module.split(".")[0]
+        in ("flask", "gevent", "kubernetes", "prometheus_client")
+        or module in ("exporter.app", "multiprocessing.managers")
+    }
+    assert (
+        server_modules == set()
+    ), f"exporter.manage imported in {imported['exporter.manage']} us"
+
+
+def test_cli__check__charts_root__check_all_the_charts(mocker, cli_runner, tmp_path):
+    for name in ("nginx", "redis"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "Chart.yaml").write_text(f"name: {name}")
+    check_deprecations_all_mocker = mocker.patch(
+        "exporter.manage.check_deprecations_all"
+    )
+
+    result = cli_runner.invoke(
+        manage.check,
+        ["--chart", "tests/fixtures/nginx", "--charts-root", str(tmp_path)],
+    )
+
+    assert result.exit_code == 0
+    kwargs = check_deprecations_all_mocker.call_args.kwargs
+    assert kwargs["chart"] is None
+    assert kwargs["charts"] == (
+        "tests/fixtures/nginx",
+        str(tmp_path / "nginx"),
+        str(tmp_path / "redis"),
+    )
+
+
+def test_cli__check__charts_root_without_charts__usage_error(cli_runner, tmp_path):
+    result = cli_runner.invoke(manage.check, ["--charts-root", str(tmp_path)])
+
+    assert result.exit_code == 2
+
+
+def test_cli__check__cache_dir_without_cache__usage_error(mocker, cli_runner, tmp_path):
+    check_deprecations_all_mocker = mocker.patch(
+        "exporter.manage.check_deprecations_all"
+    )
+
+    result = cli_runner.invoke(
+        manage.check,
+        ["--source", "tests/fixtures", "--cache-dir", str(tmp_path)],
+    )
+
+    assert result.exit_code == 2
+    assert "--cache-dir is only used with --cache." in result.output
+    check_deprecations_all_mocker.assert_not_called()
+
+
+def test_cli__check__cache_dir_with_cache__use_the_cache_dir(
+    mocker, cli_runner, tmp_path
+):
+    check_deprecations_all_mocker = mocker.patch(
+        "exporter.manage.check_deprecations_all"
+    )
+
+    result = cli_runner.invoke(
+        manage.check,
+        ["--source", "tests/fixtures", "--cache", "--cache-dir", str(tmp_path)],
+    )
+
+    assert result.exit_code == 0
+    assert check_deprecations_all_mocker.call_args[1]["cache_dir"] == str(tmp_path)
+
+
+@pytest.mark.parametrize("mode", [[], ["--message"], ["--stream"]])
+def test_cli__check__failed_chart_with_deprecated_findings__failed_charts_exit_code(
+    mocker, cli_runner, tmp_path, mode
+):
+    for name in ("deprecated", "failed"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "Chart.yaml").write_text(f"name: {name}")
+
+    def helm_template_manifests(chart, *args):
+        if chart.endswith("failed"):
+            raise HelmCommandError("helm template failed")
+        with open("tests/fixtures/single-document.yaml") as fd:
+            return iter([(None, "deprecated/templates/deployment.yaml", fd.read())])
+
+    mocker.patch(
+        "exporter.checker.helm_template_manifests", side_effect=helm_template_manifests
+    )
+
+    result = cli_runner.invoke(
+        manage.check,
+        ["--charts-root", str(tmp_path), "--in-memory", "--version", "1.14.0"] + mode,
+    )
+
+    assert result.exit_code == FAILED_CHARTS_EXIT_CODE
+    assert f"{tmp_path / 'failed'}: failed" in result.output
+    assert f"{tmp_path / 'deprecated'}: 0 removed and 1 deprecated" in result.output
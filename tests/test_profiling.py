@@ -0,0 +1,55 @@
+import threading
+import time
+import tracemalloc
+
+from exporter import profiling
+
+
+def check_releases():
+    deadline = time.monotonic() + 0.1
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_scan_profiler__merge_thread_profiles__success():
+    profiler = profiling.start_profiling()
+    threads = [
+        threading.Thread(
+            target=profiling.profiled(check_releases), name=f"release-checker-{i}"
+        )
+        for i in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert profiling.stop_profiling() is profiler
+    assert len(profiler.profiles) == 2
+    assert "check_releases" in profiler.pstats()
+    stacks = profiler.collapsed().splitlines()
+    assert stacks
+    assert all(
+        stack.startswith("release-checker-") and "check_releases" in stack
+        for stack in stacks
+    )
+
+
+def test_profiled__profiling_disabled__return_the_function():
+    assert profiling.profiled(check_releases) is check_releases
+    assert profiling.ScanProfiler().pstats() == ""
+
+
+def test_allocation_tracker__report__success():
+    tracker = profiling.AllocationTracker()
+    try:
+        assert tracker.report().startswith("Started tracing")
+        data = [{"kind": f"Deployment-{i}"} for i in range(1000)]
+
+        assert tracker.report().startswith("Top allocation sites\n")
+        assert tracker.report(limit=3).startswith(
+            "Top allocation sites growth since the previous snapshot\n"
+        )
+        assert data
+    finally:
+        tracemalloc.stop()
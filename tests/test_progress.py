@@ -0,0 +1,53 @@
+import pytest
+
+from exporter.progress import ScanProgress
+
+
+def test_scan_progress__snapshot__success():
+    progress = ScanProgress()
+    for _ in range(3):
+        progress.listed()
+    progress.checked()
+
+    with progress.checker_thread(), progress.helm_call():
+        snapshot = progress.snapshot(queue_depth=2)
+
+    assert snapshot["releases_listed"] == 3
+    assert snapshot["releases_checked"] == 1
+    assert snapshot["queue_depth"] == 2
+    assert snapshot["helm_calls_in_flight"] == 1
+    assert snapshot["active_threads"] == 1
+    assert snapshot["listing_completed"] is False
+    assert snapshot["throughput"] > 0
+    assert snapshot["eta_seconds"] >= 0
+
+    snapshot = progress.snapshot()
+    assert snapshot["helm_calls_in_flight"] == 0
+    assert snapshot["active_threads"] == 0
+
+
+def test_scan_progress__no_release_checked__unknown_eta():
+    progress = ScanProgress()
+    progress.listed()
+
+    assert progress.snapshot()["eta_seconds"] is None
+
+
+def test_scan_progress__throughput__rolling_window(mocker):
+    now = mocker.patch("exporter.progress.time.monotonic", return_value=1000.0)
+    progress = ScanProgress(window=60)
+    for second in range(10):
+        now.return_value = 1000.0 + second
+        progress.listed()
+        progress.listed()
+        progress.checked()
+
+    now.return_value = 1010.0
+    assert progress.throughput(1010.0) == pytest.approx(1.0)
+    assert progress.eta_seconds(1.0) == 10
+
+    # The checks older than the window don't count anymore, and the job looks stuck.
+    now.return_value = 1065.0
+    snapshot = progress.snapshot()
+    assert snapshot["throughput"] == pytest.approx(5 / 60, abs=1e-3)
+    assert snapshot["seconds_since_last_check"] == 56
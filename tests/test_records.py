@@ -0,0 +1,141 @@
+import pickle  # nosec
+import sys
+
+import pytest
+
+from exporter.records import Deprecation, ReleaseStatus, ResultSet
+
+RECORDS = 100_000
+
+
+def deprecation(i: int) -> dict:
+    # The values are built like the parsed manifests, as distinct string objects.
+    return {
+        "deprecated": "".join(["tr", "ue"]),
+        "removed": "".join(["fal", "se"]),
+        "kind": "".join(["Deploy", "ment"]),
+        "api_version": "".join(["extensions/", "v1beta1"]),
+        "name": f"nginx-{i}",
+        "release_name": f"release-{i // 10}",
+        "namespace": f"namespace-{i // 1000}",
+        "helm_version": "".join(["v", "3"]),
+        "replacement_api": "".join(["apps/", "v1"]),
+        "deprecated_in_version": "".join(["v1.", "9.0"]),
+        "removed_in_version": "".join(["v1.", "16.0"]),
+        "release_last_update": "".join(["2022-01-20 ", "00:26:25"]),
+        "k8s_version": "".join(["v1.", "21.0"]),
+        "removed_in_next_release": "".join(["fal", "se"]),
+        "removed_in_next_2_releases": "".join(["tr", "ue"]),
+    }
+
+
+def measure(records: list) -> int:
+    """
+    Measure the memory used by the records, counting every shared value once.
+    """
+    seen = set()
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record)
+        for value in (
+            record.values() if isinstance(record, dict) else record.values_tuple()
+        ):
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+
+    return size
+
+
+def test_deprecation__export_the_dict_shape__success():
+    data = deprecation(1)
+    record = Deprecation.from_dict(data)
+
+    assert record.deprecated is True
+    assert record.removed is False
+    assert record["removed_in_next_2_releases"] == "true"
+    assert record == data
+    assert data == record
+    assert dict(record) == data
+    assert list(record) == list(data)
+    assert Deprecation.from_dict(record) is record
+    assert record.k8s_version is Deprecation.from_dict(deprecation(2)).k8s_version
+
+
+def test_release_status__read_only__raises_attribute_error():
+    release = ReleaseStatus(
+        release_name="nginx",
+        namespace="default",
+        helm_version="v3",
+        has_deprecated_api_versions="true",
+        has_removed_api_versions=False,
+    )
+
+    with pytest.raises(AttributeError):
+        release.namespace = "web"
+    with pytest.raises(KeyError):
+        release["kind"]
+    assert release.get("kind") is None
+    assert release["has_removed_api_versions"] == "false"
+
+
+def test_result_set__add__replace_results_with_the_same_identity():
+    results = ResultSet()
+    first = Deprecation.from_dict(deprecation(1))
+    release = ReleaseStatus(
+        release_name=first.release_name,
+        namespace=first.namespace,
+        helm_version="v3",
+        has_deprecated_api_versions=True,
+        has_removed_api_versions=False,
+    )
+    updated = Deprecation.from_dict(dict(deprecation(1), removed="true"))
+
+    results.add(release, [first, Deprecation.from_dict(deprecation(2))])
+    results.add(release, [updated])
+    deprecations, releases = results.snapshot()
+
+    assert len(results) == 1
+    assert releases == [release]
+    # The deprecations fixed in the release are no longer reported.
+    assert deprecations == [updated]
+    assert deprecations[0] is updated
+
+
+def test_result_set__add__keep_the_releases_of_every_helm_version():
+    results = ResultSet()
+    for helm_version in ("v2", "v3"):
+        dep = Deprecation.from_dict(dict(deprecation(1), helm_version=helm_version))
+        release = ReleaseStatus(
+            release_name=dep.release_name,
+            namespace=dep.namespace,
+            helm_version=helm_version,
+            has_deprecated_api_versions=True,
+            has_removed_api_versions=False,
+        )
+        results.add(release, [dep])
+    deprecations, releases = results.snapshot()
+
+    assert len(results) == 2
+    assert [dep.helm_version for dep in deprecations] == ["v2", "v3"]
+    assert [release.helm_version for release in releases] == ["v2", "v3"]
+
+
+def test_deprecation__pickle__success():
+    records = [Deprecation.from_dict(deprecation(i)) for i in range(100)]
+    dicts = [deprecation(i) for i in range(100)]
+
+    restored = pickle.loads(pickle.dumps(records))  # nosec
+
+    assert restored == records
+    assert restored[0].kind is restored[1].kind
+    assert len(pickle.dumps(records)) < len(pickle.dumps(dicts)) / 2
+
+
+def test_deprecation__memory_benchmark__100k_records():
+    dicts_size = measure([deprecation(i) for i in range(RECORDS)])
+    records_size = measure(
+        [Deprecation.from_dict(deprecation(i)) for i in range(RECORDS)]
+    )
+
+    assert records_size < dicts_size / 3
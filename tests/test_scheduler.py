@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from exporter.scheduler import CronExpression, ScanScheduler
+
+
+@pytest.mark.parametrize(
+    ["expression", "date", "next_run"],
+    [
+        ("0 3 * * *", datetime(2022, 1, 20, 2, 59), datetime(2022, 1, 20, 3, 0)),
+        ("0 3 * * *", datetime(2022, 1, 20, 3, 0), datetime(2022, 1, 21, 3, 0)),
+        ("*/15 * * * *", datetime(2022, 1, 20, 3, 1, 30), datetime(2022, 1, 20, 3, 15)),
+        ("30 8-18/2 * * *", datetime(2022, 1, 20, 9, 0), datetime(2022, 1, 20, 10, 30)),
+        ("0 0 1 * *", datetime(2022, 1, 20, 0, 0), datetime(2022, 2, 1, 0, 0)),
+        ("0 0 * * 0", datetime(2022, 1, 20, 0, 0), datetime(2022, 1, 23, 0, 0)),
+        ("0 0 * * 7", datetime(2022, 1, 20, 0, 0), datetime(2022, 1, 23, 0, 0)),
+        ("0 0 29 2 *", datetime(2022, 1, 20, 0, 0), datetime(2024, 2, 29, 0, 0)),
+        ("0 0 13 * 5", datetime(2022, 1, 20, 0, 0), datetime(2022, 1, 21, 0, 0)),
+    ],
+)
+def test_cron_expression_next_after__success(expression, date, next_run):
+    assert CronExpression(expression).next_after(date) == next_run
+
+
+@pytest.mark.parametrize(
+    "expression", ["0 3 * *", "60 * * * *", "* 5-1 * * *", "a * * * *", "0 0 31 2 *"]
+)
+def test_cron_expression__invalid_expression__raises_value_error(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression).next_after(datetime(2022, 1, 20))
+
+
+def test_scan_scheduler__no_last_run__run_now():
+    assert ScanScheduler(3600).is_due(None) is True
+
+
+def test_scan_scheduler__interval__success():
+    scheduler = ScanScheduler(3600)
+    last_run = datetime.now()
+
+    assert scheduler.next_run(last_run) == last_run + timedelta(seconds=3600)
+    assert scheduler.is_due(last_run) is False
+    assert scheduler.is_due(last_run - timedelta(hours=2)) is True
+
+
+def test_scan_scheduler__jitter__stable_for_the_same_last_run():
+    scheduler = ScanScheduler(3600, jitter=600)
+    last_run = datetime(2022, 1, 20)
+    next_run = scheduler.next_run(last_run)
+
+    assert last_run + timedelta(hours=1) <= next_run
+    assert next_run <= last_run + timedelta(hours=1, minutes=10)
+    assert scheduler.next_run(last_run) == next_run
+
+
+def test_scan_scheduler__cron__success():
+    scheduler = ScanScheduler(3600, cron=CronExpression("0 3 * * *"))
+
+    assert scheduler.next_run(datetime(2022, 1, 20, 12, 0)) == datetime(
+        2022, 1, 21, 3, 0
+    )
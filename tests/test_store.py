@@ -0,0 +1,217 @@
+import json
+import sqlite3
+
+from exporter.constants import DATA_FILE, LEGACY_DATA_FILE
+from exporter.store import ResultStore
+
+STATS = {
+    "last_run": "2022-01-20T00:26:25",
+    "duration_seconds": 10,
+    "number_deployed_releases": 2,
+    "number_releases_with_deprecated_api_versions": 1,
+    "number_releases_with_removed_api_versions": 1,
+}
+
+
+def release(
+    name, namespace="default", deprecated="false", removed="false", helm_version="v3"
+):
+    return {
+        "release_name": name,
+        "namespace": namespace,
+        "helm_version": helm_version,
+        "has_deprecated_api_versions": deprecated,
+        "has_removed_api_versions": removed,
+    }
+
+
+def deprecation(release_name, name, namespace="default", helm_version="v3"):
+    return {
+        "deprecated": "true",
+        "removed": "true",
+        "kind": "Deployment",
+        "api_version": "extensions/v1beta1",
+        "name": name,
+        "release_name": release_name,
+        "namespace": namespace,
+        "helm_version": helm_version,
+        "replacement_api": "apps/v1",
+        "deprecated_in_version": "v1.9.0",
+        "removed_in_version": "v1.16.0",
+        "release_last_update": "2022-01-20 00:26:25",
+        "k8s_version": "v1.21.0",
+        "removed_in_next_release": "true",
+        "removed_in_next_2_releases": "true",
+    }
+
+
+def test_result_store__wal_journal_mode(tmp_path):
+    with ResultStore(str(tmp_path / "kdave.db")) as store:
+        mode = store.connection.execute("PRAGMA journal_mode").fetchone()[0]
+
+    assert mode == "wal"
+
+
+def test_result_store__upsert_releases_and_finish_scan__success(tmp_path):
+    path = str(tmp_path / "kdave.db")
+    with ResultStore(path) as store:
+        scan_id = store.start_scan(STATS["last_run"])
+        store.upsert_release(scan_id, release("nginx"), [deprecation("nginx", "a")])
+        store.upsert_release(
+            scan_id,
+            release("nginx", removed="true"),
+            [deprecation("nginx", "b"), deprecation("nginx", "c")],
+        )
+        store.upsert_release(scan_id, release("clean"), [])
+
+        assert store.last_scan() is None
+
+        store.finish_scan(scan_id, STATS)
+
+    with ResultStore(path) as store:
+        data = store.load()
+
+    assert [dep["name"] for dep in data["data"]] == ["b", "c"]
+    assert data["release_stats"] == [
+        release("clean"),
+        release("nginx", removed="true"),
+    ]
+    assert data["last_run"] == STATS["last_run"]
+    assert data["duration_seconds"] == 10
+
+
+def test_result_store__finish_scan__delete_releases_not_seen_by_the_scan(tmp_path):
+    with ResultStore(str(tmp_path / "kdave.db")) as store:
+        store.save([deprecation("old", "a")], [release("old")], STATS)
+        scan_id = store.start_scan(STATS["last_run"])
+        store.upsert_release(scan_id, release("new"), [deprecation("new", "b")])
+
+        # The releases of the previous scan are kept until the new scan completes.
+        assert len(store.load()["release_stats"]) == 2
+
+        store.finish_scan(scan_id, STATS)
+        data = store.load()
+
+    assert data["release_stats"] == [release("new")]
+    assert [dep["name"] for dep in data["data"]] == ["b"]
+
+
+def test_result_store__finish_scan__shard__keep_releases_of_other_shards(tmp_path):
+    # With 2 shards, the "test" namespace is in shard 0 and "default" in shard 1.
+    with ResultStore(str(tmp_path / "kdave.db")) as store:
+        store.save(
+            [deprecation("old", "a", "test"), deprecation("other", "b")],
+            [release("old", "test"), release("other")],
+            STATS,
+        )
+        scan_id = store.start_scan(STATS["last_run"])
+        store.upsert_release(scan_id, release("new", "test"), [])
+
+        store.finish_scan(scan_id, STATS, 0, 2)
+        data = store.load()
+        next_shard = store.get_metadata("next_shard")
+
+    assert data["release_stats"] == [release("other"), release("new", "test")]
+    assert [dep["name"] for dep in data["data"]] == ["b"]
+    assert next_shard == "1"
+
+
+def test_result_store__finish_scan__last_shard__next_shard_is_the_first(tmp_path):
+    path = str(tmp_path / "kdave.db")
+    with ResultStore(path) as store:
+        assert store.get_metadata("next_shard") is None
+        store.finish_scan(store.start_scan(STATS["last_run"]), STATS, 1, 2)
+
+    with ResultStore(path) as store:
+        assert store.get_metadata("next_shard") == "0"
+
+
+def test_result_store__helm_versions__keep_the_releases_with_the_same_name(tmp_path):
+    with ResultStore(str(tmp_path / "kdave.db")) as store:
+        store.save(
+            [deprecation("nginx", "a", helm_version="v2"), deprecation("nginx", "b")],
+            [release("nginx", helm_version="v2"), release("nginx")],
+            STATS,
+        )
+        scan_id = store.start_scan(STATS["last_run"])
+        store.upsert_release(scan_id, release("nginx"), [])
+        data = store.load()
+
+    assert data["release_stats"] == [
+        release("nginx", helm_version="v2"),
+        release("nginx"),
+    ]
+    assert [dep["name"] for dep in data["data"]] == ["a"]
+
+
+def test_result_store__previous_schema__migrate_the_releases(tmp_path):
+    path = str(tmp_path / "kdave.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript("""
+            CREATE TABLE releases (
+                namespace TEXT NOT NULL,
+                release_name TEXT NOT NULL,
+                helm_version TEXT NOT NULL,
+                has_deprecated_api_versions TEXT NOT NULL,
+                has_removed_api_versions TEXT NOT NULL,
+                scan_id INTEGER NOT NULL,
+                PRIMARY KEY (namespace, release_name)
+            );
+            INSERT INTO releases VALUES ('default', 'nginx', 'v2', 'false', 'false', 1);
+            """)
+    connection.close()
+
+    with ResultStore(path) as store:
+        scan_id = store.start_scan(STATS["last_run"])
+        store.upsert_release(scan_id, release("nginx"), [])
+        releases = store.load()["release_stats"]
+        version = store.connection.execute("PRAGMA user_version").fetchone()[0]
+
+    assert releases == [release("nginx", helm_version="v2"), release("nginx")]
+    assert version == 1
+
+
+def test_result_store__import_json_data_file__success(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(
+        json.dumps(
+            dict(
+                STATS,
+                deprecations=[deprecation("nginx", "a")],
+                release_stats=[release("nginx", removed="true")],
+            )
+        )
+    )
+
+    with ResultStore(str(path)) as store:
+        data = store.load()
+
+    assert [dep["name"] for dep in data["data"]] == ["a"]
+    assert data["last_run"] == STATS["last_run"]
+    assert (tmp_path / "data.json.bak").exists()
+    with sqlite3.connect(str(path)) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM releases").fetchone()[0] == 1
+
+
+def test_result_store__default_data_file__import_the_previous_default_data_file(
+    tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / LEGACY_DATA_FILE).write_text(
+        json.dumps(
+            dict(
+                STATS,
+                deprecations=[deprecation("nginx", "a")],
+                release_stats=[release("nginx")],
+            )
+        )
+    )
+
+    with ResultStore(DATA_FILE) as store:
+        data = store.load()
+
+    assert [dep["name"] for dep in data["data"]] == ["a"]
+    assert (tmp_path / f"{LEGACY_DATA_FILE}.bak").exists()
+    assert not (tmp_path / LEGACY_DATA_FILE).exists()
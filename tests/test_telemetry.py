@@ -0,0 +1,89 @@
+import subprocess  # nosec
+
+import pytest
+
+from exporter import helper, telemetry
+from exporter.constants import HELM_V3_BINARY
+from exporter.exceptions import HelmCommandError
+
+
+def get_sample(name, labels=None):
+    return telemetry.enable().registry.get_sample_value(name, labels or {}) or 0
+
+
+@pytest.mark.parametrize(
+    "size, label",
+    [(0, "10KiB"), (10 * 1024, "10KiB"), (50 * 1024, "100KiB"), (2**21, "+Inf")],
+)
+def test_get_manifest_size_label__success(size, label):
+    assert telemetry.get_manifest_size_label(size) == label
+
+
+def test_run_helm_command__observe_duration_and_errors(mocker):
+    labels = {"subcommand": "get", "helm_version": "v3"}
+    count = get_sample(
+        "wf_k8s_deprecated_versions_helm_command_duration_seconds_count", labels
+    )
+    errors = get_sample("wf_k8s_deprecated_versions_helm_command_errors_total", labels)
+    mocker.patch(
+        "exporter.helper.subprocess.run",
+        side_effect=[
+            subprocess.CompletedProcess([], 0, stdout=b""),
+            subprocess.CalledProcessError(1, "helm"),
+        ],
+    )
+
+    helper._run_helm_command([HELM_V3_BINARY, "get", "manifest", "nginx"])
+    with pytest.raises(HelmCommandError):
+        helper._run_helm_command([HELM_V3_BINARY, "get", "manifest", "nginx"])
+
+    assert (
+        get_sample(
+            "wf_k8s_deprecated_versions_helm_command_duration_seconds_count", labels
+        )
+        == count + 2
+    )
+    assert (
+        get_sample("wf_k8s_deprecated_versions_helm_command_errors_total", labels)
+        == errors + 1
+    )
+
+
+def test_retry__count_retries(mocker):
+    mocker.patch("exporter.helper.time.sleep")
+    labels = {"function": "flaky"}
+    retries = get_sample("wf_k8s_deprecated_versions_retries_total", labels)
+
+    @helper.retry(HelmCommandError, total_tries=3)
+    def flaky(results):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert flaky([HelmCommandError("error"), HelmCommandError("error"), "OK"]) == "OK"
+    assert get_sample("wf_k8s_deprecated_versions_retries_total", labels) == (
+        retries + 2
+    )
+
+
+def test_render_self_metrics__success():
+    telemetry.enable()
+    with telemetry.observe_check():
+        pass
+
+    assert (
+        "wf_k8s_deprecated_versions_check_duration_seconds_count"
+        in telemetry.render_self_metrics()
+    )
+
+
+def test_observe_check__metrics_disabled__record_nothing(mocker):
+    mocker.patch("exporter.telemetry._metrics", None)
+
+    assert telemetry.observe_check() is telemetry.NULL_OBSERVATION
+    assert telemetry.observe_helm_command(["helm", "list"]) is (
+        telemetry.NULL_OBSERVATION
+    )
+    telemetry.count_retry("flaky")
+    assert telemetry.render_self_metrics() == ""
@@ -0,0 +1,43 @@
+import json
+import threading
+
+from exporter import tracing
+
+
+def test_span__tracing_disabled__record_nothing():
+    assert tracing.stop_tracing() is None
+    assert tracing.span("release", release="nginx") is tracing.NULL_SPAN
+
+    tracing.counter("queue", depth=1)
+
+
+def test_span__tracing_enabled__save_chrome_trace(tmp_path):
+    tracer = tracing.start_tracing()
+
+    def check_release():
+        with tracing.span("release", release="nginx"):
+            with tracing.span("helm get manifest"):
+                pass
+
+    thread = threading.Thread(target=check_release, name="release-checker-0")
+    thread.start()
+    thread.join()
+    tracing.counter("queue", depth=3)
+
+    assert tracing.stop_tracing() is tracer
+    path = tmp_path / "traces" / "scan.trace.json"
+    tracer.save(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+
+    assert events[0] == {
+        "name": "thread_name",
+        "ph": "M",
+        "pid": tracer.pid,
+        "tid": thread.ident,
+        "args": {"name": "release-checker-0"},
+    }
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["release"]["args"] == {"release": "nginx"}
+    assert spans["release"]["dur"] >= spans["helm get manifest"]["dur"]
+    assert spans["helm get manifest"]["tid"] == thread.ident
+    assert [event["args"] for event in events if event["ph"] == "C"] == [{"depth": 3}]
@@ -0,0 +1,221 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+from exporter import manage, watch
+from exporter.constants import HELM_V3_BINARY
+
+DEPLOYMENT = "tests/fixtures/single-document.yaml"
+DEPLOYMENTS = "tests/fixtures/multiple-document.yaml"
+
+
+class FakeWatcher:
+    """
+    Apply a change to the watched files on every wait, then interrupt the watch.
+    """
+
+    def __init__(self, changes):
+        self.changes_list = list(changes)
+        self.closed = False
+
+    def changes(self, timeout=None):
+        if not self.changes_list:
+            raise KeyboardInterrupt
+        return self.changes_list.pop(0)()
+
+    def close(self):
+        self.closed = True
+
+
+def test_polling_watcher__changes__success(tmp_path):
+    (tmp_path / "a.yaml").write_text("a")
+    (tmp_path / "b.yaml").write_text("b")
+    watcher = watch.PollingWatcher(str(tmp_path), interval=0.01)
+
+    assert watcher.changes(timeout=0) == set()
+    (tmp_path / "a.yaml").write_text("changed")
+    (tmp_path / "b.yaml").unlink()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.yaml").write_text("c")
+
+    assert watcher.changes(timeout=0) == {
+        str(tmp_path / "a.yaml"),
+        str(tmp_path / "b.yaml"),
+        str(tmp_path / "sub" / "c.yaml"),
+    }
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_inotify_watcher__changes__watch_new_directories(tmp_path):
+    (tmp_path / "a.yaml").write_text("a")
+    watcher = watch.InotifyWatcher(str(tmp_path))
+    try:
+        assert watcher.changes(timeout=0) == set()
+        (tmp_path / "sub").mkdir()
+        assert str(tmp_path / "sub") in watcher.changes(timeout=1)
+        (tmp_path / "sub" / "b.yaml").write_text("b")
+        (tmp_path / "a.yaml").unlink()
+
+        assert watcher.changes(timeout=1) == {
+            str(tmp_path / "a.yaml"),
+            str(tmp_path / "sub" / "b.yaml"),
+        }
+    finally:
+        watcher.close()
+
+
+def test_watch_deprecations__print_the_findings_diff(mocker, tmp_path, capsys):
+    shutil.copy(DEPLOYMENT, tmp_path / "a.yaml")
+    (tmp_path / "notes.txt").write_text("")
+    target = watch.WatchedSource(str(tmp_path), "1.16.0")
+    check_mock = mocker.spy(watch, "check_deprecations_in_files")
+
+    def add_file():
+        (tmp_path / "sub").mkdir()
+        shutil.copy(DEPLOYMENTS, tmp_path / "sub" / "b.yaml")
+        (tmp_path / "notes.txt").write_text("changed")
+        return {str(tmp_path / "sub" / "b.yaml"), str(tmp_path / "notes.txt")}
+
+    def delete_file():
+        (tmp_path / "a.yaml").unlink()
+        return {str(tmp_path / "a.yaml")}
+
+    def break_file():
+        (tmp_path / "sub" / "b.yaml").write_text("kind: [")
+        return {str(tmp_path / "sub" / "b.yaml")}
+
+    watcher = FakeWatcher([add_file, delete_file, break_file])
+
+    watch.watch_deprecations(target, watcher=watcher)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "+ a.yaml: The Deployment: nginx-deployment uses the removed apiVersion: extensions/v1beta1. Use apps/v1 instead.",
+        "+ sub/b.yaml: The Deployment: nginx-deployment uses the removed apiVersion: apps/v1beta2. Use apps/v1 instead.",
+        "+ sub/b.yaml: The Deployment: nginx-deployment uses the removed apiVersion: extensions/v1beta1. Use apps/v1 instead.",
+        "- a.yaml: The Deployment: nginx-deployment uses the removed apiVersion: extensions/v1beta1. Use apps/v1 instead.",
+        "- sub/b.yaml: The Deployment: nginx-deployment uses the removed apiVersion: apps/v1beta2. Use apps/v1 instead.",
+        "- sub/b.yaml: The Deployment: nginx-deployment uses the removed apiVersion: extensions/v1beta1. Use apps/v1 instead.",
+    ]
+    # Only the changed manifests were checked again.
+    assert [call.args[0] for call in check_mock.call_args_list] == [
+        str(tmp_path / "sub" / "b.yaml"),
+        str(tmp_path / "sub" / "b.yaml"),
+    ]
+    assert watcher.closed
+
+
+def test_watched_chart__update__check_the_changed_rendered_files(mocker, tmp_path):
+    chart = tmp_path / "chart"
+    output_dir = tmp_path / "output"
+    chart.mkdir()
+    renders = [{"a.yaml": DEPLOYMENT, "b.yaml": DEPLOYMENT}]
+    renders.append({"a.yaml": DEPLOYMENT, "b.yaml": DEPLOYMENTS})
+
+    def helm_template(chart_path, output, *args):
+        os.makedirs(output)
+        for name, fixture in renders.pop(0).items():
+            shutil.copy(fixture, os.path.join(output, name))
+
+    mocker.patch("exporter.watch.helm_template", side_effect=helm_template)
+    target = watch.WatchedChart(
+        str(chart), HELM_V3_BINARY, "1.16.0", output_dir=str(output_dir)
+    )
+    check_mock = mocker.spy(watch, "check_deprecations_in_files")
+
+    target.update({str(output_dir / "a.yaml")})
+    assert check_mock.call_count == 0
+    target.update({str(chart / "templates" / "deployment.yaml")})
+
+    check_mock.assert_called_once_with(str(output_dir / "b.yaml"), "1.16.0")
+    assert sorted(key[0] for key in target.findings()) == ["a.yaml", "b.yaml", "b.yaml"]
+
+
+def test_cli__watch_release__usage_error(cli_runner):
+    result = cli_runner.invoke(manage.check, ["--release", "nginx", "--watch"])
+
+    assert result.exit_code == 2
+
+
+def test_watched_chart__update__ignore_the_dependencies_and_skip_their_update(
+    mocker, tmp_path
+):
+    chart = tmp_path / "chart"
+    output_dir = tmp_path / "output"
+    chart.mkdir()
+    helm_template_mock = mocker.patch(
+        "exporter.watch.helm_template",
+        side_effect=lambda chart_path, output, *args: os.makedirs(output),
+    )
+    target = watch.WatchedChart(
+        str(chart), HELM_V3_BINARY, "1.16.0", output_dir=str(output_dir)
+    )
+
+    target.update(
+        {str(chart / "charts" / "redis-1.0.0.tgz"), str(chart / "Chart.lock")}
+    )
+    assert helm_template_mock.call_count == 1
+    target.update({str(chart / "templates" / "deployment.yaml")})
+    target.update({str(chart / "requirements.yaml")})
+
+    # The skip_dependencies argument of the renders.
+    assert [call.args[5] for call in helm_template_mock.call_args_list] == [
+        False,
+        True,
+        False,
+    ]
+
+
+def test_watched_chart__update_site_values__template_the_site_only(mocker, tmp_path):
+    chart = tmp_path / "chart"
+    output_dir = tmp_path / "output"
+    (chart / "values" / "east").mkdir(parents=True)
+    for site in ("prod", "stage"):
+        (chart / "values" / "east" / f"{site}.yaml").write_text("")
+
+    def helm_template(chart_path, output, *args):
+        for site in ("prod", "stage"):
+            os.makedirs(os.path.join(output, "east", site))
+            shutil.copy(DEPLOYMENT, os.path.join(output, "east", site, "a.yaml"))
+
+    def helm_template_site(helm_command, output, site_dir, val):
+        os.makedirs(os.path.join(output, site_dir))
+        shutil.copy(DEPLOYMENTS, os.path.join(output, site_dir, "a.yaml"))
+
+    helm_template_mock = mocker.patch(
+        "exporter.watch.helm_template", side_effect=helm_template
+    )
+    site_mock = mocker.patch(
+        "exporter.watch.helm_template_site", side_effect=helm_template_site
+    )
+    mocker.patch("exporter.watch.get_helm_template_command", return_value=["helm"])
+    target = watch.WatchedChart(
+        str(chart), HELM_V3_BINARY, "1.16.0", output_dir=str(output_dir)
+    )
+    check_mock = mocker.spy(watch, "check_deprecations_in_files")
+
+    target.update({str(chart / "values" / "east" / "stage.yaml")})
+
+    helm_template_mock.assert_called_once()
+    site_mock.assert_called_once_with(
+        ["helm"],
+        str(output_dir),
+        "east/stage",
+        str(chart / "values" / "east" / "stage.yaml"),
+    )
+    check_mock.assert_called_once_with(
+        str(output_dir / "east" / "stage" / "a.yaml"), "1.16.0"
+    )
+    assert sorted(key[0] for key in target.findings()) == [
+        "east/prod/a.yaml",
+        "east/stage/a.yaml",
+        "east/stage/a.yaml",
+    ]
+
+    (chart / "values" / "east" / "stage.yaml").unlink()
+    target.update({str(chart / "values" / "east" / "stage.yaml")})
+
+    assert site_mock.call_count == 1
+    assert sorted(key[0] for key in target.findings()) == ["east/prod/a.yaml"]
+    assert not (output_dir / "east" / "stage").exists()